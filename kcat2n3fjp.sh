@@ -1,3 +1,3 @@
 #!/bin/bash
 
-python src/kcat2n3fjp.py
+python src/kachina.py n3fjp "$@"
@@ -0,0 +1,29 @@
+# bands.py
+# amateur band edges, shared by kcat2n3fjp and the journal
+
+BAND_TABLE = [
+    (1800000, 2000000, "160m"),
+    (3500000, 4000000, "80m"),
+    (5330500, 5405500, "60m"),
+    (7000000, 7300000, "40m"),
+    (10100000, 10150000, "30m"),
+    (14000000, 14350000, "20m"),
+    (18068000, 18168000, "17m"),
+    (21000000, 21450000, "15m"),
+    (24890000, 24990000, "12m"),
+    (28000000, 29700000, "10m"),
+    (50000000, 54000000, "6m"),
+    (144000000, 148000000, "2m"),
+    (222000000, 225000000, "1.25m"),
+    (420000000, 450000000, "70cm")
+]
+
+def freq_to_band(freq):
+    try:
+        freq = int(freq)
+    except:
+        return "Unknown"
+    for low, high, name in BAND_TABLE:
+        if low <= freq < high:
+            return name
+    return "Unknown"
@@ -0,0 +1,191 @@
+# cmd_server.py
+# asyncio TCP server for the small tag protocol spoken by pyKeyer
+# (<CMD>get_frequency</CMD>, <SET>set_freq=...</SET>, ...), used by
+# pykeyer_kcat_bridge.py and pyKeyer_kcat_hook.py.
+#
+# One event loop in one daemon thread serves every client. Incoming bytes are
+# framed on the closing tag (or on newline for untagged lines), so commands
+# that arrive split across TCP segments or several to a segment are handled
+# correctly, in order. The loop stops reading from a connection while its
+# unsent output is above the high-water mark, so a client that doesn't read
+# can't make us buffer without limit.
+#
+# With one_shot=True (pyKeyer_kcat_hook.py, whose clients read until EOF)
+# the connection is closed once the read that carried the first command has
+# been answered, as the old listener did. Every complete command in that read
+# is answered first, so pipelined commands sent in one write are not lost; a
+# command that only arrives after that is not read. A client that sends
+# <CMD>keepalive</CMD> first keeps the connection open.
+#
+# Clients can also subscribe to change notifications: publish() (callable
+# from any thread) queues a dict of changed fields for every subscriber,
+# which is sent as <CHANGE>field=value;...</CHANGE> either immediately or,
+# with a coalescing interval, at most once per interval. A subscriber whose
+# output is backed up keeps merging changes instead of queueing them.
+
+import asyncio
+import codecs
+import threading
+
+MAX_FRAME = 4096
+HIGH_WATER = 64 * 1024
+KEEPALIVE = "<CMD>keepalive</CMD>"
+
+def split_frames(buffer):
+    # returns (frames, rest); rest is an incomplete frame to keep for later
+    frames = []
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            return frames, ""
+        if buffer.startswith("<"):
+            close = buffer.find(">")
+            if close < 0:
+                break
+            end = buffer.find(f"</{buffer[1:close]}>", close)
+            if end < 0:
+                break
+            end += len(buffer[1:close]) + 3
+        else:
+            end = buffer.find("\n")
+            if end < 0:
+                break
+        frames.append(buffer[:end].strip())
+        buffer = buffer[end:]
+    if len(buffer) > MAX_FRAME:
+        # garbage or a runaway frame: drop it rather than wait forever
+        frames.append(buffer[:MAX_FRAME])
+        buffer = ""
+    return frames, buffer
+
+class Session:
+    def __init__(self, server, writer):
+        self.server = server
+        self.writer = writer
+        self.peer = writer.get_extra_info("peername")
+        self.interval = None  # None: not subscribed, 0: push immediately
+        self.pending = {}
+        self.flush_handle = None
+        self.persistent = not server.one_shot
+
+    # the following run on the loop thread
+
+    def subscribe(self, interval=0.0):
+        self.interval = max(interval, 0.0)
+
+    def unsubscribe(self):
+        self.interval = None
+        self.pending = {}
+        if self.flush_handle:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+    def queue_changes(self, changes):
+        if self.interval is None:
+            return
+        self.pending.update(changes)
+        if self.flush_handle is None:
+            self.flush_handle = self.server.loop.call_later(self.interval, self.flush) \
+                if self.interval > 0 else self.server.loop.call_soon(self.flush)
+
+    def flush(self):
+        self.flush_handle = None
+        if not self.pending or self.writer.is_closing():
+            return
+        if self.writer.transport.get_write_buffer_size() > self.server.high_water:
+            # client isn't keeping up, keep merging until it drains
+            self.flush_handle = self.server.loop.call_later(max(self.interval, 0.05), self.flush)
+            return
+        message = "<CHANGE>" + ";".join(f"{k}={v}" for k, v in self.pending.items()) + "</CHANGE>"
+        self.pending = {}
+        self.writer.write(message.encode("utf-8"))
+
+class CommandServer:
+    def __init__(self, host, port, handle_command, name="listener", high_water=HIGH_WATER, one_shot=False):
+        self.host = host
+        self.port = port
+        self.handle_command = handle_command  # handle_command(session, command) -> response or None
+        self.name = name
+        self.high_water = high_water
+        self.one_shot = one_shot  # close after the first response unless the client asks for keepalive
+        self.sessions = set()
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.started = threading.Event()
+        self.error = None
+
+    def start(self):
+        # returns once the port is bound (or binding failed)
+        if self.thread:
+            return self.error is None
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+        self.started.wait()
+        return self.error is None
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._client, self.host, self.port, reuse_address=True))
+        except Exception as e:
+            self.error = e
+            print(f"[{self.name}] Unable to listen on {self.host}:{self.port}: {e}")
+            self.started.set()
+            return
+        print(f"[{self.name}] TCP listener started on port {self.port}")
+        self.started.set()
+        self.loop.run_forever()
+
+    async def _client(self, reader, writer):
+        session = Session(self, writer)
+        writer.transport.set_write_buffer_limits(high=self.high_water)
+        self.sessions.add(session)
+        print(f"[{self.name}] Connection established from {session.peer}")
+        buffer = ""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")  # keeps characters split across reads
+        try:
+            answered = False
+            while not (answered and not session.persistent):
+                data = await reader.read(4096)
+                if not data:
+                    print(f"[{self.name}] Connection from {session.peer} closed by peer.")
+                    break
+                frames, buffer = split_frames(buffer + decoder.decode(data))
+                for command in frames:
+                    if command == KEEPALIVE:
+                        session.persistent = True
+                        response = "<RESPONSE>OK</RESPONSE>"
+                    else:
+                        try:
+                            response = self.handle_command(session, command)
+                        except Exception as e:
+                            response = f"<RESPONSE>Error: {e}</RESPONSE>"
+                    if response is not None:
+                        writer.write(response.encode("utf-8"))
+                        answered = True  # one_shot: closed after this read, the client reads until EOF
+                # backpressure: no more reads until the client takes what we've sent
+                await writer.drain()
+        except (ConnectionError, OSError) as e:
+            print(f"[{self.name}] Error handling connection {session.peer}: {e}")
+        finally:
+            session.unsubscribe()
+            self.sessions.discard(session)
+            writer.close()
+
+    def publish(self, changes):
+        # thread-safe: hand changed fields to every subscribed session
+        if not changes or self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self._publish, dict(changes))
+
+    def _publish(self, changes):
+        for session in self.sessions:
+            session.queue_changes(changes)
+
+    def stop(self):
+        if self.loop and self.server:
+            print(f"[{self.name}] Closing listener on port {self.port}")
+            self.loop.call_soon_threadsafe(self.server.close)
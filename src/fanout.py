@@ -0,0 +1,171 @@
+# fanout.py
+# feeds one kcat XML-RPC call stream to any number of consumers ("sinks")
+# without making kcat wait for them.
+#
+# Each sink owns a bounded queue and a worker thread. publish() only does a
+# non-blocking put per sink, so a slow or dead consumer (N3FJP not running,
+# pyKeyer bridge restarting) costs kcat nothing; when a queue is full the
+# sink's drop policy decides what is lost:
+#   coalesce    - keep only the latest call per method (state-like consumers:
+#                 a backlog of setters collapses to the current value of each,
+#                 so a burst of one method can't push out another)
+#   drop_oldest - discard the oldest queued call
+#   drop_newest - discard the incoming call (consumers that need history)
+#
+# A sink can also take only some methods (accept), so that e.g. the S-meter
+# flood never reaches a consumer that ignores it. Sinks see a multicall as
+# its individual calls, in order, unless they take batches: then the
+# multicall arrives as one system.multicall with the calls they accept, so a
+# consumer that batches its own work (one logger update per multicall) still
+# can.
+
+import collections
+import queue
+import socket
+import threading
+
+COALESCE = "coalesce"
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+POLICIES = (COALESCE, DROP_OLDEST, DROP_NEWEST)
+
+def coalesce_key(method, params):
+    # what a newer call replaces; a multicall replaces an earlier batch of the same methods
+    if method == "system.multicall" and params and isinstance(params[0], list):
+        return (method,) + tuple(call.get("methodName") for call in params[0])
+    return method
+
+class Sink:
+    def __init__(self, name, consume, maxsize=256, policy=DROP_OLDEST, accept=None, batches=False):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown drop policy {policy}, expected one of {POLICIES}")
+        self.name = name
+        self.consume = consume  # consume(method, params), runs on the sink's own thread
+        self.policy = policy
+        self.accept = accept    # accept(method) -> bool, None takes every method
+        self.batches = batches  # multicalls arrive whole instead of split
+        self.maxsize = maxsize
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.pending = collections.OrderedDict()  # coalesce: key -> (method, params), oldest first
+        self.ready = threading.Condition()
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.thread = None
+
+    def start(self):
+        if self.thread:
+            return
+        self.thread = threading.Thread(target=self._worker, name=f"sink-{self.name}", daemon=True)
+        self.thread.start()
+
+    def offer(self, method, params):
+        # never blocks the caller
+        if self.policy == COALESCE:
+            key = coalesce_key(method, params)
+            with self.ready:
+                if key in self.pending:
+                    del self.pending[key]  # the newer call goes to the back, after older ones
+                    self.coalesced += 1
+                elif len(self.pending) >= self.maxsize:
+                    self.pending.popitem(last=False)
+                    self.dropped += 1
+                self.pending[key] = (method, params)
+                self.ready.notify()
+            return
+        try:
+            self.queue.put_nowait((method, params))
+            return
+        except queue.Full:
+            pass
+        self.dropped += 1
+        if self.policy == DROP_OLDEST:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait((method, params))
+            except queue.Full:
+                pass  # lost a race with another publisher, the newer call wins anyway
+
+    def _next(self):
+        if self.policy != COALESCE:
+            return self.queue.get()
+        with self.ready:
+            while not self.pending:
+                self.ready.wait()
+            return self.pending.popitem(last=False)[1]
+
+    def _worker(self):
+        while True:
+            method, params = self._next()
+            try:
+                self.consume(method, params)
+                self.delivered += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"[sink {self.name}] {method} failed: {e}")
+
+    def stats(self):
+        return {
+            "queued": len(self.pending) if self.policy == COALESCE else self.queue.qsize(),
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+class FanOut:
+    def __init__(self):
+        self.sinks = []
+
+    def register(self, sink):
+        self.sinks.append(sink)
+        sink.start()
+        return sink
+
+    def publish(self, method, params):
+        if method == "system.multicall" and params and isinstance(params[0], list):
+            for sink in self.sinks:
+                calls = [call for call in params[0]
+                         if sink.accept is None or sink.accept(call.get("methodName"))]
+                if sink.batches:
+                    if calls:
+                        sink.offer(method, [calls])
+                else:
+                    for call in calls:
+                        sink.offer(call.get("methodName"), call.get("params", []))
+            return
+        for sink in self.sinks:
+            if sink.accept is None or sink.accept(method):
+                sink.offer(method, params)
+
+    def stats(self):
+        return {sink.name: sink.stats() for sink in self.sinks}
+
+class PyKeyerForwarder:
+    # sink consumer that passes kcat's frequency and mode to pykeyer_kcat_bridge
+    # using the bridge's own <SET> commands on its socket port (7365)
+    def __init__(self, host="localhost", port=7365):
+        self.host = host
+        self.port = port
+        self.sock = None
+
+    def _send(self, command):
+        if not self.sock:
+            self.sock = socket.create_connection((self.host, self.port), timeout=2)
+        try:
+            self.sock.sendall(command.encode("utf-8"))
+            self.sock.recv(1024)
+        except Exception:
+            self.sock.close()
+            self.sock = None
+            raise
+
+    def __call__(self, method, params):
+        if method == "rig.set_frequency" and len(params) > 0:
+            self._send(f"<SET>set_freq={params[0]}</SET>")
+        elif method == "rig.set_mode" and len(params) > 0:
+            self._send(f"<SET>set_mode={params[0]}</SET>")
@@ -0,0 +1,305 @@
+# fast_xmlrpc.py
+# optional XML-RPC codec for the servers kcat talks to (kcat2n3fjp.py,
+# xmlrpc_proxy_logger.py, multirig.py).
+#
+# kcat only ever sends a handful of shapes: setters with one scalar
+# parameter, getters with none, and system.multicall of {methodName, params}
+# structs; the answers are None, a string, a number or a list of those.
+# parse_call() recognizes a call with at most one scalar parameter, and a
+# multicall whose entries are such calls, with precompiled regular
+# expressions instead of expat callbacks. dump_response() builds answers
+# from fragments taken from the standard library's own output, so the bytes
+# on the wire are the same as before. Anything else (entities, CDATA,
+# base64, dateTime, other encodings, faults, structs in answers) is handed
+# to xmlrpc.client unchanged.
+#
+#   server = FastXMLRPCServer((host, port), allow_none=True)
+# or, for another server class,
+#   class Server(FastMarshalMixin, ThreadingMixIn, SimpleXMLRPCServer):
+#       pass
+#
+# FastMarshalMixin can also append every request body it receives to a
+# capture file (JSON lines), and
+#   python fast_xmlrpc.py --bench [CAPTURE]
+# compares both codecs on such a capture, or on a built-in kcat-like set.
+
+import argparse
+import json
+import re
+import threading
+import time
+from xmlrpc.client import Fault, Marshaller, dumps, escape, loads
+from xmlrpc.server import SimpleXMLRPCServer
+
+MAXINT = 2**31 - 1
+MININT = -2**31
+
+# --- requests ---
+
+# one scalar inside <value>...</value>: typed, or bare text (a string)
+_SCALAR = r"(?:\s*<(double|i4|int|string|boolean)>([^<&\r]*)</\{n}>\s*|([^<&\r]*))"
+
+_SIMPLE_CALL = re.compile(
+    r"\s*(?:<\?xml[^>]*\?>)?\s*<methodCall>\s*<methodName>([A-Za-z0-9_.:]+)</methodName>\s*"
+    r"(?:<params>\s*(?:<param>\s*<value>" + _SCALAR.format(n=2) + r"</value>\s*</param>\s*)?</params>\s*"
+    r"|<params/>\s*)?"
+    r"</methodCall>\s*\Z")
+
+_MULTICALL_HEAD = re.compile(
+    r"\s*(?:<\?xml[^>]*\?>)?\s*<methodCall>\s*<methodName>system\.multicall</methodName>\s*"
+    r"<params>\s*<param>\s*<value>\s*<array>\s*<data>\s*")
+
+_MULTICALL_ENTRY = re.compile(
+    r"<value>\s*<struct>\s*"
+    r"<member>\s*<name>methodName</name>\s*<value>(?:\s*<string>([A-Za-z0-9_.:]+)</string>\s*|([A-Za-z0-9_.:]+))</value>\s*</member>\s*"
+    r"<member>\s*<name>params</name>\s*<value>\s*<array>\s*"
+    r"(?:<data>\s*(?:<value>" + _SCALAR.format(n=3) + r"</value>\s*)?</data>|<data/>)\s*"
+    r"</array>\s*</value>\s*</member>\s*</struct>\s*</value>\s*")
+
+_MULTICALL_TAIL = re.compile(
+    r"</data>\s*</array>\s*</value>\s*</param>\s*</params>\s*</methodCall>\s*\Z")
+
+_PROLOG = re.compile(r"\s*<\?xml([^>]*)\?>")
+
+class _Fallback(Exception):
+    pass
+
+def _boolean(text):
+    if text == "0":
+        return False
+    if text == "1":
+        return True
+    raise _Fallback  # let the standard library report it
+
+_SCALARS = {
+    "double": float,
+    "int": int,
+    "i4": int,
+    "string": str,
+    "boolean": _boolean,
+}
+
+def _scalar(kind, typed, bare):
+    # the groups of one _SCALAR match; () if there was no value at all
+    if kind:
+        return (_SCALARS[kind](typed if kind == "string" else typed.strip()),)
+    if bare is not None:
+        return (bare,)
+    return ()
+
+def parse_call(data):
+    # returns (method, params) like xmlrpc.client.loads() gives (params, method),
+    # or None if the standard library should handle this request
+    try:
+        text = data.decode("utf-8") if isinstance(data, (bytes, bytearray)) else data
+        prolog = _PROLOG.match(text)
+        if prolog and "encoding" in prolog.group(1) and "utf-8" not in prolog.group(1).lower():
+            return None
+        match = _SIMPLE_CALL.match(text)
+        if match:
+            method, kind, typed, bare = match.groups()
+            return method, _scalar(kind, typed, bare)
+        match = _MULTICALL_HEAD.match(text)
+        if not match:
+            return None
+        calls = []
+        pos = match.end()
+        entry = _MULTICALL_ENTRY.match(text, pos)
+        while entry:
+            string_name, bare_name, kind, typed, bare = entry.groups()
+            calls.append({"methodName": string_name or bare_name,
+                          "params": list(_scalar(kind, typed, bare))})
+            pos = entry.end()
+            entry = _MULTICALL_ENTRY.match(text, pos)
+        if not _MULTICALL_TAIL.match(text, pos):
+            return None
+        return "system.multicall", (calls,)
+    except (_Fallback, UnicodeDecodeError, ValueError):
+        return None
+
+# --- responses ---
+
+def _stdlib_value(value):
+    # the standard library's XML for one value, as it appears inside <param>
+    body = Marshaller(allow_none=True).dumps([value])
+    return body[len("<params>\n<param>\n"):-len("</param>\n</params>\n")]
+
+_HEAD, _TAIL = dumps((None,), methodresponse=True, allow_none=True).split(_stdlib_value(None))
+_NIL = _stdlib_value(None)
+_DOUBLE = _stdlib_value(0.5).split("0.5")
+_INT = _stdlib_value(7).split("7")
+_STRING = _stdlib_value("@").split("@")
+_TRUE = _stdlib_value(True)
+_FALSE = _stdlib_value(False)
+_ARRAY = _stdlib_value([]).split("\n", 1)
+_ARRAY[0] += "\n"
+
+def _value_xml(value, allow_none, out):
+    kind = type(value)
+    if kind is str:
+        out.append(_STRING[0])
+        out.append(escape(value) if ("&" in value or "<" in value or ">" in value) else value)
+        out.append(_STRING[1])
+    elif kind is float:
+        out.append(_DOUBLE[0])
+        out.append(repr(value))
+        out.append(_DOUBLE[1])
+    elif value is None:
+        if not allow_none:
+            raise _Fallback
+        out.append(_NIL)
+    elif kind is bool:
+        out.append(_TRUE if value else _FALSE)
+    elif kind is int:
+        if not MININT <= value <= MAXINT:
+            raise _Fallback
+        out.append(_INT[0])
+        out.append(str(value))
+        out.append(_INT[1])
+    elif kind is list or kind is tuple:
+        out.append(_ARRAY[0])
+        for item in value:
+            _value_xml(item, allow_none, out)
+        out.append(_ARRAY[1])
+    else:
+        raise _Fallback  # dicts (fault entries), bytes, datetimes, subclasses
+
+def dump_response(value, allow_none=True, encoding="utf-8"):
+    # the encoded methodResponse for value, or None to use xmlrpc.client.dumps
+    out = [_HEAD]
+    try:
+        _value_xml(value, allow_none, out)
+    except _Fallback:
+        return None
+    out.append(_TAIL)
+    return "".join(out).encode(encoding, "xmlcharrefreplace")
+
+# --- server ---
+
+class FastMarshalMixin:
+    # mix in before SimpleXMLRPCServer (or SimpleXMLRPCDispatcher)
+    fast_codec = True
+    capture = None  # open text file: request bodies are appended as JSON lines
+    capture_lock = threading.Lock()  # threading servers write from several threads
+
+    def _marshaled_dispatch(self, data, dispatch_method=None, path=None):
+        stats = self.__dict__.setdefault("codec_stats", {"fast": 0, "fallback_parse": 0, "fallback_dump": 0})
+        if self.capture:
+            line = json.dumps({"ts": time.time(), "body": data.decode("utf-8", "replace")}) + "\n"
+            with self.capture_lock:
+                self.capture.write(line)
+                self.capture.flush()
+        call = parse_call(data) if self.fast_codec else None
+        if call is None:
+            if self.fast_codec:
+                stats["fallback_parse"] += 1
+            return super()._marshaled_dispatch(data, dispatch_method, path)
+
+        method, params = call
+        try:
+            if dispatch_method is not None:
+                response = dispatch_method(method, params)
+            else:
+                response = self._dispatch(method, params)
+            body = dump_response(response, self.allow_none, self.encoding)
+            if body is not None:
+                stats["fast"] += 1
+                return body
+            stats["fallback_dump"] += 1
+            response = dumps((response,), methodresponse=1,
+                             allow_none=self.allow_none, encoding=self.encoding)
+        except Fault as fault:
+            response = dumps(fault, allow_none=self.allow_none, encoding=self.encoding)
+        except BaseException as exc:
+            response = dumps(Fault(1, "%s:%s" % (type(exc), exc)),
+                             encoding=self.encoding, allow_none=self.allow_none)
+        return response.encode(self.encoding, "xmlcharrefreplace")
+
+class FastXMLRPCServer(FastMarshalMixin, SimpleXMLRPCServer):
+    pass
+
+def open_capture(path):
+    try:
+        return open(path, "a", encoding="utf-8")
+    except Exception as e:
+        print(f"[fast_xmlrpc] Unable to open capture file {path}: {e}")
+        return None
+
+# --- benchmark ---
+
+def sample_payloads():
+    # what kcat sends, as the standard library would marshal it
+    multicall = [{"methodName": "rig.set_frequency", "params": [14070000.0]},
+                 {"methodName": "rig.set_mode", "params": ["USB"]},
+                 {"methodName": "rig.set_bandwidth", "params": ["2400"]}]
+    calls = [
+        ("rig.set_frequency", (14070000.0,)),
+        ("rig.set_mode", ("CW",)),
+        ("rig.set_smeter", (42,)),
+        ("main.get_frequency", ()),
+        ("rig.get_mode", ()),
+        ("main.get_trx_state", ()),
+        ("system.multicall", (multicall,)),
+    ]
+    return [dumps(params, method).encode("utf-8") for method, params in calls]
+
+def sample_responses():
+    return [None, "CW", "RX", 14070000.0, 42, [[7000000.0], [None], [None]]]
+
+def _time(fn, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            fn(item)
+    return (time.perf_counter() - start) * 1e6 / (repeat * len(items))
+
+def bench(capture=None, repeat=2000):
+    if capture:
+        with open(capture, encoding="utf-8") as f:
+            payloads = [json.loads(line)["body"].encode("utf-8") for line in f if line.strip()]
+        print(f"{len(payloads)} captured requests from {capture}")
+    else:
+        payloads = sample_payloads()
+        print(f"{len(payloads)} built-in kcat-like requests")
+    repeat = max(1, repeat * 7 // max(len(payloads), 1))
+
+    fast = 0
+    for payload in payloads:
+        call = parse_call(payload)
+        params, method = loads(payload)
+        if call is None:
+            continue
+        fast += 1
+        if call != (method, params):
+            raise SystemExit(f"Mismatch on {payload!r}: {call} != {(method, params)}")
+    print(f"fast path handles {fast} of {len(payloads)} requests, results identical to xmlrpc.client")
+
+    responses = sample_responses()
+    for value in responses:
+        expected = dumps((value,), methodresponse=1, allow_none=True).encode("utf-8")
+        if dump_response(value) != expected:
+            raise SystemExit(f"Response mismatch for {value!r}")
+
+    stdlib_parse = _time(loads, payloads, repeat)
+    fast_parse = _time(parse_call, payloads, repeat)
+    stdlib_dump = _time(lambda v: dumps((v,), methodresponse=1, allow_none=True).encode("utf-8"),
+                        responses, repeat)
+    fast_dump = _time(dump_response, responses, repeat)
+    print(f"parse:  xmlrpc.client {stdlib_parse:7.2f} us   fast {fast_parse:7.2f} us   "
+          f"({stdlib_parse / fast_parse:.1f}x)")
+    print(f"dump:   xmlrpc.client {stdlib_dump:7.2f} us   fast {fast_dump:7.2f} us   "
+          f"({stdlib_dump / fast_dump:.1f}x)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fast XML-RPC codec for kcat's calls")
+    parser.add_argument("--bench", nargs="?", const="", metavar="CAPTURE",
+                        help="Compare against xmlrpc.client, on a capture file if given")
+    parser.add_argument("--repeat", type=int, default=2000, help="Benchmark repetitions (default: 2000)")
+    args = parser.parse_args(argv)
+    if args.bench is None:
+        parser.print_help()
+        return
+    bench(args.bench or None, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+# journal.py
+# operating history: every change of frequency, mode, bandwidth or trx is
+# recorded with the full rig state after it into an SQLite database, so
+# "where was I at 14:32" and "how long was I on 20m this week" can be
+# answered later.
+#
+# Recording only puts a row on a queue. A background thread owns the
+# database connection and writes whatever has queued up in one transaction,
+# at most every batch_interval seconds, so the XML-RPC threads never wait on
+# the disk. The database runs in WAL mode, so the query CLI can read it while
+# a tool is writing.
+#
+# Rows are only written on a change, so a followed rig also gets a heartbeat
+# row (same state, event "heartbeat") every heartbeat seconds and an "end"
+# row when the journal closes. A stretch on one band then lasts until the
+# next row of any kind; only a tool that died without its end row leaves a
+# gap, and band_time caps that at max_gap.
+#
+#   journal = open_journal("~/.local/state/kachina-tools/journal.db")
+#   journal.follow(rig_state, rig="kcat")
+#
+# Query it with:
+#   python journal.py at 14:32
+#   python journal.py --db journal.db bands --since 2024-06-01
+#   python journal.py history --since 18:00 --until 19:00
+# --db defaults to KACHINA_JOURNAL, then journal.db in the state directory.
+
+import argparse
+import atexit
+import datetime
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from bands import freq_to_band
+
+FIELDS = ("frequency", "mode", "bandwidth", "trx")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transitions (
+    ts REAL NOT NULL,
+    rig TEXT NOT NULL,
+    version INTEGER,
+    frequency REAL,
+    band TEXT,
+    mode TEXT,
+    bandwidth TEXT,
+    trx TEXT,
+    event TEXT NOT NULL DEFAULT 'change'  -- change, heartbeat or end
+);
+CREATE INDEX IF NOT EXISTS transitions_ts ON transitions (ts);
+CREATE INDEX IF NOT EXISTS transitions_band ON transitions (band, ts);
+"""
+
+INSERT = ("INSERT INTO transitions (ts, rig, version, frequency, band, mode, bandwidth, trx, event) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+def default_path():
+    base = os.environ.get("KACHINA_STATE_DIR",
+                          os.path.join(os.path.expanduser("~"), ".local", "state", "kachina-tools"))
+    return os.path.join(base, "journal.db")
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=10)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent, only the last batch is at risk
+    connection.executescript(SCHEMA)
+    return connection
+
+class Journal:
+    def __init__(self, path, batch_interval=1.0, maxsize=10000, heartbeat=60.0):
+        self.path = path
+        self.batch_interval = batch_interval
+        self.heartbeat = heartbeat
+        self.following = {}  # rig name -> RigState, for heartbeat and end rows
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.recorded = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+        self.stopping = threading.Event()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connect(path).close()  # create the schema now so errors show up at startup
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def record(self, rig, values, version=None, ts=None, event="change"):
+        # request path: builds a tuple and queues it, never blocks
+        frequency = values.get("frequency")
+        row = (ts if ts is not None else time.time(), rig, version, frequency, freq_to_band(frequency),
+               values.get("mode"), values.get("bandwidth"), values.get("trx"), event)
+        try:
+            self.queue.put_nowait(row)
+            self.recorded += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def follow(self, rig_state, rig="kcat"):
+        # one row per change of a journaled field, carrying the whole state
+        def listener(changes, version):
+            if any(field in changes for field in FIELDS):
+                self.record(rig, rig_state.snapshot(), version)
+        rig_state.subscribe(listener)
+        self.following[rig] = rig_state
+        current = rig_state.snapshot()
+        self.record(rig, current, current.version)  # where this run started
+
+    def _record_followed(self, event):
+        for rig, rig_state in list(self.following.items()):
+            current = rig_state.snapshot()
+            self.record(rig, current, current.version, event=event)
+
+    def _writer(self):
+        connection = connect(self.path)
+        next_heartbeat = time.monotonic() + self.heartbeat
+        while not (self.stopping.is_set() and self.queue.empty()):
+            if time.monotonic() >= next_heartbeat and not self.stopping.is_set():
+                self._record_followed("heartbeat")
+                next_heartbeat = time.monotonic() + self.heartbeat
+            try:
+                rows = [self.queue.get(timeout=self.batch_interval)]
+            except queue.Empty:
+                continue
+            if not self.stopping.is_set():
+                time.sleep(self.batch_interval)  # let the rest of the batch arrive
+            while True:
+                try:
+                    rows.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with connection:  # one transaction per batch
+                    connection.executemany(INSERT, rows)
+                self.written += len(rows)
+                self.batches += 1
+            except Exception as e:
+                self.failed += len(rows)
+                print(f"[journal] Write to {self.path} failed: {e}")
+        connection.close()
+
+    def close(self, timeout=5):
+        if self.stopping.is_set():
+            return
+        self._record_followed("end")  # queued before stopping, so the writer still drains it
+        self.stopping.set()
+        self.thread.join(timeout)
+
+    def stats(self):
+        return {
+            "recorded": self.recorded,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+def open_journal(path, batch_interval=1.0):
+    # failures here must never stop a tool from starting
+    try:
+        journal = Journal(os.path.expanduser(path), batch_interval=batch_interval)
+        print(f"[journal] Recording rig history to {journal.path}")
+        return journal
+    except Exception as e:
+        print(f"[journal] Unable to open {path}: {e}")
+        return None
+
+# --- queries ---
+
+def state_at(connection, ts, rig=None):
+    # the last change or end row at or before ts; event "end" means the tool had stopped
+    sql = ("SELECT ts, rig, frequency, band, mode, bandwidth, trx, event FROM transitions "
+           "WHERE ts <= ? AND event != 'heartbeat'")
+    args = [ts]
+    if rig:
+        sql += " AND rig = ?"
+        args.append(rig)
+    return connection.execute(sql + " ORDER BY ts DESC LIMIT 1", args).fetchone()
+
+def history(connection, since, until, rig=None):
+    sql = ("SELECT ts, rig, frequency, band, mode, bandwidth, trx, event FROM transitions "
+           "WHERE ts >= ? AND ts < ? AND event != 'heartbeat'")
+    args = [since, until]
+    if rig:
+        sql += " AND rig = ?"
+        args.append(rig)
+    return connection.execute(sql + " ORDER BY ts", args).fetchall()
+
+def band_time(connection, since, until, rig=None, max_gap=900):
+    # seconds spent per band and mode, and the number of changes; each row
+    # lasts until the next row of any kind for the same rig, and an end row
+    # lasts nothing. Heartbeats keep a running tool's rows closer together
+    # than max_gap, so the cap only cuts a session that ended without its end
+    # row. The row in effect at since counts from since on.
+    sql = """
+        SELECT band, mode,
+               SUM(MAX(0, MIN(COALESCE(next_ts, :until), :until, ts + :max_gap) - MAX(ts, :since))),
+               SUM(event = 'change')
+        FROM (SELECT ts, band, mode, event,
+                     LEAD(ts) OVER (PARTITION BY rig ORDER BY ts) AS next_ts
+              FROM transitions
+              WHERE ts < :until AND (:rig IS NULL OR rig = :rig))
+        WHERE event != 'end' AND (ts >= :since OR COALESCE(next_ts, :until) > :since)
+        GROUP BY band, mode
+        ORDER BY 3 DESC
+    """
+    return connection.execute(sql, {"since": since, "until": until, "rig": rig,
+                                    "max_gap": max_gap}).fetchall()
+
+def _parse_time(text):
+    # HH:MM (today), YYYY-MM-DD, YYYY-MM-DD HH:MM, or epoch seconds
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            pass
+    clock = datetime.datetime.strptime(text, "%H:%M").time()
+    return datetime.datetime.combine(datetime.date.today(), clock).timestamp()
+
+def _stamp(ts):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+
+def _format_row(row):
+    ts, rig, frequency, band, mode, bandwidth, trx, event = row
+    if event == "end":
+        return f"{_stamp(ts)}  {rig:<8} stopped"
+    return f"{_stamp(ts)}  {rig:<8} {frequency or 0:>12.1f}  {band:<6} {mode or '':<6} {bandwidth or '':<6} {trx or ''}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the rig history journal")
+    parser.add_argument("--db", default=os.environ.get("KACHINA_JOURNAL") or default_path(),
+                        help="Journal database (default: %(default)s)")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--rig", default=None, help="Only this rig (default: all)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    at = commands.add_parser("at", parents=[common], help="Where was I at a given time")
+    at.add_argument("when", type=_parse_time, help="HH:MM today, YYYY-MM-DD HH:MM or epoch seconds")
+    bands = commands.add_parser("bands", parents=[common], help="Time spent per band and mode")
+    bands.add_argument("--since", type=_parse_time, default=0.0)
+    bands.add_argument("--until", type=_parse_time, default=None)
+    history_cmd = commands.add_parser("history", parents=[common], help="List transitions")
+    history_cmd.add_argument("--since", type=_parse_time, default=0.0)
+    history_cmd.add_argument("--until", type=_parse_time, default=None)
+    args = parser.parse_args(argv)
+
+    connection = sqlite3.connect(f"file:{os.path.expanduser(args.db)}?mode=ro", uri=True)
+    if args.command == "at":
+        row = state_at(connection, args.when, args.rig)
+        print(_format_row(row) if row else f"Nothing recorded before {_stamp(args.when)}")
+    elif args.command == "bands":
+        until = args.until if args.until is not None else time.time()
+        for band, mode, seconds, changes in band_time(connection, args.since, until, args.rig):
+            print(f"{band:<8} {mode or '':<6} {seconds / 3600:8.2f} h  ({changes} changes)")
+    else:
+        until = args.until if args.until is not None else time.time()
+        for row in history(connection, args.since, until, args.rig):
+            print(_format_row(row))
+
+if __name__ == "__main__":
+    main()
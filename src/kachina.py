@@ -0,0 +1,96 @@
+# kachina.py
+# one entry point for the tools:
+#
+#   python src/kachina.py n3fjp [kcat2n3fjp options]
+#   python src/kachina.py proxy [xmlrpc_proxy_logger options]
+#   python src/kachina.py bridge [proxy options]    # proxy + pykeyer_kcat_bridge
+#   python src/kachina.py knob [proxy options]      # proxy + tuning_knob_callback
+#   python src/kachina.py proxy-n3fjp [proxy options]  # proxy feeding kcat2n3fjp in-process
+#   python src/kachina.py multirig rigs.ini
+#   python src/kachina.py test-server
+#   python src/kachina.py emulator [knob_emulator options]
+#
+# Only this file is loaded up front. A subcommand imports its tool when it
+# runs, so the XML-RPC, serial and SQLite modules of the other tools are
+# never imported, and restarting one tool after a rig or serial hiccup costs
+# the interpreter plus that tool's own imports. The import time is printed
+# on start; the tools print when they are ready.
+
+import os
+import sys
+import time
+
+LAUNCHED = time.perf_counter()
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def _plugin(name):
+    return f"{os.path.join(HERE, name)}:handle"
+
+# name -> (module, function taking argv, arguments put before the user's, help)
+COMMANDS = {
+    "n3fjp": ("kcat2n3fjp", "cli", [], "KCAT to N3FJP ACLog bridge"),
+    "proxy": ("xmlrpc_proxy_logger", "main", [], "XML-RPC proxy/logger with optional plugins"),
+    "bridge": ("xmlrpc_proxy_logger", "main",
+               ["--quiet", "--proxy-port", "7362", "--handler-only", _plugin("pykeyer_kcat_bridge.py")],
+               "Proxy running the pyKeyer bridge plugin (port 7365)"),
+    "knob": ("xmlrpc_proxy_logger", "main",
+             ["--quiet", "--proxy-port", "7362", "--handler-only", _plugin("tuning_knob_callback.py")],
+             "Proxy running the 505TK tuning knob plugin"),
+    "proxy-n3fjp": ("xmlrpc_proxy_logger", "main", ["--target-handler", _plugin("kcat2n3fjp.py")],
+                    "Proxy feeding kcat2n3fjp in-process (settings below)"),
+    "multirig": ("multirig", "main", [], "Several kcat2n3fjp rigs in one process"),
+    "test-server": ("xmlrpc_test", "main", [], "Generic XML-RPC server that logs what kcat sends"),
+    "emulator": ("knob_emulator", "main", [], "Virtual 505TK knob on a pseudo-terminal"),
+}
+
+# settings of in-process plugins, which have no command line of their own
+ENVIRONMENT = {
+    "proxy-n3fjp": [
+        ("KACHINA_N3FJP_HOST", "N3FJP host (default: localhost)"),
+        ("KACHINA_N3FJP_PORT", "N3FJP API port (default: 1100)"),
+        ("KACHINA_SNAPSHOT", "state snapshot; the default is the same file a standalone n3fjp uses, "
+                             "so don't run both with it"),
+        ("KACHINA_STATE_DIR", "directory of the default snapshot and journal (~/.local/state/kachina-tools)"),
+        ("KACHINA_FANOUT", "host:port of the real fldigi, like n3fjp --fanout"),
+        ("KACHINA_SMETER", "0 to not keep rig.set_smeter samples, like n3fjp --no_smeter"),
+        ("KACHINA_SMETER_FILE", "save the S-meter store here at exit"),
+        ("KACHINA_JOURNAL", "record the rig history (empty for the default database)"),
+        ("KACHINA_SHM_STATE", "publish the live rig state to this shared-memory file"),
+    ],
+}
+
+def usage():
+    print("usage: kachina.py COMMAND [options]\n\ncommands:")
+    for name, (module, _, _, text) in COMMANDS.items():
+        print(f"  {name:<12} {text} ({module}.py)")
+    for name, variables in ENVIRONMENT.items():
+        print(f"\n{name} is configured from the environment:")
+        for variable, text in variables:
+            print(f"  {variable:<20} {text}")
+    print("\nkachina.py COMMAND -h shows the options of a command.")
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        usage()
+        return 0
+    if argv[0] not in COMMANDS:
+        print(f"kachina.py: unknown command {argv[0]}\n")
+        usage()
+        return 2
+
+    name = argv[0]
+    module_name, function, fixed, _ = COMMANDS[name]
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)  # the tools import their siblings by name
+
+    started = time.perf_counter()
+    import importlib
+    module = importlib.import_module(module_name)
+    imported = time.perf_counter()
+    print(f"[kachina] {name}: {module_name} imported in {(imported - started) * 1000:.1f} ms "
+          f"({(imported - LAUNCHED) * 1000:.1f} ms since launch)", flush=True)
+    return getattr(module, function)(fixed + argv[1:])
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,19 @@
 from xmlrpc.server import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+import xmlrpc.client
+import os
 import signal
 import sys
+import threading
 
 from enum import IntEnum
 import argparse
 
+from rig_state import RigState
+
 import time
 program_start_time = time.time()
 
 IGNORED_METHODS = {
-    'rig.set_smeter',
     'main.set_wf_sideband',
     # Add more if needed
 }
@@ -25,6 +29,10 @@ class DebugLevel(IntEnum):
 DEBUG_LEVEL = DebugLevel.NONE
 
 LOGGER = None
+SNAPSHOT = None
+HANDLER = None
+JOURNAL = None
+SERVER = None
 
 def debug_print(level, *args, **kwargs):
     if level <= DEBUG_LEVEL:
@@ -33,41 +41,87 @@ def debug_print(level, *args, **kwargs):
         print(f"{timestamp} [{DEBUG_LEVEL.name}]:", *args, **kwargs)
 
 method_log = {}
-last_state = {
+DEFAULT_STATE = {
     "frequency": 7000.0,
     "mode": "CW",
     "bandwidth": "500"
 }
-
-BAND_TABLE = [
-    (1800000, 2000000, "160m"),
-    (3500000, 4000000, "80m"),
-    (5330500, 5405500, "60m"),
-    (7000000, 7300000, "40m"),
-    (10100000, 10150000, "30m"),
-    (14000000, 14350000, "20m"),
-    (18068000, 18168000, "17m"),
-    (21000000, 21450000, "15m"),
-    (24890000, 24990000, "12m"),
-    (28000000, 29700000, "10m"),
-    (50000000, 54000000, "6m"),
-    (144000000, 148000000, "2m"),
-    (222000000, 225000000, "1.25m"),
-    (420000000, 450000000, "70cm")
-]
-
-def freq_to_band(freq):
-    try:
-        freq = int(freq)
-    except:
-        return "Unknown"
-    for low, high, name in BAND_TABLE:
-        if low <= freq < high:
-            return name
-    return "Unknown"
+last_state = RigState(**DEFAULT_STATE)
+
+class RigMetrics:
+    def __init__(self):
+        self.calls = {}
+        self.errors = 0
+        self.busy = 0.0  # seconds spent handling calls
+        self.started = time.time()
+
+    def record(self, method, elapsed):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        self.busy += elapsed
+
+    def summary(self):
+        total = sum(self.calls.values())
+        uptime = max(time.time() - self.started, 1e-9)
+        return {
+            "calls": total,
+            "errors": self.errors,
+            "calls_per_s": round(total / uptime, 2),
+            "avg_ms": round(self.busy * 1000 / total, 3) if total else 0.0,
+            "busy_pct": round(self.busy * 100 / uptime, 3),
+        }
 
 class KCATHandler:
+    def __init__(self, state=None, logger=None, snapshot=None, name="kcat"):
+        # state defaults to the module's last_state (single rig); multirig.py
+        # passes one RigState per rig
+        self.state = last_state if state is None else state
+        self.logger = logger
+        self.snapshot = snapshot
+        if snapshot:
+            snapshot.follow(self.state)
+        self.name = name
+        self.fanout = None       # set by start_fanout()
+        self.upstream = None     # the real fldigi, in fan-out mode
+        self.logger_sink = None  # if set, logger updates are handed off instead of sent inline
+        self.smeter = None       # SmeterStore that keeps rig.set_smeter, if set
+        self.metrics = RigMetrics()
+        self.batch = threading.local()  # per thread: inside a multicall, logger update owed
+
+    def restore(self):
+        saved = self.snapshot.load() if self.snapshot else None
+        if not saved:
+            debug_print(DebugLevel.WARN, f"[{self.name}] No saved state, using defaults")
+            return False
+        self.state.update(**{key: saved[key] for key in self.state.fields() if saved.get(key) not in (None, "")})
+        current = self.state.snapshot()
+        debug_print(DebugLevel.WARN, f"[{self.name}] Restored state from {self.snapshot.path}: {dict(current)}")
+        if self.logger:
+            self.logger.assume_state(current["frequency"], current["mode"])
+        return True
+
+    def update_logger(self):
+        if not self.logger:
+            return
+        if getattr(self.batch, "active", False):
+            self.batch.pending = True  # sent once when the multicall ends
+            return
+        current = self.state.snapshot()
+        if self.logger_sink:
+            self.logger_sink.offer(self.name, (current["frequency"], current["mode"]))
+        else:
+            self.logger.update_from_state(current["frequency"], current["mode"])
+
     def _dispatch(self, method, params):
+        start = time.perf_counter()
+        try:
+            return self.dispatch_call(method, params)
+        except Exception:
+            self.metrics.errors += 1
+            raise
+        finally:
+            self.metrics.record(method, time.perf_counter() - start)
+
+    def dispatch_call(self, method, params):
         if (DEBUG_LEVEL >= DebugLevel.VERBOSE):
             if method not in method_log:
                 method_log[method] = []
@@ -75,14 +129,11 @@ class KCATHandler:
 
         debug_print(DebugLevel.VERBOSE, f"Method: {method}, Params: {params}", flush=True)
 
+        if self.upstream:
+            return self.forward(method, params)
+
         if method == "system.multicall":
-            results = []
-            for call in params[0]:  # list of dicts
-                inner_method = call.get("methodName")
-                inner_params = call.get("params", [])
-                result = self.handle_individual_call(inner_method, inner_params)
-                debug_print(DebugLevel.TRACE, f"{inner_method} returned: {result}")
-                results.append([result])  # Wrap in list per XML-RPC spec
+            results = self.handle_multicall(params[0])
             debug_print(DebugLevel.TRACE, f"{method} returned: {results}")
             return results
         else:
@@ -90,6 +141,73 @@ class KCATHandler:
             debug_print(DebugLevel.TRACE, f"{method} returned: {result}")
             return result
 
+    def handle_call(self, method, params):
+        # one call or a whole multicall, applied to the local state
+        if method == "system.multicall":
+            return self.handle_multicall(params[0])
+        return self.handle_individual_call(method, params)
+
+    def handle_multicall(self, calls):
+        # the batch is applied as one state transaction, and the logger hears
+        # about it once at the end instead of once per setter
+        results = []
+        self.batch.active, self.batch.pending = True, False
+        try:
+            with self.state.transaction():
+                for call in calls:  # list of dicts
+                    inner_method = call.get("methodName")
+                    inner_params = call.get("params", [])
+                    try:
+                        result = self.handle_individual_call(inner_method, inner_params)
+                    except xmlrpc.client.Fault as fault:
+                        results.append({"faultCode": fault.faultCode, "faultString": fault.faultString})
+                        continue
+                    except Exception as e:
+                        debug_print(DebugLevel.ERR, f"{inner_method} failed in multicall: {e}")
+                        results.append({"faultCode": 1, "faultString": f"{type(e).__name__}: {e}"})
+                        continue
+                    debug_print(DebugLevel.TRACE, f"{inner_method} returned: {result}")
+                    results.append([result])  # Wrap in list per XML-RPC spec
+        finally:
+            self.batch.active = False
+        if self.batch.pending:
+            self.update_logger()
+        return results
+
+    def forward(self, method, params):
+        # fan-out mode: the sinks (N3FJP, pyKeyer, ...) get the call without
+        # kcat waiting for them, kcat only waits for the real fldigi
+        self.record_smeter(method, params)
+        self.fanout.publish(method, params)
+        try:
+            result = getattr(self.upstream, method)(*params)
+        except xmlrpc.client.Fault:
+            raise  # fldigi's own answer, pass it back to kcat
+        except Exception as e:
+            debug_print(DebugLevel.ERR, f"fldigi call {method} failed: {e}, answering locally")
+            return self.answer_locally(method, params)
+        debug_print(DebugLevel.TRACE, f"{method} returned from fldigi: {result}")
+        return result
+
+    def record_smeter(self, method, params):
+        if not self.smeter:
+            return
+        if method == "system.multicall" and params and isinstance(params[0], list):
+            for call in params[0]:
+                self.record_smeter(call.get("methodName"), call.get("params", []))
+        elif method == "rig.set_smeter" and len(params) > 0:
+            self.smeter.add(time.time(), self.state["frequency"], params[0])
+
+    def answer_locally(self, method, params):
+        # used when fldigi is unreachable: getters come from self.state, which
+        # the n3fjp sink keeps current; setters were already published
+        if method == "system.multicall":
+            return [[self.answer_locally(call.get("methodName"), call.get("params", []))]
+                    for call in params[0]]
+        if ".get_" in method:
+            return self.handle_individual_call(method, params)
+        return None
+
     def handle_individual_call(self, method, params):
         debug_print(DebugLevel.VERBOSE, f"Handling: {method} {params}", flush=True)
 
@@ -115,42 +233,40 @@ class KCATHandler:
 
         elif method == 'rig.set_frequency' and len(params) > 0:
             new_freq = params[0]
-            old_freq = last_state["frequency"]
+            old_freq = self.state.set("frequency", new_freq)
             debug_print(DebugLevel.VERBOSE, f"{method} received, new frequency is {params}, frequency was {old_freq}", flush=True)
             if new_freq != old_freq:
-                last_state["frequency"] = new_freq
                 debug_print(DebugLevel.WARN, f"FREQ CHANGE: {new_freq} Hz", flush=True)
 
             # send frequency change to N3FJP
-            LOGGER.update_from_state(last_state["frequency"], last_state["mode"])
+            self.update_logger()
 
             return old_freq
 
         elif method == 'rig.set_mode' and len(params) > 0:
             new_mode = params[0]
-            old_mode = last_state["mode"]
+            old_mode = self.state.set("mode", new_mode)
             debug_print(DebugLevel.VERBOSE, f"{method} received, new mode is {params}, mode was {old_mode}", flush=True)
             if new_mode != old_mode:
-                last_state["mode"] = new_mode
                 debug_print(DebugLevel.WARN, f"MODE CHANGE: from {old_mode} to {new_mode}", flush=True)
 
             # send mode change to N3FJP
-            LOGGER.update_from_state(last_state["frequency"], last_state["mode"])
+            self.update_logger()
 
             return None
 
         elif method == 'rig.set_bandwidth' and len(params) > 0:
             new_bw = params[0]
-            old_bw = last_state["bandwidth"]
+            old_bw = self.state.set("bandwidth", new_bw)
             debug_print(DebugLevel.VERBOSE, f"{method} received, new mobandwidth is {params}, bandwidth was {old_bw}", flush=True)
             if new_bw != old_bw:
-                last_state["bandwidth"] = new_bw
                 debug_print(DebugLevel.WARN, f"BANDWIDTH CHANGE: from {old_bw} to {new_bw}", flush=True)
             return None
 
         elif method == 'rig.set_smeter' and len(params) > 0:
-            # don't care about this one
-            debug_print(DebugLevel.VERBOSE, f"{method} received, parms {params}, ignoring", flush=True)
+            debug_print(DebugLevel.VERBOSE, f"{method} received, parms {params}", flush=True)
+            if self.smeter:
+                self.smeter.add(time.time(), self.state["frequency"], params[0])
             return None
 
         elif method == 'main.set_wf_sideband' and len(params) > 0:
@@ -163,17 +279,17 @@ class KCATHandler:
             return "RX"
 
         elif method == 'main.get_frequency':
-            old_freq = last_state["frequency"]
+            old_freq = self.state["frequency"]
             debug_print(DebugLevel.VERBOSE, f"{method} received, returning {old_freq}", flush=True)
             return old_freq
 
         elif method == 'rig.get_mode':
-            old_mode = last_state["mode"]
+            old_mode = self.state["mode"]
             debug_print(DebugLevel.VERBOSE, f"{method} received, returning {old_mode}", flush=True)
             return old_mode
 
         elif method == 'rig.get_bandwidth':
-            old_bw = last_state["bandwidth"]
+            old_bw = self.state["bandwidth"]
             debug_print(DebugLevel.VERBOSE, f"{method} received, returning {old_bw}", flush=True)
             return old_bw
 
@@ -240,7 +356,15 @@ class LoggerClient:
             self.send_and_expect_ack(message)
             self.last_freq = freq_hz
 
+    def assume_state(self, freq, mode):
+        # the logger was already told about this state before a restart
+        from bands import freq_to_band
+        self.last_band = freq_to_band(freq).replace("m", "")
+        self.last_mode = mode
+        self.last_freq = freq
+
     def update_from_state(self, freq, mode):
+        from bands import freq_to_band
         band = freq_to_band(freq)
         self.send_band_mode(band=band.replace("m", ""), mode=mode)
         self.send_frequency(freq)
@@ -252,31 +376,163 @@ def print_summary():
             print(f"\nMethod: {method}")
             for i, args in enumerate(args_list, start=1):
                 print(f"  [{i}] args: {args}")
+    if HANDLER:
+        print(f"\n--- Metrics ---\n  {HANDLER.metrics.summary()}")
+    if HANDLER and HANDLER.smeter:
+        print(f"\n--- S-meter store ---\n  {HANDLER.smeter.stats()}")
+    if SERVER and hasattr(SERVER, "codec_stats"):
+        print(f"\n--- Codec ---\n  {SERVER.codec_stats}")
+    if JOURNAL:
+        print(f"\n--- Journal ---\n  {JOURNAL.stats()}")
+    if HANDLER and HANDLER.fanout:
+        print("\n--- Fan-out sink summary ---")
+        for name, stats in HANDLER.fanout.stats().items():
+            print(f"  {name}: {stats}")
     print("\nShutting down server.")
     sys.exit(0)
 
-def main(kcat_host, kcat_port, logger_host, logger_port):
-    server = SimpleXMLRPCServer(
+class TimeoutTransport(xmlrpc.client.Transport):
+    # a hung fldigi must not hold kcat's request forever; forward() answers
+    # locally when the call times out
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        connection.timeout = self.timeout
+        return connection
+
+def n3fjp_wants(method):
+    # the n3fjp sink only needs calls that change the rig state; getters
+    # change nothing and the S-meter is recorded by forward() itself
+    return method not in IGNORED_METHODS and method != "rig.set_smeter" and ".get_" not in method
+
+def start_fanout(handler, fldigi_host, fldigi_port, pykeyer_host=None, pykeyer_port=None, queue_size=256,
+                 timeout=2.0):
+    from fanout import FanOut, Sink, PyKeyerForwarder, COALESCE
+    handler.upstream = xmlrpc.client.ServerProxy(f"http://{fldigi_host}:{fldigi_port}", allow_none=True,
+                                                 transport=TimeoutTransport(timeout))
+    handler.fanout = FanOut()
+    # the n3fjp sink keeps the handler's state (and the snapshot) current and
+    # talks to the logger; while the logger is down, queued setters collapse
+    # to the latest value per method instead of pushing each other out.
+    # Multicalls stay whole, so each batch is still one logger update
+    handler.fanout.register(Sink("n3fjp", handler.handle_call, maxsize=queue_size,
+                                 policy=COALESCE, accept=n3fjp_wants, batches=True))
+    if pykeyer_port:
+        handler.fanout.register(Sink("pykeyer", PyKeyerForwarder(pykeyer_host, pykeyer_port),
+                                     maxsize=queue_size, policy=COALESCE,
+                                     accept=lambda method: method in ("rig.set_frequency", "rig.set_mode")))
+    return handler.fanout
+
+def setup_handler(logger_host, logger_port, snapshot_path=None, smeter=True, smeter_path=None,
+                  journal_path=None, shm_state_path=None):
+    # the single-rig HANDLER with its logger, snapshot and optional stores;
+    # main() serves it over XML-RPC, handle() calls it in-process
+    global LOGGER, SNAPSHOT, HANDLER, JOURNAL
+    LOGGER = LoggerClient(logger_host, logger_port)
+    if snapshot_path:
+        from rig_snapshot import open_snapshot
+        SNAPSHOT = open_snapshot(snapshot_path)
+
+    HANDLER = KCATHandler(last_state, LOGGER, SNAPSHOT)
+    if SNAPSHOT:
+        HANDLER.restore()
+    if smeter:
+        from smeter_store import SmeterStore, save_at_exit
+        HANDLER.smeter = SmeterStore()
+        if smeter_path:
+            save_at_exit(HANDLER.smeter, smeter_path)
+    if journal_path is not None:
+        import journal
+        JOURNAL = journal.open_journal(journal_path or journal.default_path())
+        if JOURNAL:
+            JOURNAL.follow(last_state)
+    if shm_state_path:
+        from shm_state import open_publisher
+        publisher = open_publisher(shm_state_path)
+        if publisher:
+            publisher.follow(last_state)
+    return HANDLER
+
+handler_lock = threading.Lock()
+
+def handle(method, params):
+    # plugin entry point, so the proxy can feed this bridge in-process instead
+    # of over a second HTTP hop:
+    #   python xmlrpc_proxy_logger.py --target-handler kcat2n3fjp.py:handle
+    # Configured like the other plugins, from the environment (kachina.py -h
+    # lists them): KACHINA_N3FJP_HOST, KACHINA_N3FJP_PORT, KACHINA_SNAPSHOT,
+    # KACHINA_SMETER (0 turns the store off), KACHINA_SMETER_FILE,
+    # KACHINA_JOURNAL, KACHINA_SHM_STATE and KACHINA_FANOUT (host:port of the
+    # real fldigi, like --fanout).
+    if HANDLER is None:
+        with handler_lock:
+            if HANDLER is None:
+                from rig_snapshot import default_path
+                setup_handler(os.environ.get("KACHINA_N3FJP_HOST", "localhost"),
+                              int(os.environ.get("KACHINA_N3FJP_PORT", "1100")),
+                              os.environ.get("KACHINA_SNAPSHOT", default_path("kcat2n3fjp")),
+                              smeter=os.environ.get("KACHINA_SMETER", "1") != "0",
+                              smeter_path=os.environ.get("KACHINA_SMETER_FILE"),
+                              journal_path=os.environ.get("KACHINA_JOURNAL"),
+                              shm_state_path=os.environ.get("KACHINA_SHM_STATE"))
+                fldigi = os.environ.get("KACHINA_FANOUT")
+                if fldigi:
+                    fldigi_host, _, fldigi_port = fldigi.rpartition(":")
+                    start_fanout(HANDLER, fldigi_host or "localhost", int(fldigi_port))
+                    print(f"[n3fjp] Fan-out: forwarding to fldigi at {fldigi}")
+                print(f"[n3fjp] Feeding N3FJP at {LOGGER.host}:{LOGGER.port} in-process")
+    return HANDLER._dispatch(method, params)
+
+def main(kcat_host, kcat_port, logger_host, logger_port, snapshot_path=None,
+         fanout=False, fldigi_host="localhost", fldigi_port=7363, fldigi_timeout=2.0,
+         pykeyer_host="localhost", pykeyer_port=None, shm_state_path=None,
+         smeter=True, smeter_path=None, journal_path=None, fast_codec=False, capture_path=None):
+    server_class = SimpleXMLRPCServer
+    if fast_codec or capture_path:
+        from fast_xmlrpc import FastXMLRPCServer, open_capture
+        server_class = FastXMLRPCServer
+    server = server_class(
         (kcat_host, kcat_port),
         requestHandler=SimpleXMLRPCRequestHandler,
         allow_none=True,
         logRequests=False
     )
-    server.register_instance(KCATHandler())
+    if fast_codec or capture_path:
+        server.fast_codec = fast_codec
+        server.capture = open_capture(capture_path) if capture_path else None
 
-    global LOGGER
-    LOGGER = LoggerClient(logger_host, logger_port)
+    global SERVER
+    SERVER = server
+    setup_handler(logger_host, logger_port, snapshot_path, smeter, smeter_path, journal_path, shm_state_path)
+    if fanout:
+        start_fanout(HANDLER, fldigi_host, fldigi_port, pykeyer_host, pykeyer_port, timeout=fldigi_timeout)
+    server.register_instance(HANDLER)
 
     print(f"KCAT XML-RPC Server listening on {kcat_host}:{kcat_port}")
     print(f"Logger target will be {logger_host}:{logger_port}")
+    if SNAPSHOT:
+        print(f"State snapshot is {SNAPSHOT.path}")
+    if HANDLER.smeter:
+        print("S-meter samples are kept" + (f", saved to {smeter_path} at exit" if smeter_path else ""))
+    if HANDLER.fanout:
+        print(f"Fan-out mode: forwarding to fldigi at {fldigi_host}:{fldigi_port}, "
+              f"sinks: {', '.join(sink.name for sink in HANDLER.fanout.sinks)}")
+    if fast_codec:
+        print("Using the fast XML-RPC codec")
+    if capture_path:
+        print(f"Capturing request bodies to {capture_path}")
     print(f"Debug level is {DEBUG_LEVEL.name} ({DEBUG_LEVEL})")
-    print("Ctrl+C to stop and show summary.")
+    print(f"Ready in {(time.time() - program_start_time) * 1000:.0f} ms. Ctrl+C to stop and show summary.")
 
     signal.signal(signal.SIGINT, lambda sig, frame: print_summary())
 
     server.serve_forever()
 
-if __name__ == "__main__":
+def cli(argv=None):
+    from rig_snapshot import default_path
     parser = argparse.ArgumentParser(description="KCAT to N3FJP: KCAT XMLRPC calls are forwarded to n3fjp client API")
     parser.add_argument("--debug", choices=[lvl.name for lvl in DebugLevel], default="NONE",
                         help="Set debug level (default: NONE)")
@@ -288,8 +544,39 @@ if __name__ == "__main__":
                         help="Host for logger connection (default: localhost)")
     parser.add_argument("--logger_port", type=int, default=1100,
                         help="Port for logger connection (default: 1100)")
-
-    args = parser.parse_args()
+    parser.add_argument("--snapshot", default=default_path("kcat2n3fjp"),
+                        help="State snapshot file used for warm restarts (default: %(default)s)")
+    parser.add_argument("--no_snapshot", action="store_true",
+                        help="Start from default state and don't save a snapshot")
+    parser.add_argument("--fanout", action="store_true",
+                        help="Forward KCAT calls to the real fldigi and feed N3FJP (and other sinks) in parallel")
+    parser.add_argument("--fldigi_host", default="localhost",
+                        help="Host of the real fldigi in fan-out mode (default: localhost)")
+    parser.add_argument("--fldigi_port", type=int, default=7363,
+                        help="XML-RPC port of the real fldigi in fan-out mode (default: 7363)")
+    parser.add_argument("--fldigi_timeout", type=float, default=2.0,
+                        help="Seconds to wait for fldigi before answering kcat locally (default: 2)")
+    parser.add_argument("--pykeyer_host", default="localhost",
+                        help="Host of pykeyer_kcat_bridge in fan-out mode (default: localhost)")
+    parser.add_argument("--pykeyer_port", type=int, default=None,
+                        help="Port of pykeyer_kcat_bridge, enables the pyKeyer sink in fan-out mode (e.g. 7365)")
+    parser.add_argument("--shm_state", default=None,
+                        help="Publish the live rig state to this shared-memory file for shm_state_reader.py "
+                             "(e.g. /dev/shm/kachina-rig-state)")
+    parser.add_argument("--smeter_file", default=None,
+                        help="Save the S-meter store here at exit, read it with smeter_store.py")
+    parser.add_argument("--no_smeter", action="store_true",
+                        help="Discard rig.set_smeter instead of keeping the samples")
+    parser.add_argument("--journal", nargs="?", const="", default=None,
+                        help="Record band/mode/frequency changes in an SQLite journal "
+                             "(default file if no path given: ~/.local/state/kachina-tools/journal.db)")
+    parser.add_argument("--fast_codec", action="store_true",
+                        help="Parse kcat's calls and build answers with fast_xmlrpc.py (falls back to xmlrpc.client)")
+    parser.add_argument("--capture", default=None,
+                        help="Append every XML-RPC request body to this file (JSON lines) for fast_xmlrpc.py --bench")
+
+    args = parser.parse_args(argv)
+    global DEBUG_LEVEL
     DEBUG_LEVEL = DebugLevel[args.debug]
 
     # Pass args to main()
@@ -297,5 +584,21 @@ if __name__ == "__main__":
         kcat_host=args.kcat_host,
         kcat_port=args.kcat_port,
         logger_host=args.logger_host,
-        logger_port=args.logger_port
+        logger_port=args.logger_port,
+        snapshot_path=None if args.no_snapshot else args.snapshot,
+        fanout=args.fanout,
+        fldigi_host=args.fldigi_host,
+        fldigi_port=args.fldigi_port,
+        fldigi_timeout=args.fldigi_timeout,
+        pykeyer_host=args.pykeyer_host,
+        pykeyer_port=args.pykeyer_port,
+        shm_state_path=args.shm_state,
+        smeter=not args.no_smeter,
+        smeter_path=args.smeter_file,
+        journal_path=args.journal,
+        fast_codec=args.fast_codec,
+        capture_path=args.capture
     )
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,292 @@
+# knob_capture.py
+# raw 505TK captures and offline analysis of them, for tuning the
+# scale_from_speed() acceleration curves of 505TKtester.py and
+# tuning_knob_callback.py against real spinning instead of by feel.
+#
+#   python 505TKtester.py --capture spin.kcap          # record while testing
+#   python knob_capture.py analyze spin.kcap --curve tester --curve 0.2:1,0.08:8,0.03:40,200
+#   python knob_capture.py synth big.kcap --packets 2000000
+#   python knob_emulator.py --replay spin.kcap         # play it back with its timing
+#
+# A capture is a 32 byte header followed by fixed 16 byte records: the
+# time.monotonic_ns() at which a serial read returned, how many bytes it
+# returned, and up to 6 of them (longer reads take several records, each
+# stamped with the arrival of its own last byte). At 1200 baud the port
+# rarely has more than a byte waiting, so fixed records cost little and let
+# NumPy load a capture with one frombuffer() instead of a loop.
+#
+# analyze decodes the whole capture at once, with the same rules as
+# KnobDecoder (sync on D6, back-dating bytes by the line rate), then reports
+# the interval between movement packets, the knob speed in counts per
+# second, and what each acceleration curve would have made of it. NumPy is
+# only imported for analyze and synth.
+
+import argparse
+import os
+import struct
+import time
+
+from knob_decoder import BYTE_TIME
+
+MAGIC = b"KTC1"
+HEADER_FORMAT = "<4sIdq8x"  # magic, version, byte time (s), wall clock (ns) at start
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+VERSION = 1
+RECORD_FORMAT = "<qH6s"     # arrival (monotonic ns), bytes used, bytes
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+RECORD_BYTES = 6
+
+# the step curves the tools use now, as "seconds:scale,...,fastest scale":
+# a movement more than `seconds` after the previous one gets `scale`
+CURVES = {
+    "tester": "0.1:1,0.05:4,0.025:16,64",   # 505TKtester.py
+    "knob": "0.3:1,0.1:10,0.03:100,1000",   # tuning_knob_callback.py
+}
+
+MAX_DELTA_T = 0.999  # both tools clip the interval to this
+
+class CaptureWriter:
+    def __init__(self, path, byte_time=BYTE_TIME, flush_interval=1.0):
+        self.path = path
+        self.byte_time_ns = int(byte_time * 1e9)
+        self.flush_interval_ns = int(flush_interval * 1e9)
+        self.f = open(path, "wb")
+        self.f.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, byte_time, time.time_ns()))
+        self.last_flush = time.monotonic_ns()
+        self.records = 0
+        self.bytes = 0
+
+    def write(self, data, arrival_ns=None):
+        if arrival_ns is None:
+            arrival_ns = time.monotonic_ns()
+        pack = struct.pack
+        end = len(data)
+        while end > 0:
+            start = max(0, end - RECORD_BYTES)
+            # bytes after this chunk arrived later, so this chunk's last byte came earlier
+            self.f.write(pack(RECORD_FORMAT, arrival_ns - (len(data) - end) * self.byte_time_ns,
+                              end - start, bytes(data[start:end])))
+            self.records += 1
+            end = start
+        self.bytes += len(data)
+        if arrival_ns - self.last_flush >= self.flush_interval_ns:
+            self.f.flush()
+            self.last_flush = arrival_ns
+
+    def close(self):
+        if not self.f.closed:
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_header(f):
+    magic, version, byte_time, started_ns = struct.unpack(HEADER_FORMAT, f.read(HEADER_SIZE))
+    if magic != MAGIC:
+        raise ValueError(f"{getattr(f, 'name', 'input')} is not a knob capture")
+    if version != VERSION:
+        raise ValueError(f"Unsupported knob capture version {version}")
+    return byte_time, started_ns
+
+def is_capture(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def records(path):
+    # (arrival ns, bytes) in file order, without NumPy; the emulator replays these.
+    # Chunks of one long read come out last chunk first, so sort by arrival
+    # when the order matters.
+    with open(path, "rb") as f:
+        read_header(f)
+        while True:
+            record = f.read(RECORD_SIZE)
+            if len(record) < RECORD_SIZE:
+                return
+            arrival_ns, used, data = struct.unpack(RECORD_FORMAT, record)
+            yield arrival_ns, data[:used]
+
+# --- NumPy analysis ---
+
+def load(path):
+    # every captured byte and its arrival time in seconds, in arrival order
+    import numpy as np
+    with open(path, "rb") as f:
+        byte_time, _ = read_header(f)
+        raw = f.read()
+    count = len(raw) // RECORD_SIZE
+    rows = np.frombuffer(raw, dtype=[("t", "<i8"), ("n", "<u2"), ("data", "u1", RECORD_BYTES)], count=count)
+    byte_ns = int(byte_time * 1e9)
+    used = rows["n"].astype(np.int64)
+    data = rows["data"][np.arange(RECORD_BYTES) < used[:, None]]
+    # each byte is back-dated from its record's arrival by its distance to the record's last byte
+    first = np.cumsum(used) - used
+    times = np.repeat(rows["t"] - (used - 1) * byte_ns, used) + \
+        (np.arange(len(data)) - np.repeat(first, used)) * byte_ns
+    if len(times) > 1 and (np.diff(times) < 0).any():  # only long reads split into chunks
+        order = np.argsort(times, kind="stable")
+        times, data = times[order], data[order]
+    return times * 1e-9, data
+
+def decode(times, data):
+    # KnobDecoder on whole arrays: a packet is a sync byte (D6 set) followed by
+    # two bytes without it; anything else is a resync or a stray byte.
+    # Returns (timestamp of each packet's last byte, dx).
+    import numpy as np
+    b = data & 0x7F
+    sync = (b & 0x40) != 0
+    if len(b) < 3:
+        return times[:0], np.zeros(0, dtype=np.int8)
+    start = np.flatnonzero(sync[:-2] & ~sync[1:-1] & ~sync[2:])
+    dx = (b[start + 1] & 0x3F).astype(np.int8)
+    dx[dx >= 32] -= 64
+    return times[start + 2], dx
+
+def parse_curve(spec):
+    # "0.1:1,0.05:4,0.025:16,64" or a name from CURVES -> (thresholds, scales)
+    text = CURVES.get(spec, spec)
+    steps = [part.strip() for part in text.split(",") if part.strip()]
+    thresholds = []
+    scales = []
+    for step in steps[:-1]:
+        seconds, scale = step.split(":")
+        thresholds.append(float(seconds))
+        scales.append(float(scale))
+    scales.append(float(steps[-1]))
+    if thresholds != sorted(thresholds, reverse=True):
+        raise ValueError(f"Curve thresholds must go from slow to fast: {spec}")
+    return thresholds, scales
+
+def movement_intervals(timestamps, dx):
+    # as the tools see them: interval to the previous movement, clipped, 0 for the first
+    import numpy as np
+    moving = dx != 0
+    t = timestamps[moving]
+    dx = dx[moving].astype(np.int64)
+    dt = np.zeros(len(t))
+    dt[1:] = np.minimum(np.diff(t), MAX_DELTA_T)
+    return dt, dx
+
+def simulate(dt, dx, curve):
+    # per-packet step of the curve (0 = fastest) and scaled movement; the first movement is x1
+    import numpy as np
+    thresholds, scales = curve
+    # thresholds strictly below dt = how many steps slower than the fastest
+    step = np.searchsorted(np.array(thresholds[::-1]), dt, side="left")
+    scale = np.array(scales[::-1])[step]
+    if len(scale):
+        scale[0] = 1
+    return step, dx * scale
+
+INTERVAL_EDGES_MS = (10, 25, 30, 50, 100, 300, 600)
+SPEED_EDGES = (3, 10, 30, 100, 300, 1000)  # counts per second
+
+def _histogram(values, edges, unit):
+    import numpy as np
+    counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+    labels = [f"<{edges[0]}{unit}"] + [f"{lo}-{hi}{unit}" for lo, hi in zip(edges, edges[1:])] + \
+             [f">={edges[-1]}{unit}"]
+    return list(zip(labels, counts.tolist()))
+
+def analyze(times, data, curves):
+    import numpy as np
+    timestamps, dx = decode(times, data)
+    dt, moves = movement_intervals(timestamps, dx)
+    result = {
+        "bytes": len(data),
+        "packets": len(dx),
+        "movements": len(moves),
+        "seconds": float(times[-1] - times[0]) if len(times) else 0.0,
+        "counts": int(np.abs(moves).sum()),
+    }
+    intervals = dt[1:] * 1000
+    if len(intervals):
+        result["interval_ms"] = {f"p{p}": round(float(v), 1)
+                                 for p, v in zip((10, 50, 90, 99), np.percentile(intervals, (10, 50, 90, 99)))}
+        result["interval_histogram"] = _histogram(intervals, INTERVAL_EDGES_MS, "ms")
+        speed = np.abs(moves[1:]) / np.maximum(dt[1:], 1e-3)
+        result["speed_histogram"] = _histogram(speed, SPEED_EDGES, "/s")
+    result["curves"] = {}
+    for name in curves:
+        curve = parse_curve(name)
+        step, scaled = simulate(dt, moves, curve)
+        steps = np.bincount(step, minlength=len(curve[1]))
+        if len(step):
+            steps[step[0]] -= 1  # the first movement is always x1
+        per_scale = {}
+        for scale, count in zip([1.0] + curve[1][::-1], [min(len(step), 1)] + steps.tolist()):
+            if count:
+                per_scale[f"x{scale:g}"] = per_scale.get(f"x{scale:g}", 0) + count
+        result["curves"][name] = {
+            "net": float(scaled.sum()),
+            "travel": float(np.abs(scaled).sum()),
+            "gain": float(np.abs(scaled).sum() / max(result["counts"], 1)),
+            "max_step": float(np.abs(scaled).max()) if len(scaled) else 0.0,
+            "scales": per_scale,
+        }
+    return result
+
+def synthesize(path, packets, seed=1):
+    # a capture of `packets` knob packets mixing the emulator's slow, medium
+    # and fast spins, one read per packet, written without a Python loop
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    kind = rng.choice(3, size=packets, p=(0.1, 0.3, 0.6))
+    gap = np.where(kind == 0, rng.uniform(0.35, 0.6, packets),
+                   np.where(kind == 1, rng.uniform(0.05, 0.1, packets), 0.0))
+    dx = np.where(kind == 2, rng.integers(2, 7, packets), 1) * np.where(rng.random(packets) < 0.5, 1, -1)
+    arrival = np.cumsum(gap + 3 * BYTE_TIME)
+    raw = (dx & 0xFF).astype(np.uint8)
+    rows = np.zeros(packets, dtype=[("t", "<i8"), ("n", "<u2"), ("data", "u1", RECORD_BYTES)])
+    rows["t"] = (arrival * 1e9).astype(np.int64) + time.monotonic_ns()
+    rows["n"] = 3
+    rows["data"][:, 0] = 0x40 | ((raw >> 6) & 0x03)
+    rows["data"][:, 1] = raw & 0x3F
+    with open(path, "wb") as f:
+        f.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, BYTE_TIME, time.time_ns()))
+        f.write(rows.tobytes())
+
+def print_report(path, result, elapsed):
+    print(f"{path}: {result['bytes']} bytes, {result['packets']} packets, "
+          f"{result['movements']} movements, {result['counts']} counts over {result['seconds']:.1f} s "
+          f"(analyzed in {elapsed * 1000:.0f} ms)")
+    if "interval_ms" in result:
+        print(f"\ninterval between movements: {result['interval_ms']}")
+        for label, count in result["interval_histogram"]:
+            print(f"  {label:>10} {count:>10}")
+        print("\nknob speed (counts per second):")
+        for label, count in result["speed_histogram"]:
+            print(f"  {label:>10} {count:>10}")
+    print("\ncurves:")
+    for name, curve in result["curves"].items():
+        print(f"  {name}: net {curve['net']:.0f}, travel {curve['travel']:.0f} "
+              f"(x{curve['gain']:.1f} the raw counts), largest step {curve['max_step']:.0f}, "
+              f"packets per scale {curve['scales']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="505TK knob captures and acceleration curve analysis")
+    commands = parser.add_subparsers(dest="command", required=True)
+    analyze_cmd = commands.add_parser("analyze", help="Intervals, speeds and curve simulation for a capture")
+    analyze_cmd.add_argument("path", help="Capture file from 505TKtester.py --capture")
+    analyze_cmd.add_argument("--curve", action="append",
+                             help=f"Curve to simulate, 'seconds:scale,...,scale' or one of {', '.join(CURVES)} "
+                                  f"(default: all of those; may be repeated)")
+    synth_cmd = commands.add_parser("synth", help="Write a synthetic capture for benchmarking")
+    synth_cmd.add_argument("path")
+    synth_cmd.add_argument("--packets", type=int, default=1000000, help="Packets (default: 1000000)")
+    synth_cmd.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.command == "synth":
+        synthesize(args.path, args.packets, args.seed)
+        print(f"Wrote {args.packets} packets to {args.path} ({os.path.getsize(args.path)} bytes)")
+        return
+    start = time.perf_counter()
+    times, data = load(args.path)
+    result = analyze(times, data, args.curve or list(CURVES))
+    print_report(args.path, result, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# knob_decoder.py
+# shared decoder for the 505TK tuning knob, which talks the Microsoft serial
+# mouse protocol at 1200 baud 7N1. Used by tuning_knob_callback.py and
+# 505TKtester.py.
+#
+# Interpreting the three byte packets:
+#         D7      D6      D5      D4      D3      D2      D1      D0
+#
+# Byte 1  X       1       LB      RB      Y7      Y6      X7      X6
+# Byte 2  X       0       X5      X4      X3      X2      X1      X0
+# Byte 3  X       0       Y5      Y4      Y3      Y2      Y1      Y0
+#
+# LB is the state of the left button (1 means down)
+# RB is the state of the right button (1 means down)
+# X7-X0 movement in X direction since last packet (signed byte)
+# Y7-Y0 movement in Y direction since last packet (signed byte)
+#
+# D6 marks the first byte of a packet, which is what KnobDecoder resyncs on:
+# a sync byte in the middle of a packet abandons the partial packet, and
+# continuation bytes seen while not in a packet are discarded.
+#
+# Run "python knob_decoder.py --bench [capture]" to compare the streaming
+# decoder against the old byte-at-a-time loop.
+
+import argparse
+import random
+import tempfile
+import time
+from collections import namedtuple
+
+PORT = "/dev/ttyUSB3"
+BAUD = 1200
+BYTE_TIME = 9 / BAUD  # start + 7 data + stop bits, 7.5 ms per byte
+
+KnobEvent = namedtuple("KnobEvent", "timestamp dx b1 b2 b3")
+
+def decode_signed_x(b1, b2):
+    b1 &= 0x03
+    val = b2 + (b1 << 6)
+    val &= 0x3F
+    return val - 64 if val >= 32 else val
+
+def parse_mouse_packet(packet):
+    if len(packet) != 3:
+        return None
+    b1, b2, b3 = packet
+    if b1 & 0x40 == 0:
+        return None  # Invalid packet start
+    dx = decode_signed_x(b1, b2)
+    return b1, b2, b3, dx
+
+def encode_packet(dx, left=False, right=False):
+    # inverse of parse_mouse_packet for the movements the knob produces (-32..31)
+    dx = max(-32, min(31, int(dx))) & 0xFF
+    b1 = 0x40 | (0x20 if left else 0) | (0x10 if right else 0) | ((dx >> 6) & 0x03)
+    return bytes((b1, dx & 0x3F, 0))
+
+class KnobDecoder:
+    def __init__(self, byte_time=BYTE_TIME):
+        self.byte_time = byte_time
+        self.packet = bytearray()
+        self.packets = 0
+        self.bad_bytes = 0  # continuation bytes with no packet to belong to
+        self.resyncs = 0    # partial packets abandoned for a new sync byte
+
+    def feed(self, data, arrival_time=None):
+        # decode whatever bytes are available; arrival_time is when the last
+        # byte of data arrived, earlier bytes are back-dated by the line rate
+        if arrival_time is None:
+            arrival_time = time.monotonic()
+        events = []
+        packet = self.packet
+        first = arrival_time - (len(data) - 1) * self.byte_time
+        byte_time = self.byte_time
+        for i, b in enumerate(data):
+            b &= 0x7F  # Ignore D7
+            if b & 0x40:
+                if packet:
+                    self.resyncs += 1
+                    packet.clear()
+                packet.append(b)
+            elif packet:
+                packet.append(b)
+                if len(packet) == 3:
+                    b1, b2, b3 = packet
+                    packet.clear()
+                    dx = b2 & 0x3F  # decode_signed_x, inlined
+                    events.append(KnobEvent(first + i * byte_time,
+                                            dx - 64 if dx >= 32 else dx, b1, b2, b3))
+            else:
+                self.bad_bytes += 1
+        self.packets += len(events)
+        return events
+
+    def stats(self):
+        return {"packets": self.packets, "bad_bytes": self.bad_bytes, "resyncs": self.resyncs}
+
+def open_port(port=PORT, timeout=1):
+    import serial
+    return serial.Serial(port, BAUD, bytesize=serial.SEVENBITS,
+                         parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE, timeout=timeout)
+
+def read_events(ser, decoder, active=lambda: True, capture=None):
+    # one read per burst of bytes instead of one per byte; blocks (up to the
+    # port timeout) for the first byte, then takes everything already waiting.
+    # capture is an optional knob_capture.CaptureWriter that gets every read.
+    while active():
+        data = ser.read(ser.in_waiting or 1)
+        if data:
+            arrival_ns = time.monotonic_ns()
+            if capture:
+                capture.write(data, arrival_ns)
+            yield from decoder.feed(data, arrival_ns / 1e9)
+
+def _legacy_decode(stream):
+    # the per-byte loop both tools used before, kept for the benchmark
+    buffer = bytearray()
+    count = 0
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            return count
+        b = byte[0] & 0x7F
+        if b & 0x40:
+            buffer = bytearray([b])
+        else:
+            buffer.append(b)
+        if len(buffer) == 3:
+            if parse_mouse_packet(buffer):
+                count += 1
+            buffer.clear()
+
+def _streaming_decode(stream, chunk):
+    decoder = KnobDecoder()
+    count = 0
+    while True:
+        data = stream.read(chunk)
+        if not data:
+            return count
+        count += len(decoder.feed(data, 0.0))
+
+def synthetic_stream(packets, noise=0.001, seed=1):
+    rng = random.Random(seed)
+    out = bytearray()
+    for _ in range(packets):
+        out += encode_packet(rng.randint(-8, 8))
+        if rng.random() < noise:
+            out.append(rng.randrange(0x80))
+    return bytes(out)
+
+def bench(data, chunk=64, repeat=3):
+    # reads go through an unbuffered file so that, as with the serial port,
+    # every read() is a system call
+    print(f"{len(data)} bytes")
+    with tempfile.TemporaryFile() as f:
+        f.write(data)
+        for label, run in (("byte-at-a-time", lambda s: _legacy_decode(s)),
+                           (f"streaming, {chunk}-byte reads", lambda s: _streaming_decode(s, chunk))):
+            best = None
+            for _ in range(repeat):
+                f.seek(0)
+                stream = open(f.fileno(), "rb", buffering=0, closefd=False)
+                start = time.perf_counter()
+                count = run(stream)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"  {label:<28} {count:>9} packets  {best * 1000:8.1f} ms  "
+                  f"{len(data) / best / 1e6:6.2f} MB/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="505TK knob decoder")
+    parser.add_argument("--bench", nargs="?", const="", metavar="CAPTURE",
+                        help="Benchmark decoding a raw byte capture (or a synthetic stream)")
+    parser.add_argument("--packets", type=int, default=200000,
+                        help="Packets in the synthetic stream (default: 200000)")
+    parser.add_argument("--chunk", type=int, default=64,
+                        help="Read size for the streaming decoder (default: 64)")
+    args = parser.parse_args()
+    if args.bench is None:
+        parser.print_help()
+    else:
+        if args.bench:
+            with open(args.bench, "rb") as f:
+                data = f.read()
+        else:
+            data = synthetic_stream(args.packets)
+        bench(data, chunk=args.chunk)
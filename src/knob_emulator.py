@@ -0,0 +1,222 @@
+# knob_emulator.py
+# a virtual 505TK on a pseudo-terminal, for exercising the knob code without
+# the hardware. Writes Microsoft serial mouse packets to the pty master at
+# the 1200 baud 7N1 byte rate; point the tools at the slave side:
+#
+#   python knob_emulator.py --link /tmp/ttyKNOB --profile slow,fast,burst,reverse --repeat 0
+#   KACHINA_KNOB_PORT=/tmp/ttyKNOB python xmlrpc_proxy_logger.py --handler-only tuning_knob_callback.py:handle
+#   python 505TKtester.py --port /tmp/ttyKNOB
+#
+# Spin profiles:
+#   slow     single ticks 0.35-0.6 s apart
+#   medium   single ticks 50-100 ms apart
+#   fast     packets back to back at line rate, 2-6 counts each
+#   burst    0.3 s fast spins separated by 0.5 s pauses
+#   reverse  fast spins that change direction every 0.4 s
+#
+# --noise P corrupts roughly that fraction of packets (stray byte, lost byte
+# or flipped bit), --replay FILE sends a captured byte stream instead (a raw
+# byte file at line rate, or a knob_capture.py capture with its timing), and
+# --measure reads the pty back through KnobDecoder and reports decode
+# latency and the packet interval histogram that drives acceleration.
+
+import argparse
+import os
+import random
+import select
+import termios
+import threading
+import time
+import tty
+
+from knob_decoder import KnobDecoder, encode_packet, BYTE_TIME
+
+PROFILES = ("slow", "medium", "fast", "burst", "reverse")
+
+def profile_packets(name, duration, rng):
+    # yields (pause before the packet, dx) until duration seconds are used up
+    elapsed = 0.0
+    direction = 1
+    packet_time = 3 * BYTE_TIME
+    while elapsed < duration:
+        if name == "slow":
+            gap, dx = rng.uniform(0.35, 0.6), direction
+        elif name == "medium":
+            gap, dx = rng.uniform(0.05, 0.1), direction
+        elif name == "fast":
+            gap, dx = 0.0, direction * rng.randint(2, 6)
+        elif name == "burst":
+            gap, dx = (0.5 if elapsed % 0.8 > 0.3 else 0.0), direction * rng.randint(2, 6)
+        elif name == "reverse":
+            direction = 1 if int(elapsed / 0.4) % 2 == 0 else -1
+            gap, dx = 0.0, direction * rng.randint(2, 6)
+        else:
+            raise ValueError(f"Unknown profile {name}, expected one of {PROFILES}")
+        elapsed += gap + packet_time
+        yield gap, dx
+
+class KnobEmulator:
+    def __init__(self, noise=0.0, seed=None, link=None):
+        self.master, self.slave = os.openpty()
+        # raw 1200 baud 7N1 on the slave, as the knob's real port would be
+        tty.setraw(self.slave)
+        attrs = termios.tcgetattr(self.slave)
+        attrs[2] = (attrs[2] & ~(termios.CSIZE | termios.PARENB | termios.CSTOPB)) | termios.CS7
+        attrs[4] = attrs[5] = termios.B1200
+        termios.tcsetattr(self.slave, termios.TCSANOW, attrs)
+        self.name = os.ttyname(self.slave)
+        self.link = link
+        if link:
+            if os.path.islink(link):
+                os.unlink(link)
+            os.symlink(self.name, link)
+        self.noise = noise
+        self.rng = random.Random(seed)
+        self.next_byte = time.monotonic()
+        self.sent = []  # (time the packet's last byte went out, dx)
+        self.corrupted = 0
+
+    def _write_paced(self, data):
+        for b in data:
+            now = time.monotonic()
+            if self.next_byte > now:
+                time.sleep(self.next_byte - now)
+            os.write(self.master, bytes((b,)))
+            self.next_byte = max(self.next_byte, now) + BYTE_TIME
+
+    def send_packet(self, dx):
+        packet = bytearray(encode_packet(dx))
+        if self.noise and self.rng.random() < self.noise:
+            self.corrupted += 1
+            damage = self.rng.choice(("stray", "lost", "flip"))
+            if damage == "stray":
+                packet.insert(self.rng.randrange(4), self.rng.randrange(0x80))
+            elif damage == "lost":
+                del packet[self.rng.randrange(3)]
+            else:
+                packet[self.rng.randrange(3)] ^= 1 << self.rng.randrange(7)
+        self._write_paced(packet)
+        self.sent.append((time.monotonic(), dx))
+
+    def pause(self, seconds):
+        self.next_byte = max(self.next_byte, time.monotonic()) + seconds
+
+    def run_profile(self, name, duration):
+        for gap, dx in profile_packets(name, duration, self.rng):
+            if gap:
+                self.pause(gap)
+            self.send_packet(dx)
+
+    def replay(self, data):
+        self._write_paced(data)
+
+    def replay_capture(self, path):
+        # a knob_capture.py file, with the gaps between reads as recorded
+        from knob_capture import records
+        first = None
+        start = time.monotonic()
+        for arrival_ns, data in sorted(records(path), key=lambda record: record[0]):
+            first = arrival_ns if first is None else first
+            self.next_byte = max(self.next_byte, start + (arrival_ns - first) / 1e9 - (len(data) - 1) * BYTE_TIME)
+            self._write_paced(data)
+
+    def close(self):
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+        os.close(self.master)
+        os.close(self.slave)
+
+class PtyReader(threading.Thread):
+    # reads the slave side the way the tools do (whatever is waiting, at once)
+    def __init__(self, fd):
+        super().__init__(daemon=True)
+        self.fd = fd
+        self.decoder = KnobDecoder()
+        self.received = []  # (arrival time, event)
+        self.running = True
+
+    def run(self):
+        while self.running:
+            ready, _, _ = select.select([self.fd], [], [], 0.1)
+            if not ready:
+                continue
+            data = os.read(self.fd, 1024)
+            arrival = time.monotonic()
+            for event in self.decoder.feed(data, arrival):
+                self.received.append((arrival, event))
+
+def _percentiles(values, points=(50, 90, 99)):
+    values = sorted(values)
+    return {f"p{p}": round(values[min(len(values) - 1, len(values) * p // 100)] * 1000, 2) for p in points}
+
+def report(emulator, reader):
+    print(f"\nsent {len(emulator.sent)} packets ({emulator.corrupted} corrupted), "
+          f"decoded {len(reader.received)}, decoder {reader.decoder.stats()}")
+    if not emulator.corrupted and len(emulator.sent) == len(reader.received):
+        latency = [arrival - sent for (sent, _), (arrival, _) in zip(emulator.sent, reader.received)]
+        stamp_error = [abs(event.timestamp - sent) for (sent, _), (_, event) in zip(emulator.sent, reader.received)]
+        mismatched = sum(dx != event.dx for (_, dx), (_, event) in zip(emulator.sent, reader.received))
+        print(f"decode latency ms: {_percentiles(latency)}")
+        print(f"timestamp error ms: {_percentiles(stamp_error)}")
+        print(f"dx mismatches: {mismatched}")
+    intervals = [b.timestamp - a.timestamp for (_, a), (_, b) in zip(reader.received, reader.received[1:])
+                 if b.dx != 0]
+    edges = (0.025, 0.03, 0.05, 0.1, 0.3)  # the thresholds used by both tools' scale_from_speed
+    counts = [0] * (len(edges) + 1)
+    for dt in intervals:
+        counts[sum(dt > edge for edge in edges)] += 1
+    labels = [f"<={int(edges[0] * 1000)}ms"] + \
+             [f"{int(lo * 1000)}-{int(hi * 1000)}ms" for lo, hi in zip(edges, edges[1:])] + \
+             [f">{int(edges[-1] * 1000)}ms"]
+    print("packet intervals: " + ", ".join(f"{label}: {n}" for label, n in zip(labels, counts)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Virtual 505TK tuning knob on a pseudo-terminal")
+    parser.add_argument("--profile", default="slow,fast,burst,reverse",
+                        help=f"Comma separated spin profiles from {', '.join(PROFILES)}")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per profile (default: 3)")
+    parser.add_argument("--repeat", type=int, default=1, help="Times to run the profiles, 0 = forever (default: 1)")
+    parser.add_argument("--noise", type=float, default=0.0, help="Fraction of packets to corrupt (default: 0)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for repeatable runs")
+    parser.add_argument("--replay", help="Send this captured byte stream instead of profiles")
+    parser.add_argument("--link", help="Symlink to create for the pty slave, e.g. /tmp/ttyKNOB")
+    parser.add_argument("--measure", action="store_true", help="Read the stream back and report decode latency")
+    parser.add_argument("--wait", type=float, default=0.0, help="Seconds to wait before sending, to start a tool")
+    args = parser.parse_args(argv)
+
+    emulator = KnobEmulator(noise=args.noise, seed=args.seed, link=args.link)
+    print(f"505TK emulator on {emulator.name}" + (f" ({args.link})" if args.link else ""), flush=True)
+    reader = None
+    if args.measure:
+        reader = PtyReader(os.open(emulator.name, os.O_RDONLY | os.O_NOCTTY))
+        reader.start()
+    time.sleep(args.wait)
+
+    try:
+        if args.replay:
+            from knob_capture import is_capture
+            if is_capture(args.replay):
+                emulator.replay_capture(args.replay)
+            else:
+                with open(args.replay, "rb") as f:
+                    emulator.replay(f.read())
+        else:
+            profiles = args.profile.split(",")
+            count = 0
+            while args.repeat == 0 or count < args.repeat:
+                for name in profiles:
+                    print(f"[emulator] {name} for {args.duration:.1f} s", flush=True)
+                    emulator.run_profile(name.strip(), args.duration)
+                count += 1
+        time.sleep(0.2)  # let the last bytes drain
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if reader:
+            reader.running = False
+            reader.join()
+            report(emulator, reader)
+        emulator.close()
+
+if __name__ == "__main__":
+    main()
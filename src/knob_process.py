@@ -0,0 +1,141 @@
+# knob_process.py
+# runs the 505TK serial reading and decoding in its own process, so packet
+# timestamps are taken without competing for the GIL with the proxy's
+# XML-RPC threads. Decoded events cross to the handler through EventRing, a
+# single-producer single-consumer ring buffer in a shared memory-mapped file:
+# the reader only ever advances head, the handler only ever advances tail,
+# so neither side takes a lock. Timestamps are time.monotonic(), which is
+# the same clock in both processes.
+#
+# Started by tuning_knob_callback.py when KACHINA_KNOB_PROCESS=1; can also be
+# run by hand:  python knob_process.py --ring /dev/shm/knob.ring --port /dev/ttyUSB3
+
+import argparse
+import atexit
+import mmap
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+from knob_decoder import KnobDecoder, KnobEvent, open_port, read_events, PORT
+
+MAGIC = b"KNR1"
+HEADER_FORMAT = "<4sI"   # magic, capacity
+HEAD_OFFSET = 8          # u64, written by the reader process only
+TAIL_OFFSET = 16         # u64, written by the handler only
+DROPPED_OFFSET = 24      # u64, events lost because the ring was full
+HEADER_SIZE = 64
+SLOT_FORMAT = "<di3Bx"   # timestamp, dx, b1, b2, b3
+SLOT_SIZE = struct.calcsize(SLOT_FORMAT)
+POLL_INTERVAL = 0.002    # consumer sleep when the ring is empty
+
+def _shm_dir():
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+class EventRing:
+    def __init__(self, path, capacity=1024, create=False):
+        self.path = path
+        if create:
+            with open(path, "wb") as f:
+                f.write(struct.pack(HEADER_FORMAT, MAGIC, capacity).ljust(HEADER_SIZE, b"\0"))
+                f.write(b"\0" * (capacity * SLOT_SIZE))
+        with open(path, "r+b") as f:
+            self.mm = mmap.mmap(f.fileno(), 0)
+        magic, self.capacity = struct.unpack_from(HEADER_FORMAT, self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a knob event ring")
+
+    def _get(self, offset):
+        return struct.unpack_from("<Q", self.mm, offset)[0]
+
+    def put(self, event):
+        # producer side; drops (and counts) the event if the handler is that far behind
+        head = self._get(HEAD_OFFSET)
+        if head - self._get(TAIL_OFFSET) >= self.capacity:
+            struct.pack_into("<Q", self.mm, DROPPED_OFFSET, self._get(DROPPED_OFFSET) + 1)
+            return False
+        struct.pack_into(SLOT_FORMAT, self.mm, HEADER_SIZE + (head % self.capacity) * SLOT_SIZE,
+                         event.timestamp, event.dx, event.b1, event.b2, event.b3)
+        struct.pack_into("<Q", self.mm, HEAD_OFFSET, head + 1)  # publish after the slot is written
+        return True
+
+    def take(self):
+        # consumer side; returns every event published so far
+        head = self._get(HEAD_OFFSET)
+        tail = self._get(TAIL_OFFSET)
+        events = []
+        while tail < head:
+            events.append(KnobEvent(*struct.unpack_from(
+                SLOT_FORMAT, self.mm, HEADER_SIZE + (tail % self.capacity) * SLOT_SIZE)))
+            tail += 1
+        if events:
+            struct.pack_into("<Q", self.mm, TAIL_OFFSET, tail)
+        return events
+
+    def dropped(self):
+        return self._get(DROPPED_OFFSET)
+
+    def close(self):
+        self.mm.close()
+
+class KnobProcess:
+    # handler side: owns the ring file and the reader subprocess
+    def __init__(self, port=PORT, capacity=1024):
+        self.port = port
+        self.path = os.path.join(_shm_dir(), f"kachina-knob-{os.getpid()}.ring")
+        self.ring = EventRing(self.path, capacity, create=True)
+        self.proc = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        # a fresh interpreter rather than multiprocessing: the proxy's main
+        # module can't safely be re-imported or forked with its threads running
+        self.proc = subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                                      "--ring", self.path, "--port", self.port])
+        atexit.register(self.stop)
+        print(f"[knob] Reader process {self.proc.pid} listening on {self.port}, ring {self.path}")
+
+    def events(self, active=lambda: True):
+        while active():
+            events = self.ring.take()
+            if events:
+                yield from events
+            elif self.proc.poll() is not None:
+                raise RuntimeError(f"reader process exited with status {self.proc.returncode}")
+            else:
+                time.sleep(POLL_INTERVAL)
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            self.proc.wait(timeout=2)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+def run_reader(ring_path, port):
+    ring = EventRing(ring_path)
+    parent = os.getppid()
+    decoder = KnobDecoder()
+    with open_port(port) as ser:
+        # port timeout is 1 s, so a vanished parent is noticed within a second
+        for event in read_events(ser, decoder, lambda: os.getppid() == parent):
+            ring.put(event)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="505TK reader process feeding a shared-memory event ring")
+    parser.add_argument("--ring", required=True, help="Ring file created by the handler")
+    parser.add_argument("--port", default=PORT, help=f"Serial port of the knob (default: {PORT})")
+    args = parser.parse_args()
+    try:
+        run_reader(args.ring, args.port)
+    except KeyboardInterrupt:
+        pass
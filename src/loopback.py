@@ -0,0 +1,129 @@
+# loopback.py
+# in-process stand-in for xmlrpc.client.ServerProxy, so the tools can be
+# chained inside one process: method names and params go to the next stage
+# as Python objects, with no HTTP request and no XML in between. Only the
+# real edges (kcat, fldigi, N3FJP) stay on the network.
+#
+#   target = LoopbackProxy(handler)      # a KCATHandler, a plugin's handle, ...
+#   target.rig.set_frequency(14070000.0)
+#   xmlrpc.client.MultiCall(target)      # works too
+#
+# The target is called the way SimpleXMLRPCServer would call it: its
+# _dispatch(method, params) if it has one, otherwise target(method, params).
+# Exceptions come back as xmlrpc.client.Fault with the same code and text
+# the server would have sent. Params are passed as they are, not copied, so
+# stages must not modify the params they are given (none of ours do).
+#
+# The proxy uses it for --target-handler, e.g. kcat -> proxy -> kcat2n3fjp
+# in one process:
+#   python xmlrpc_proxy_logger.py --target-handler kcat2n3fjp.py:handle
+#
+# python loopback.py --bench compares one hop over HTTP with the same hop
+# through LoopbackProxy.
+
+import argparse
+import threading
+import time
+from xmlrpc.client import Fault, ServerProxy
+
+class _Method:
+    def __init__(self, call, name):
+        self._call = call
+        self._name = name
+
+    def __getattr__(self, name):
+        return _Method(self._call, f"{self._name}.{name}")
+
+    def __call__(self, *params):
+        return self._call(self._name, params)
+
+class LoopbackProxy:
+    def __init__(self, target):
+        self._dispatch = getattr(target, "_dispatch", target)
+        self._target = target
+        self._calls = 0
+
+    def _call(self, method, params):
+        self._calls += 1
+        try:
+            return self._dispatch(method, params)
+        except Fault:
+            raise
+        except Exception as exc:
+            raise Fault(1, "%s:%s" % (type(exc), exc))  # what SimpleXMLRPCDispatcher sends
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Method(self._call, name)
+
+    def __repr__(self):
+        return f"<LoopbackProxy for {self._target!r}>"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+# --- benchmark ---
+
+def kcat_calls():
+    # what kcat sends in a typical second: polls, a tuning step and a batch
+    multicall = [{"methodName": "rig.set_frequency", "params": [14070100.0]},
+                 {"methodName": "rig.set_mode", "params": ["USB"]},
+                 {"methodName": "rig.set_bandwidth", "params": ["2400"]}]
+    return [
+        ("main.get_trx_state", ()),
+        ("main.get_frequency", ()),
+        ("rig.get_mode", ()),
+        ("rig.set_frequency", (14070000.0,)),
+        ("rig.set_smeter", (42,)),
+        ("system.multicall", (multicall,)),
+    ]
+
+def _time(proxy, calls, repeat):
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for method, params in calls:
+                getattr(proxy, method)(*params)
+        elapsed = (time.perf_counter() - start) / (repeat * len(calls))
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1e6
+
+def bench(repeat=500):
+    # one kcat2n3fjp hop (no logger attached) served both ways
+    from xmlrpc.server import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+    from kcat2n3fjp import KCATHandler, DEFAULT_STATE
+    from rig_state import RigState
+
+    handler = KCATHandler(RigState(**DEFAULT_STATE))
+    server = SimpleXMLRPCServer(("localhost", 0), requestHandler=SimpleXMLRPCRequestHandler,
+                                allow_none=True, logRequests=False)
+    server.register_instance(handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    calls = kcat_calls()
+    try:
+        http = _time(ServerProxy(f"http://localhost:{server.server_address[1]}", allow_none=True), calls, repeat)
+        loopback = _time(LoopbackProxy(handler), calls, repeat)
+    finally:
+        server.shutdown()
+    print(f"{len(calls)} kcat-like calls x {repeat}, per call into KCATHandler:")
+    print(f"  HTTP on localhost   {http:8.1f} us")
+    print(f"  LoopbackProxy       {loopback:8.1f} us")
+    print(f"  saved per hop       {http - loopback:8.1f} us ({http / loopback:.0f}x)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="In-process XML-RPC loopback between the tools")
+    parser.add_argument("--bench", action="store_true", help="Compare a hop over HTTP with a loopback hop")
+    parser.add_argument("--repeat", type=int, default=500, help="Benchmark repetitions (default: 500)")
+    args = parser.parse_args(argv)
+    if not args.bench:
+        parser.print_help()
+        return
+    bench(args.repeat)
+
+if __name__ == "__main__":
+    main()
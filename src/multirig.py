@@ -0,0 +1,199 @@
+# multirig.py
+# hosts several named rig instances in one process. Each rig gets its own
+# KCAT XML-RPC port, state, snapshot and logger (or fldigi upstream in
+# fan-out mode). One selector loop on the main thread accepts connections
+# on all of the ports and hands each one to its rig's worker thread, so a
+# slow client, a slow fldigi or a stuck logger holds up only its own rig,
+# while each rig's calls are still handled one at a time and in order.
+# Logger updates for every rig go through one shared sink thread, which
+# keeps only the latest update per rig, so adding a rig adds a socket, a
+# thread and a few dicts, not an interpreter.
+#
+# Rigs are described in an INI file, one section per rig:
+#
+#   [main]
+#   port = 7362
+#   logger_port = 1100
+#
+#   [test]
+#   port = 7462
+#   logger_port = 0        ; no logger for this one
+#   fanout = yes           ; forward to a real fldigi at fldigi_host:fldigi_port
+#   fldigi_port = 7463
+#
+# Keys: host, port, logger_host, logger_port, snapshot (path or "none"),
+# fanout, fldigi_host, fldigi_port, fldigi_timeout (seconds, default 2), pykeyer_host, pykeyer_port,
+# shm_state (shared-memory file for shm_state_reader.py, off by default),
+# smeter (keep rig.set_smeter samples, default yes), smeter_file (saved at exit),
+# journal (SQLite history file; rigs naming the same file share one writer),
+# fast_codec (parse kcat's calls with fast_xmlrpc.py, default no)
+
+import argparse
+import configparser
+import queue
+import selectors
+import signal
+import sys
+import threading
+import time
+from xmlrpc.server import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+
+import kcat2n3fjp
+from kcat2n3fjp import KCATHandler, LoggerClient, DebugLevel, start_fanout
+from fanout import Sink, COALESCE
+from rig_snapshot import open_snapshot, default_path
+from rig_state import RigState
+from shm_state import open_publisher
+from smeter_store import SmeterStore, save_at_exit
+
+class RigRequestHandler(SimpleXMLRPCRequestHandler):
+    # a client that stalls mid-request gives up its rig's worker after this
+    timeout = 5
+
+class RigHost:
+    def __init__(self, logger_queue_size=1024):
+        self.selector = selectors.DefaultSelector()
+        self.rigs = {}     # name -> (handler, server)
+        self.requests = {} # name -> queue of accepted connections for the rig's worker
+        self.journals = {} # path -> Journal
+        # one worker thread sends logger updates for all rigs; updates are
+        # keyed by rig name, so a burst from one rig replaces its own pending
+        # update and never pushes out another rig's
+        self.logger_sink = Sink("loggers", self._update_logger,
+                                maxsize=logger_queue_size, policy=COALESCE)
+        self.logger_sink.start()
+
+    def _update_logger(self, name, params):
+        handler, _ = self.rigs[name]
+        handler.logger.update_from_state(*params)
+
+    def add_rig(self, name, host, port, logger=None, snapshot=None, state=None, fast_codec=False):
+        handler = KCATHandler(state=state if state is not None else RigState(**kcat2n3fjp.DEFAULT_STATE),
+                              logger=logger, snapshot=snapshot, name=name)
+        handler.logger_sink = self.logger_sink
+        if snapshot:
+            handler.restore()
+        server_class = SimpleXMLRPCServer
+        if fast_codec:
+            from fast_xmlrpc import FastXMLRPCServer
+            server_class = FastXMLRPCServer
+        server = server_class((host, port), requestHandler=RigRequestHandler,
+                              allow_none=True, logRequests=False)
+        server.register_instance(handler)
+        self.selector.register(server, selectors.EVENT_READ, name)
+        self.rigs[name] = (handler, server)
+        self.requests[name] = queue.Queue()
+        threading.Thread(target=self._rig_worker, args=(server, self.requests[name]),
+                         name=f"rig-{name}", daemon=True).start()
+        return handler
+
+    def _rig_worker(self, server, requests):
+        # reads, dispatches and answers one connection at a time for one rig
+        while True:
+            request, client_address = requests.get()
+            try:
+                server.process_request(request, client_address)
+            except Exception:
+                server.handle_error(request, client_address)
+                server.shutdown_request(request)
+
+    def journal(self, path):
+        if path not in self.journals:
+            from journal import open_journal
+            self.journals[path] = open_journal(path)
+        return self.journals[path]
+
+    def print_metrics(self):
+        for name, (handler, server) in self.rigs.items():
+            print(f"  {name} (port {server.server_address[1]}): {handler.metrics.summary()}")
+            if hasattr(server, "codec_stats"):
+                print(f"    codec: {server.codec_stats}")
+            if handler.smeter:
+                print(f"    smeter: {handler.smeter.stats()}")
+            if handler.fanout:
+                for sink_name, stats in handler.fanout.stats().items():
+                    print(f"    sink {sink_name}: {stats}")
+        print(f"  shared logger sink: {self.logger_sink.stats()}")
+        for path, journal in self.journals.items():
+            if journal:
+                print(f"  journal {path}: {journal.stats()}")
+
+    def serve_forever(self, metrics_interval=None):
+        next_report = time.time() + metrics_interval if metrics_interval else None
+        while True:
+            timeout = max(next_report - time.time(), 0) if next_report else None
+            for key, _ in self.selector.select(timeout):
+                handler, server = self.rigs[key.data]
+                try:
+                    request, client_address = server.get_request()  # readable, so this doesn't block
+                except OSError:
+                    continue
+                self.requests[key.data].put((request, client_address))
+            if next_report and time.time() >= next_report:
+                print(f"--- Rig metrics at {time.strftime('%H:%M:%S')} ---")
+                self.print_metrics()
+                next_report = time.time() + metrics_interval
+
+def load_rigs(host, config_path):
+    config = configparser.ConfigParser()
+    if not config.read(config_path):
+        raise SystemExit(f"Unable to read rig config {config_path}")
+
+    for name in config.sections():
+        rig = config[name]
+        logger_port = rig.getint("logger_port", 1100)
+        logger = LoggerClient(rig.get("logger_host", "localhost"), logger_port) if logger_port else None
+
+        snapshot_path = rig.get("snapshot", default_path(f"rig-{name}"))
+        snapshot = open_snapshot(snapshot_path) if snapshot_path.lower() != "none" else None
+
+        handler = host.add_rig(name, rig.get("host", "localhost"), rig.getint("port"),
+                               logger=logger, snapshot=snapshot, fast_codec=rig.getboolean("fast_codec", False))
+        if rig.getboolean("smeter", True):
+            handler.smeter = SmeterStore()
+            if rig.get("smeter_file"):
+                save_at_exit(handler.smeter, rig.get("smeter_file"))
+        if rig.get("journal"):
+            journal = host.journal(rig.get("journal"))
+            if journal:
+                journal.follow(handler.state, rig=name)
+        if rig.get("shm_state"):
+            publisher = open_publisher(rig.get("shm_state"))
+            if publisher:
+                publisher.follow(handler.state)
+        if rig.getboolean("fanout", False):
+            start_fanout(handler,
+                         rig.get("fldigi_host", "localhost"), rig.getint("fldigi_port", 7363),
+                         rig.get("pykeyer_host", "localhost"), rig.getint("pykeyer_port", 0) or None,
+                         timeout=rig.getfloat("fldigi_timeout", 2.0))
+
+        print(f"Rig {name}: KCAT XML-RPC on {rig.get('host', 'localhost')}:{rig.getint('port')}, "
+              + (f"fldigi at {rig.get('fldigi_host', 'localhost')}:{rig.getint('fldigi_port', 7363)}"
+                 if handler.fanout else
+                 f"logger {rig.get('logger_host', 'localhost')}:{logger_port}" if logger else "no logger"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve several kcat2n3fjp rig instances from one process")
+    parser.add_argument("config", help="INI file with one section per rig")
+    parser.add_argument("--debug", choices=[lvl.name for lvl in DebugLevel], default="NONE",
+                        help="Set debug level (default: NONE)")
+    parser.add_argument("--metrics_interval", type=float, default=None,
+                        help="Print per-rig metrics every N seconds")
+    args = parser.parse_args(argv)
+    kcat2n3fjp.DEBUG_LEVEL = DebugLevel[args.debug]
+
+    host = RigHost()
+    load_rigs(host, args.config)
+
+    def shutdown(sig, frame):
+        print("\n--- Rig metrics ---")
+        host.print_metrics()
+        print("\nShutting down.")
+        sys.exit(0)
+    signal.signal(signal.SIGINT, shutdown)
+
+    print(f"Serving {len(host.rigs)} rig(s). Ctrl+C to stop and show metrics.")
+    host.serve_forever(metrics_interval=args.metrics_interval)
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,47 @@
-import socket
-import threading
 import atexit
 import datetime
 import time
+import os
 
 # Shared rig state
 state = {
     "frequency": None,
     "mode": None,
     "listener_started": False,
-    "listener_socket": None
+    "listener": None
 }
 
 now = int(round(time.time() * 1000))
 print(f"[pykeyer_kcat_hook] module loaded at {now}")
 
-def _start_listener():
-    def listener():
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            if state.get("listener_socket"):
-                print("[listener] Already started or failed previously — skipping bind.")
-                return
+# S-meter samples from kcat, kept in memory unless KACHINA_SMETER=0 (see smeter_store.py)
+smeter = None
+if os.environ.get("KACHINA_SMETER", "1") != "0":
+    from smeter_store import SmeterStore, save_at_exit
+    smeter = SmeterStore()
+    if os.environ.get("KACHINA_SMETER_FILE"):
+        save_at_exit(smeter, os.environ["KACHINA_SMETER_FILE"])
 
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            s.bind(("localhost", 7367))
-            s.listen()
-            state["listener_socket"] = s
-            while True:
-                try:
-                    conn, addr = s.accept()
-                    with conn:
-                        data = conn.recv(1024).decode("utf-8").strip()
-                        if data == "<CMD>get_frequency</CMD>":
-                            freq = state["frequency"]
-                            response = f"<RESPONSE>{freq}</RESPONSE>" if freq is not None else "<RESPONSE>None</RESPONSE>"
-                        elif data == "<CMD>get_mode</CMD>":
-                            mode = state["mode"]
-                            response = f"<RESPONSE>{mode}</RESPONSE>" if mode is not None else "<RESPONSE>None</RESPONSE>"
-                        else:
-                            response = "<RESPONSE>Unknown command</RESPONSE>"
-                        conn.sendall(response.encode("utf-8"))
-                except Exception as e:
-                    print(f"[listener error] {e}")
+def _handle_command(session, command):
+    if command == "<CMD>get_frequency</CMD>":
+        freq = state["frequency"]
+        return f"<RESPONSE>{freq}</RESPONSE>" if freq is not None else "<RESPONSE>None</RESPONSE>"
+    elif command == "<CMD>get_mode</CMD>":
+        mode = state["mode"]
+        return f"<RESPONSE>{mode}</RESPONSE>" if mode is not None else "<RESPONSE>None</RESPONSE>"
+    else:
+        return "<RESPONSE>Unknown command</RESPONSE>"
 
-    thread = threading.Thread(target=listener, daemon=True)
-    thread.start()
+def _start_listener():
     state["listener_started"] = True
-
-    def shutdown_listener():
-        sock = state.get("listener_socket")
-        if sock:
-            print("[shutdown] Closing listener socket on port 7367")
-            sock.close()
-    atexit.register(shutdown_listener)
+    from cmd_server import CommandServer  # asyncio is only needed once kcat connects
+    # one request per connection like the original listener; clients that
+    # want to keep the connection send <CMD>keepalive</CMD> first
+    listener = CommandServer("localhost", 7367, _handle_command, one_shot=True)
+    if not listener.start():
+        return
+    state["listener"] = listener
+    atexit.register(listener.stop)
 
 def on_request(method, params):
     elapsed = (int(round(time.time() * 1000)) - now)
@@ -64,8 +53,9 @@ def on_request(method, params):
         state["frequency"] = params[0]
     elif method == "rig.set_mode" and len(params) == 1:
         state["mode"] = params[0]
-    #elif method == "rig.set_smeter" and len(params) == 1:
-    #    print(f"{elapsed:08d} received smeter update: {params}")
+    elif method == "rig.set_smeter" and len(params) == 1:
+        if smeter is not None:
+            smeter.add(time.time(), state["frequency"] or 0.0, params[0])
 
     return method, params
 
@@ -4,99 +4,136 @@
 # python xmlrpc_proxy_logger.py --proxy-port 7362 --handler pykeyer_kcat_bridge.py:handle
 # kcat will issue xmlrpc calls to this code, pyKeyer will send simple commands via socket
 # too much is hard coded at this time...
+#
+# Instead of polling get_frequency/get_mode, a client can send
+#   <CMD>subscribe</CMD>                 push every change as it is applied
+#   <CMD>subscribe interval=0.2</CMD>    coalesce changes, at most one push per 0.2 s
+#   <CMD>unsubscribe</CMD>
+# and will then receive messages like <CHANGE>frequency=14070000.0;mode=CW</CHANGE>
+# (only the fields that changed) whenever kcat sets frequency, mode or bandwidth.
+# A client that prefers to poll can send <CMD>changes_since=N</CMD> and gets
+# <RESPONSE>version=M;field=value;...</RESPONSE> with only what changed after
+# version N (N=0 returns everything).
+#
+# A local reader that only needs the current state can skip the socket:
+# start the proxy with KACHINA_SHM_STATE=/dev/shm/kachina-rig-state and read
+# it with shm_state_reader.RigStateReader.
 
-import socket
-import threading
 import atexit
 import datetime
 import time
+import os
 
-# Shared rig state
+from rig_snapshot import open_snapshot, default_path
+from rig_state import RigState
+
+# Shared rig state, written by kcat's XML-RPC threads and pyKeyer's <SET> commands
+rig = RigState(
+    frequency=7000000.0,
+    mode="CW",
+    bandwidth="500",
+    trx="RX"
+)
+
+# Listener bookkeeping
 state = {
-    "frequency": 7000000.0,
-    "mode": "CW",
-    "bandwidth": "500",
-    "trx": "RX",
     "listener_started": False,
-    "listener_socket": None
+    "listener": None
 }
 
 now = int(round(time.time() * 1000))
 print(f"[pykeyer_kcat_hook] module loaded at {now}")
 
-def _start_listener():
-    def handle_connection(conn, addr):
-        with conn:
-            print(f"[listener] Connection established from {addr}")
-            while True:
-                try:
-                    data = conn.recv(1024)
-                    if not data:
-                        print(f"[listener] Connection from {addr} closed by peer.")
-                        break  # client closed connection
-
-                    command = data.decode("utf-8").strip()
-                    #print(f"[listener] Received from {addr}: {command}")
-
-                    if command == "<CMD>get_frequency</CMD>":
-                        value = state["frequency"]
-                        response = f"<RESPONSE>{value}</RESPONSE>"
-                    elif command == "<CMD>get_mode</CMD>":
-                        value = state["mode"]
-                        response = f"<RESPONSE>{value}</RESPONSE>"
-                    elif command.startswith("<SET>set_freq=") and command.endswith("</SET>"):
-                        try:
-                            freq_val = float(command[len("<SET>set_freq="):-len("</SET>")])
-                            state["frequency"] = freq_val
-                            response = "<RESPONSE>OK</RESPONSE>"
-                        except Exception as e:
-                            response = f"<RESPONSE>Error parsing frequency: {e}</RESPONSE>"
-                    elif command.startswith("<SET>set_mode=") and command.endswith("</SET>"):
-                        try:
-                            mode_val = command[len("<SET>set_mode="):-len("</SET>")]
-                            state["mode"] = mode_val
-                            response = "<RESPONSE>OK</RESPONSE>"
-                        except Exception as e:
-                            response = f"<RESPONSE>Error parsing mode: {e}</RESPONSE>"
-                    else:
-                        response = "<RESPONSE>Unknown command</RESPONSE>"
-
-                    conn.sendall(response.encode("utf-8"))
-
-                except Exception as e:
-                    print(f"[listener] Error handling connection {addr}: {e}")
-                    break
-
-    def listener():
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            if state.get("listener_socket"):
-                print("[listener] Already started or failed previously — skipping bind.")
-                return
-
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            s.bind(("localhost", 7365))
-            s.listen()
-            state["listener_socket"] = s
-            print("[listener] TCP listener started on port 7365")
-
-            while True:
-                try:
-                    conn, addr = s.accept()
-                    thread = threading.Thread(target=handle_connection, args=(conn, addr), daemon=True)
-                    thread.start()
-                except Exception as e:
-                    print(f"[listener] Accept error: {e}")
+# Warm start: pick up where the last run left off
+snapshot = open_snapshot(os.environ.get("KACHINA_SNAPSHOT", default_path("pykeyer_kcat_bridge")))
+if snapshot:
+    saved = snapshot.load()
+    if saved:
+        rig.update(**{key: value for key, value in saved.items() if value})
+        print(f"[pykeyer_kcat_hook] restored {saved} from {snapshot.path}")
+    snapshot.follow(rig)
+
+# Optional shared-memory export for local readers (see shm_state_reader.py)
+if os.environ.get("KACHINA_SHM_STATE"):
+    from shm_state import open_publisher
+    shm_state = open_publisher(os.environ["KACHINA_SHM_STATE"])
+    if shm_state:
+        shm_state.follow(rig)
+
+# S-meter samples from kcat, kept in memory unless KACHINA_SMETER=0 (see smeter_store.py)
+smeter = None
+if os.environ.get("KACHINA_SMETER", "1") != "0":
+    from smeter_store import SmeterStore, save_at_exit
+    smeter = SmeterStore()
+    if os.environ.get("KACHINA_SMETER_FILE"):
+        save_at_exit(smeter, os.environ["KACHINA_SMETER_FILE"])
+
+# Optional operating history (see journal.py)
+if os.environ.get("KACHINA_JOURNAL"):
+    from journal import open_journal
+    journal = open_journal(os.environ["KACHINA_JOURNAL"])
+    if journal:
+        journal.follow(rig, rig="pykeyer")
+
+def _publish(changes, version):
+    # subscribers hear about every change, whichever thread made it
+    listener = state["listener"]
+    if listener:
+        listener.publish(changes)
+
+rig.subscribe(_publish)
+
+def _handle_command(session, command):
+    # runs on the listener's event loop thread, one call per framed command
+    if command == "<CMD>get_frequency</CMD>":
+        value = rig["frequency"]
+        return f"<RESPONSE>{value}</RESPONSE>"
+    elif command == "<CMD>get_mode</CMD>":
+        value = rig["mode"]
+        return f"<RESPONSE>{value}</RESPONSE>"
+    elif command.startswith("<CMD>changes_since=") and command.endswith("</CMD>"):
+        try:
+            version, changes = rig.changes_since(int(command[len("<CMD>changes_since="):-len("</CMD>")]))
+            fields = "".join(f";{k}={v}" for k, v in changes.items())
+            return f"<RESPONSE>version={version}{fields}</RESPONSE>"
+        except Exception as e:
+            return f"<RESPONSE>Error parsing changes_since: {e}</RESPONSE>"
+    elif command.startswith("<CMD>subscribe") and command.endswith("</CMD>"):
+        try:
+            options = command[len("<CMD>subscribe"):-len("</CMD>")].strip()
+            interval = float(options[len("interval="):]) if options.startswith("interval=") else 0.0
+            session.subscribe(interval)
+            return "<RESPONSE>OK</RESPONSE>"
+        except Exception as e:
+            return f"<RESPONSE>Error parsing subscribe: {e}</RESPONSE>"
+    elif command == "<CMD>unsubscribe</CMD>":
+        session.unsubscribe()
+        return "<RESPONSE>OK</RESPONSE>"
+    elif command.startswith("<SET>set_freq=") and command.endswith("</SET>"):
+        try:
+            freq_val = float(command[len("<SET>set_freq="):-len("</SET>")])
+            rig.set("frequency", freq_val)
+            return "<RESPONSE>OK</RESPONSE>"
+        except Exception as e:
+            return f"<RESPONSE>Error parsing frequency: {e}</RESPONSE>"
+    elif command.startswith("<SET>set_mode=") and command.endswith("</SET>"):
+        try:
+            mode_val = command[len("<SET>set_mode="):-len("</SET>")]
+            rig.set("mode", mode_val)
+            return "<RESPONSE>OK</RESPONSE>"
+        except Exception as e:
+            return f"<RESPONSE>Error parsing mode: {e}</RESPONSE>"
+    else:
+        return "<RESPONSE>Unknown command</RESPONSE>"
 
-    thread = threading.Thread(target=listener, daemon=True)
-    thread.start()
+def _start_listener():
     state["listener_started"] = True
-
-    def shutdown_listener():
-        sock = state.get("listener_socket")
-        if sock:
-            print("[shutdown] Closing listener socket on port 7365")
-            sock.close()
-    atexit.register(shutdown_listener)
+    from cmd_server import CommandServer  # asyncio is only needed once kcat connects
+    listener = CommandServer("localhost", 7365, _handle_command)
+    if not listener.start():
+        return
+    state["listener"] = listener
+    atexit.register(listener.stop)
 
 def handle(method, params):
     #print(f"[handler] Received method call: {method} with params: {params}")
@@ -110,31 +147,36 @@ def handle(method, params):
     #print(f"{elapsed:08d} received request {method}({params})")
 
     if method == "system.multicall" and len(params) == 1 and isinstance(params[0], list):
+        # the whole batch is one state change: subscribers (and the snapshot,
+        # journal, ...) hear about it once, after the last call
         results = []
-        for call in params[0]:
-            try:
-                sub_method = call['methodName']
-                sub_params = call.get('params', [])
-                sub_result = handle(sub_method, sub_params)
-                results.append([sub_result])
-            except Exception as e:
-                results.append({'faultCode': 1, 'faultString': str(e)})
+        with rig.transaction():
+            for call in params[0]:
+                try:
+                    sub_method = call['methodName']
+                    sub_params = call.get('params', [])
+                    sub_result = handle(sub_method, sub_params)
+                    results.append([sub_result])
+                except Exception as e:
+                    results.append({'faultCode': 1, 'faultString': str(e)})
         return results
 
     if method == "rig.set_frequency" and len(params) == 1:
-        retval = state["frequency"]
-        state["frequency"] = params[0]
+        retval = rig.set("frequency", params[0])
     elif method == "rig.get_frequency" and len(params) == 1:
-        retval = state["frequency"]
+        retval = rig["frequency"]
     elif method == "rig.set_mode" and len(params) == 1:
-        state["mode"] = params[0]
+        rig.set("mode", params[0])
     elif method == "rig.get_mode" and len(params) == 1:
-        retval = state["mode"]
+        retval = rig["mode"]
     elif method == "rig.set_bandwidth" and len(params) == 1:
-        state["bandwidth"] = params[0]
+        rig.set("bandwidth", params[0])
     elif method == "rig.get_bandwidth" and len(params) == 1:
-        retval = state["bandwidth"]
+        retval = rig["bandwidth"]
     elif method == "main.get_trx_state" and len(params) == 1:
-        retval = state["trx"]
+        retval = rig["trx"]
+    elif method == "rig.set_smeter" and len(params) == 1:
+        if smeter is not None:
+            smeter.add(time.time(), rig["frequency"], params[0])
 
     return retval
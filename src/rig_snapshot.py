@@ -0,0 +1,151 @@
+# rig_snapshot.py
+# warm-start snapshot of the rig state (frequency, mode, bandwidth, trx)
+# kept in a small memory-mapped file so a restarted tool answers getters
+# correctly right away instead of reporting 7000.0/CW/500.
+#
+# The file holds two fixed-size slots. Each write goes to the older slot and
+# carries a sequence number and a crc, so a torn write (crash, power loss)
+# leaves the other slot intact and load() simply picks the newest valid one.
+#
+# Updates from the hot path only store into a dict; a daemon thread writes
+# the file at most once every min_interval seconds, and once more at exit.
+
+import atexit
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+MAGIC = b"KRS1"
+SLOT_FORMAT = "<4sQd16s16s4s"  # magic, seq, frequency, mode, bandwidth, trx
+SLOT_BODY = struct.calcsize(SLOT_FORMAT)
+SLOT_SIZE = SLOT_BODY + 4      # + crc32
+FILE_SIZE = 2 * SLOT_SIZE
+
+FIELDS = ("frequency", "mode", "bandwidth", "trx")
+
+def default_path(name):
+    base = os.environ.get("KACHINA_STATE_DIR",
+                          os.path.join(os.path.expanduser("~"), ".local", "state", "kachina-tools"))
+    return os.path.join(base, f"{name}.snap")
+
+def _text(value, size):
+    return str(value if value is not None else "").encode("utf-8")[:size]
+
+def _untext(raw):
+    return raw.rstrip(b"\0").decode("utf-8", errors="replace")
+
+def pack_slot(seq, frequency, mode, bandwidth, trx):
+    body = struct.pack(SLOT_FORMAT, MAGIC, seq, float(frequency),
+                       _text(mode, 16), _text(bandwidth, 16), _text(trx, 4))
+    return body + struct.pack("<I", zlib.crc32(body))
+
+def unpack_slot(raw):
+    if len(raw) < SLOT_SIZE:
+        return None
+    body, (crc,) = raw[:SLOT_BODY], struct.unpack("<I", raw[SLOT_BODY:SLOT_SIZE])
+    if zlib.crc32(body) != crc:
+        return None
+    magic, seq, frequency, mode, bandwidth, trx = struct.unpack(SLOT_FORMAT, body)
+    if magic != MAGIC:
+        return None
+    return seq, {
+        "frequency": frequency,
+        "mode": _untext(mode),
+        "bandwidth": _untext(bandwidth),
+        "trx": _untext(trx),
+    }
+
+class RigSnapshot:
+    def __init__(self, path, min_interval=1.0):
+        self.path = path
+        self.min_interval = min_interval
+        self.seq = 0
+        self.values = {}
+        self.dirty = False
+        self.thread = None
+        self.lock = threading.Lock()  # serializes file writes, never taken by update()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < FILE_SIZE:
+                os.ftruncate(fd, FILE_SIZE)
+            self.mm = mmap.mmap(fd, FILE_SIZE)
+        finally:
+            os.close(fd)
+
+    def load(self):
+        # returns the newest valid state, or None if the file holds nothing usable
+        best = None
+        for offset in (0, SLOT_SIZE):
+            slot = unpack_slot(self.mm[offset:offset + SLOT_SIZE])
+            if slot and (best is None or slot[0] > best[0]):
+                best = slot
+        if best is None:
+            return None
+        self.seq = best[0]
+        self.values = dict(best[1])
+        return dict(best[1])
+
+    def update(self, **fields):
+        # hot path: memory stores only, the flusher thread does the rest
+        self.values.update(fields)
+        self.dirty = True
+        if self.thread is None:
+            self._start()
+
+    def follow(self, rig_state):
+        # keep the snapshot current from a RigState's change notifications,
+        # starting from its current values so unchanged fields aren't saved empty
+        current = rig_state.snapshot()
+        for field in FIELDS:
+            if field in current and field not in self.values:
+                self.values[field] = current[field]
+
+        def listener(changes, version):
+            fields = {k: v for k, v in changes.items() if k in FIELDS}
+            if fields:
+                self.update(**fields)
+        rig_state.subscribe(listener)
+
+    def flush(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            values = dict(self.values)
+            self.seq += 1
+            offset = (self.seq % 2) * SLOT_SIZE
+            self.mm[offset:offset + SLOT_SIZE] = pack_slot(
+                self.seq,
+                values.get("frequency", 0.0),
+                values.get("mode"),
+                values.get("bandwidth"),
+                values.get("trx"))
+            self.mm.flush()
+
+    def _flusher(self):
+        while True:
+            time.sleep(self.min_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[snapshot] Write to {self.path} failed: {e}")
+
+    def _start(self):
+        self.thread = threading.Thread(target=self._flusher, daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+def open_snapshot(path, min_interval=1.0):
+    # convenience for the tools: failures here must never stop a tool from starting
+    try:
+        return RigSnapshot(path, min_interval=min_interval)
+    except Exception as e:
+        print(f"[snapshot] Unable to open {path}: {e}")
+        return None
@@ -0,0 +1,189 @@
+# rig_state.py
+# thread-safe rig state shared by the knob thread, listener threads and
+# XML-RPC threads of a tool.
+#
+# All writes go through one lock, so compound updates such as a
+# read-modify-write of the frequency can't interleave with another writer. Every write
+# that changes something bumps the state's version, and each field remembers
+# the version it last changed at, so a consumer can ask for "what changed
+# since version N" instead of diffing or polling. Readers get immutable
+# snapshots, rebuilt only when the version has moved.
+#
+# Listeners registered with subscribe() are called with (changes, version)
+# while the lock is held, so they see changes in order; they must be quick
+# and must not block (store into memory, hand off to a queue or event loop).
+#
+# Writes made inside "with state.transaction():" are applied under a single
+# lock acquisition and published together when the block ends: one version
+# bump and one listener call with the net changes of the whole batch. Other
+# threads' snapshots never show a half-applied batch.
+#
+# Values that change on every knob tick don't belong in the versioned state:
+# each tick would bump the version and wake every listener, snapshot and
+# subscriber. Accumulator collects them outside it, and the consumer folds
+# the total into the state at its own pace.
+
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+from types import MappingProxyType
+
+class Snapshot(Mapping):
+    __slots__ = ("version", "_values")
+
+    def __init__(self, version, values):
+        self.version = version
+        self._values = MappingProxyType(values)
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return f"Snapshot(version={self.version}, {dict(self._values)})"
+
+class RigState:
+    def __init__(self, **fields):
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._values = dict(fields)
+        self._versions = dict.fromkeys(fields, 0)
+        self._listeners = []
+        self._snapshot = None
+        self._depth = 0       # nesting of transaction() blocks
+        self._before = {}     # field -> value before the open transaction changed it
+        self.version = 0
+
+    def __getitem__(self, field):
+        # a single field read is atomic; use snapshot() for several fields
+        return self._values[field]
+
+    def __contains__(self, field):
+        return field in self._values
+
+    def fields(self):
+        return tuple(self._values)
+
+    def snapshot(self):
+        snap = self._snapshot
+        if snap is None or snap.version != self.version:
+            with self._lock:
+                snap = Snapshot(self.version, dict(self._values))
+                if not self._depth:
+                    self._snapshot = snap  # never cache a half-applied batch
+        return snap
+
+    def _apply(self, fields):
+        # caller holds the lock
+        changes = {}
+        for field, value in fields.items():
+            if field not in self._values:
+                raise KeyError(f"Unknown rig state field {field}")
+            if self._values[field] != value:
+                changes[field] = value
+        if not changes:
+            return changes
+        if self._depth:
+            for field, value in changes.items():
+                self._before.setdefault(field, self._values[field])
+                self._values[field] = value
+            self._snapshot = None
+            return changes
+        for field, value in changes.items():
+            self._values[field] = value
+        self._publish(changes)
+        return changes
+
+    def _publish(self, changes):
+        # caller holds the lock
+        self.version += 1
+        for field in changes:
+            self._versions[field] = self.version
+        for listener in self._listeners:
+            try:
+                listener(changes, self.version)
+            except Exception as e:
+                print(f"[rig_state] Listener {listener} failed: {e}")
+        self._changed.notify_all()
+
+    @contextmanager
+    def transaction(self):
+        # batch several writes; listeners hear about the net result once, at the end
+        with self._lock:
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    before, self._before = self._before, {}
+                    changes = {field: self._values[field]
+                               for field, value in before.items() if self._values[field] != value}
+                    if changes:
+                        self._publish(changes)
+
+    def update(self, **fields):
+        # returns the fields that actually changed
+        with self._lock:
+            return self._apply(fields)
+
+    def set(self, field, value):
+        # returns the previous value
+        with self._lock:
+            old = self._values[field]
+            self._apply({field: value})
+            return old
+
+    def add(self, field, delta):
+        with self._lock:
+            return self._apply({field: self._values[field] + delta})
+
+    def modify(self, fn):
+        # fn(current values) returns the fields to set, all under one lock
+        with self._lock:
+            return self._apply(fn(dict(self._values)) or {})
+
+    def changes_since(self, version):
+        # returns (current version, {field: value} changed after version)
+        with self._lock:
+            return self.version, {field: self._values[field]
+                                  for field, changed in self._versions.items() if changed > version}
+
+    def wait_for_change(self, version, timeout=None):
+        # blocks until the state moves past version (or timeout); returns the current version
+        with self._lock:
+            self._changed.wait_for(lambda: self.version > version, timeout)
+            return self.version
+
+    def subscribe(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+class Accumulator:
+    # unversioned running total, e.g. knob ticks not yet applied to the frequency
+    def __init__(self):
+        self._ready = threading.Condition(threading.Lock())
+        self._total = 0.0
+
+    def add(self, delta):
+        with self._ready:
+            self._total += delta
+            self._ready.notify()
+
+    def take(self, timeout=None):
+        # waits (up to timeout) for a non-zero total, returns it and resets to 0
+        with self._ready:
+            self._ready.wait_for(lambda: self._total, timeout)
+            total, self._total = self._total, 0.0
+            return total
@@ -0,0 +1,59 @@
+# shm_state.py
+# publishes a RigState into a small fixed-layout shared-memory file so local
+# processes can read frequency, mode, bandwidth and trx with
+# shm_state_reader.py instead of asking the bridge over TCP. The layout and
+# the seqlock protocol are described in shm_state_reader.py.
+#
+# The publisher follows the RigState as a listener, so each change is
+# written once, in order, by whichever thread made it; readers never touch
+# any of the tool's threads.
+
+import mmap
+import os
+import struct
+
+from shm_state_reader import (DEFAULT_PATH, MAGIC, LAYOUT_VERSION, HEADER_FORMAT,
+                              SEQ_OFFSET, DATA_OFFSET, DATA_FORMAT, SIZE)
+
+def _text(value, size):
+    return str(value if value is not None else "").encode("utf-8")[:size]
+
+class ShmStatePublisher:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, SIZE)
+            self.mm = mmap.mmap(fd, SIZE)
+        finally:
+            os.close(fd)
+        struct.pack_into(HEADER_FORMAT, self.mm, 0, MAGIC, LAYOUT_VERSION)
+        self.seq = struct.unpack_from("<Q", self.mm, SEQ_OFFSET)[0] & ~1  # keep counting across restarts
+
+    def publish(self, snapshot):
+        # snapshot: a rig_state.Snapshot (or any mapping with the fields, plus a version)
+        self.seq += 1
+        struct.pack_into("<Q", self.mm, SEQ_OFFSET, self.seq)  # odd: write in progress
+        struct.pack_into(DATA_FORMAT, self.mm, DATA_OFFSET,
+                         getattr(snapshot, "version", 0),
+                         float(snapshot.get("frequency") or 0.0),
+                         _text(snapshot.get("mode"), 16),
+                         _text(snapshot.get("bandwidth"), 16),
+                         _text(snapshot.get("trx"), 4))
+        self.seq += 1
+        struct.pack_into("<Q", self.mm, SEQ_OFFSET, self.seq)  # even: consistent again
+
+    def follow(self, rig_state):
+        # runs under the RigState lock, so this is the only writer at any time
+        rig_state.subscribe(lambda changes, version: self.publish(rig_state.snapshot()))
+        self.publish(rig_state.snapshot())
+
+def open_publisher(path):
+    # tools keep running without the export if it can't be created
+    try:
+        publisher = ShmStatePublisher(path)
+        print(f"[shm_state] Publishing rig state to {path}")
+        return publisher
+    except Exception as e:
+        print(f"[shm_state] Unable to publish rig state to {path}: {e}")
+        return None
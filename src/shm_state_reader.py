@@ -0,0 +1,97 @@
+# shm_state_reader.py
+# reads the live rig state that kcat2n3fjp, pykeyer_kcat_bridge or
+# tuning_knob_callback publish into shared memory (see shm_state.py), with
+# no socket and no round trip through the publisher. Copy this file next to
+# whatever needs the rig state; it only uses the standard library.
+#
+#   from shm_state_reader import RigStateReader
+#   rig = RigStateReader()             # /dev/shm/kachina-rig-state by default
+#   print(rig.read())                  # {'version': 12, 'frequency': 14070000.0, ...}
+#
+# Layout (little endian, fixed offsets so readers in other languages can
+# map it too):
+#    0  4s   magic "KRSM"
+#    4  u32  layout version
+#    8  u64  seq, odd while the publisher is writing
+#   16  u64  rig state version
+#   24  f64  frequency
+#   32  16s  mode
+#   48  16s  bandwidth
+#   64  4s   trx
+#
+# Seqlock: the publisher makes seq odd, writes the fields, then makes it
+# even again. A reader copies the fields between two reads of seq and
+# retries if seq was odd or changed, so it never sees a half-written state.
+# A publisher that dies mid-write leaves seq odd for good; read() gives up
+# after timeout seconds (yielding the CPU between retries) and raises
+# TimeoutError instead of spinning forever.
+
+import mmap
+import os
+import struct
+import time
+
+DEFAULT_PATH = "/dev/shm/kachina-rig-state"
+MAGIC = b"KRSM"
+LAYOUT_VERSION = 1
+HEADER_FORMAT = "<4sI"
+SEQ_OFFSET = 8
+DATA_OFFSET = 16
+DATA_FORMAT = "<Qd16s16s4s"  # version, frequency, mode, bandwidth, trx
+SIZE = DATA_OFFSET + struct.calcsize(DATA_FORMAT)
+READ_TIMEOUT = 0.1  # seconds; a write takes microseconds
+SPIN = 100          # retries before the reader starts sleeping
+
+class RigStateReader:
+    def __init__(self, path=DEFAULT_PATH):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            self.mm = mmap.mmap(fd, SIZE, prot=mmap.PROT_READ)
+        finally:
+            os.close(fd)
+        magic, layout = struct.unpack_from(HEADER_FORMAT, self.mm, 0)
+        if magic != MAGIC or layout != LAYOUT_VERSION:
+            raise ValueError(f"{path} is not a rig state segment (layout {LAYOUT_VERSION})")
+        self._seq = struct.Struct("<Q")
+        self._data = struct.Struct(DATA_FORMAT)
+
+    def seq(self):
+        # cheap change check: compare with the value from the last read()
+        return self._seq.unpack_from(self.mm, SEQ_OFFSET)[0]
+
+    def read_raw(self, timeout=READ_TIMEOUT):
+        # (version, frequency, mode bytes, bandwidth bytes, trx bytes), consistent
+        deadline = None
+        attempts = 0
+        while True:
+            before = self._seq.unpack_from(self.mm, SEQ_OFFSET)[0]
+            if not before & 1:
+                data = self._data.unpack_from(self.mm, DATA_OFFSET)
+                if self._seq.unpack_from(self.mm, SEQ_OFFSET)[0] == before:
+                    return data
+            attempts += 1
+            if attempts < SPIN:
+                continue
+            now = time.monotonic()
+            if deadline is None:
+                deadline = now + timeout
+            elif now >= deadline:
+                raise TimeoutError(f"rig state seq stuck at {before}; publisher died mid-write?")
+            time.sleep(0.0005)
+
+    def read(self, timeout=READ_TIMEOUT):
+        version, frequency, mode, bandwidth, trx = self.read_raw(timeout)
+        return {
+            "version": version,
+            "frequency": frequency,
+            "mode": mode.rstrip(b"\0").decode("utf-8", errors="replace"),
+            "bandwidth": bandwidth.rstrip(b"\0").decode("utf-8", errors="replace"),
+            "trx": trx.rstrip(b"\0").decode("utf-8", errors="replace"),
+        }
+
+    def close(self):
+        self.mm.close()
+
+if __name__ == "__main__":
+    import sys
+    print(RigStateReader(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH).read())
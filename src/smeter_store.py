@@ -0,0 +1,298 @@
+# smeter_store.py
+# keeps the rig.set_smeter stream kcat sends several times a second instead
+# of throwing it away.
+#
+# Samples go into a fixed-capacity ring of typed arrays (timestamp,
+# frequency, smeter: 20 bytes a sample), so memory is bounded; the arrays
+# grow as samples arrive and only wrap once full, so a store that never sees
+# a sample costs a few hundred bytes however many rigs keep one. Two downsampled tiers, 1 s and 1 min, are built as samples arrive;
+# each tier row covers one interval, however much the rig was tuned in it,
+# and keeps min, max, mean and count plus the frequency the rig was last on
+# in that interval (which the frequency filters match against). Queries binary search the time range in whichever level
+# fits and never walk the raw stream for a long span.
+#
+#   store = SmeterStore()
+#   store.add(time.time(), 14070000.0, 42)
+#   store.samples(start, end, fmin=14e6, fmax=14.35e6)   # raw (ts, freq, smeter)
+#   store.summary(60, start, end)                        # (ts, freq, min, max, mean, count)
+#   store.to_numpy(60)                                   # same rows as a NumPy record array
+#
+# The default capacities hold about 3.5 hours of raw samples at 10/s, 6 hours
+# of 1 s rows and a week of 1 min rows, about 3.6 MB in total when full.
+#
+# save()/load() write and read the whole store in a small binary file, and
+# running this file queries one:
+#   python smeter_store.py smeter.bin --start 18:30 --end 19:00 --resolution 60
+
+import argparse
+import datetime
+import os
+import struct
+import threading
+import time
+from array import array
+
+RAW_CAPACITY = 1 << 17
+SECOND_CAPACITY = 6 * 3600
+MINUTE_CAPACITY = 7 * 24 * 60
+
+FILE_MAGIC = b"KSM1"
+
+class _Ring:
+    # parallel typed arrays used as one ring; row i lives at (start + i) % capacity.
+    # The arrays grow up to capacity and start wrapping after that.
+    def __init__(self, capacity, typecodes):
+        self.capacity = capacity
+        self.columns = [array(code) for code in typecodes]
+        self.start = 0
+        self.count = 0
+
+    def append(self, *row):
+        if self.count < self.capacity:
+            # still growing, so start is 0 and the new row goes on the end
+            for column, value in zip(self.columns, row):
+                column.append(value)
+            self.count += 1
+            return
+        index = self.start
+        self.start = (self.start + 1) % self.capacity
+        for column, value in zip(self.columns, row):
+            column[index] = value
+
+    def last(self):
+        # physical index of the newest row
+        return (self.start + self.count - 1) % self.capacity
+
+    def bisect(self, ts):
+        # first logical row whose timestamp (column 0) is >= ts
+        times, lo, hi = self.columns[0], 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if times[(self.start + mid) % self.capacity] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def rows(self, start=None, end=None, fmin=None, fmax=None):
+        # rows with start <= ts < end and fmin <= frequency <= fmax, oldest first
+        first = self.bisect(start) if start is not None else 0
+        stop = self.bisect(end) if end is not None else self.count
+        columns = self.columns
+        frequencies = columns[1]
+        for i in range(first, stop):
+            index = (self.start + i) % self.capacity
+            frequency = frequencies[index]
+            if (fmin is not None and frequency < fmin) or (fmax is not None and frequency > fmax):
+                continue
+            yield tuple(column[index] for column in columns)
+
+    def chronological(self):
+        # the columns copied out oldest first
+        split = self.start + self.count - self.capacity if self.start + self.count > self.capacity else 0
+        out = []
+        for column in self.columns:
+            if split:
+                out.append(column[self.start:] + column[:split])
+            else:
+                out.append(column[self.start:self.start + self.count])
+        return out
+
+    def load(self, columns):
+        count = min(len(columns[0]), self.capacity)
+        for column, values in zip(self.columns, columns):
+            column[:] = values[len(values) - count:]
+        self.start, self.count = 0, count
+
+class _Tier:
+    # rows: start of interval, last frequency, min, max, sum, count
+    TYPECODES = ("d", "d", "f", "f", "d", "I")
+
+    def __init__(self, width, capacity):
+        self.width = width
+        self.ring = _Ring(capacity, self.TYPECODES)
+        self.bucket = None  # interval start of the newest row
+
+    def add(self, ts, frequency, value):
+        start = ts - ts % self.width
+        ring = self.ring
+        if self.bucket == start:
+            index = ring.last()
+            _, frequencies, low, high, total, count = ring.columns
+            frequencies[index] = frequency
+            if value < low[index]:
+                low[index] = value
+            if value > high[index]:
+                high[index] = value
+            total[index] += value
+            count[index] += 1
+        else:
+            ring.append(start, frequency, value, value, value, 1)
+            self.bucket = start
+
+    def rows(self, start=None, end=None, fmin=None, fmax=None):
+        if start is not None:
+            start -= start % self.width  # include the interval start falls in
+        for ts, frequency, low, high, total, count in self.ring.rows(start, end, fmin, fmax):
+            yield ts, frequency, low, high, total / count, count
+
+class SmeterStore:
+    def __init__(self, raw_capacity=RAW_CAPACITY, second_capacity=SECOND_CAPACITY,
+                 minute_capacity=MINUTE_CAPACITY):
+        self.lock = threading.Lock()
+        self.raw = _Ring(raw_capacity, ("d", "d", "f"))
+        self.tiers = {1: _Tier(1, second_capacity), 60: _Tier(60, minute_capacity)}
+        self.added = 0
+
+    def add(self, ts, frequency, value):
+        frequency, value = float(frequency), float(value)
+        with self.lock:
+            if self.raw.count and ts < self.raw.columns[0][self.raw.last()]:
+                ts = self.raw.columns[0][self.raw.last()]  # clock stepped back, keep the ring sorted
+            self.raw.append(ts, frequency, value)
+            for tier in self.tiers.values():
+                tier.add(ts, frequency, value)
+            self.added += 1
+
+    def samples(self, start=None, end=None, fmin=None, fmax=None):
+        # raw (ts, frequency, smeter) tuples
+        with self.lock:
+            return list(self.raw.rows(start, end, fmin, fmax))
+
+    def summary(self, resolution, start=None, end=None, fmin=None, fmax=None):
+        # (ts, frequency, min, max, mean, count) tuples at 1 or 60 s resolution
+        if resolution not in self.tiers:
+            raise ValueError(f"No {resolution} s tier, choose one of {sorted(self.tiers)}")
+        with self.lock:
+            return list(self.tiers[resolution].rows(start, end, fmin, fmax))
+
+    def query(self, start=None, end=None, fmin=None, fmax=None, max_rows=2000):
+        # picks the finest level that still covers start and whose answer
+        # stays under about max_rows; the coarsest level is the fallback
+        with self.lock:
+            levels = [(None, self.raw)] + [(width, tier.ring) for width, tier in sorted(self.tiers.items())]
+            for width, ring in levels:
+                if not ring.count:
+                    continue
+                oldest = ring.columns[0][ring.start]
+                if start is None or start < oldest:
+                    if ring.count < ring.capacity:
+                        first = 0  # nothing has been dropped from this level yet
+                    else:
+                        continue
+                else:
+                    first = ring.bisect(start)
+                stop = ring.bisect(end) if end is not None else ring.count
+                if stop - first <= max_rows:
+                    break
+        if width is None:
+            return None, self.samples(start, end, fmin, fmax)
+        return width, self.summary(width, start, end, fmin, fmax)
+
+    def to_numpy(self, resolution=None, start=None, end=None, fmin=None, fmax=None):
+        # NumPy is only needed here, so the tools don't depend on it
+        import numpy as np
+        if resolution is None:
+            dtype = [("ts", "f8"), ("frequency", "f8"), ("smeter", "f4")]
+            rows = self.samples(start, end, fmin, fmax)
+        else:
+            dtype = [("ts", "f8"), ("frequency", "f8"), ("min", "f4"), ("max", "f4"),
+                     ("mean", "f4"), ("count", "u4")]
+            rows = self.summary(resolution, start, end, fmin, fmax)
+        return np.rec.array(np.array(rows, dtype=dtype))
+
+    def stats(self):
+        return {
+            "added": self.added,
+            "raw": self.raw.count,
+            **{f"{width}s": tier.ring.count for width, tier in self.tiers.items()},
+            "bytes": self.nbytes(),
+        }
+
+    def nbytes(self):
+        rings = [self.raw] + [tier.ring for tier in self.tiers.values()]
+        return sum(column.itemsize * len(column) for ring in rings for column in ring.columns)
+
+    def save(self, path):
+        with self.lock:
+            rings = [self.raw] + [tier.ring for _, tier in sorted(self.tiers.items())]
+            columns = [ring.chronological() for ring in rings]
+        with open(path + ".tmp", "wb") as f:
+            f.write(FILE_MAGIC + struct.pack("<III", *(ring.count for ring in rings)))
+            for ring_columns in columns:
+                for column in ring_columns:
+                    column.tofile(f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path, **capacities):
+        store = cls(**capacities)
+        with open(path, "rb") as f:
+            header = f.read(16)
+            if header[:4] != FILE_MAGIC:
+                raise ValueError(f"{path} is not an S-meter store")
+            counts = struct.unpack("<III", header[4:])
+            rings = [store.raw] + [tier.ring for _, tier in sorted(store.tiers.items())]
+            for ring, count in zip(rings, counts):
+                columns = []
+                for column in ring.columns:
+                    values = array(column.typecode)
+                    values.fromfile(f, count)
+                    columns.append(values)
+                ring.load(columns)
+        for tier in store.tiers.values():
+            if tier.ring.count:
+                tier.bucket = tier.ring.columns[0][tier.ring.last()]
+        store.added = store.raw.count
+        return store
+
+def save_at_exit(store, path):
+    # used by the tools: register once, failures are reported, not raised
+    import atexit
+
+    def save():
+        try:
+            store.save(path)
+            print(f"[smeter] Saved {store.raw.count} samples to {path}")
+        except Exception as e:
+            print(f"[smeter] Unable to save to {path}: {e}")
+    atexit.register(save)
+
+def _parse_time(text):
+    # HH:MM today, or seconds since the epoch
+    try:
+        return float(text)
+    except ValueError:
+        clock = datetime.datetime.strptime(text, "%H:%M").time()
+        return datetime.datetime.combine(datetime.date.today(), clock).timestamp()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query a saved S-meter store")
+    parser.add_argument("path", help="File written by SmeterStore.save()")
+    parser.add_argument("--start", type=_parse_time, default=None, help="HH:MM today or epoch seconds")
+    parser.add_argument("--end", type=_parse_time, default=None, help="HH:MM today or epoch seconds")
+    parser.add_argument("--fmin", type=float, default=None, help="Lowest frequency in Hz")
+    parser.add_argument("--fmax", type=float, default=None, help="Highest frequency in Hz")
+    parser.add_argument("--resolution", type=int, choices=[0, 1, 60], default=None,
+                        help="0 for raw samples, 1 or 60 s tiers (default: pick one to fit)")
+    args = parser.parse_args(argv)
+
+    store = SmeterStore.load(args.path)
+    print(f"{args.path}: {store.stats()}")
+    if args.resolution is None:
+        resolution, rows = store.query(args.start, args.end, args.fmin, args.fmax)
+    elif args.resolution == 0:
+        resolution, rows = None, store.samples(args.start, args.end, args.fmin, args.fmax)
+    else:
+        resolution, rows = args.resolution, store.summary(args.resolution, args.start, args.end,
+                                                         args.fmin, args.fmax)
+    for row in rows:
+        stamp = time.strftime("%H:%M:%S", time.localtime(row[0]))
+        if resolution is None:
+            print(f"{stamp}  {row[1]:>12.1f}  {row[2]:6.1f}")
+        else:
+            print(f"{stamp}  {row[1]:>12.1f}  min {row[2]:6.1f}  max {row[3]:6.1f}  "
+                  f"mean {row[4]:6.1f}  n {row[5]}")
+
+if __name__ == "__main__":
+    main()
@@ -2,47 +2,122 @@
 # adds support for the Kachina 505DSP tuning knob, 505TK.
 # callback for tuning knob input via serial mouse protocol
 # use with xmlrpc_proxy_logger.py as a callback handler
+#
+# Knob movement is integrated event-driven: the knob thread only adds to
+# delta_f, an Accumulator kept outside the versioned rig state so ticks don't
+# wake its listeners, and the tuning thread folds delta_f into the frequency
+# as soon as it is non-zero, at most once every MIN_APPLY_INTERVAL. Whatever
+# is left when the knob stops is applied one interval later, so the last
+# ticks of a spin are never stranded.
+#
+# Limit: kcat has no XML-RPC server of its own, it only polls this proxy
+# (as fldigi) for get_frequency. The rig therefore follows the knob on
+# kcat's next poll, not within a packet time of the knob moving; nothing
+# here can push a frequency into kcat. If KACHINA_KNOB_PUSH_URL is set, every
+# applied frequency is also pushed over XML-RPC to that URL, for other
+# consumers that should follow the knob without polling (e.g. fldigi on
+# http://localhost:7363 when kcat2n3fjp runs with --fanout). It must never
+# be the proxy this plugin runs in: pushes to the proxy's own port would come
+# straight back into handle(), so such a URL is refused.
+#
+# With KACHINA_KNOB_PROCESS=1 the serial port is read and decoded in a
+# separate process (knob_process.py), so XML-RPC bursts in the proxy can't
+# delay packet timestamps and skew scale_from_speed.
 
-import serial
 import threading
 import time
 import atexit
+import os
+import socket
+import urllib.parse
+import xmlrpc.client
 from datetime import datetime
 
-PORT = "/dev/ttyUSB3"
-BAUD = 1200
-BYTESIZE = serial.SEVENBITS
-PARITY = serial.PARITY_NONE
-STOPBITS = serial.STOPBITS_ONE
+from rig_snapshot import open_snapshot, default_path
+from rig_state import RigState, Accumulator
+from knob_decoder import KnobDecoder, open_port, read_events, BAUD
+from knob_process import KnobProcess
 
-# Shared rig state
+PORT = os.environ.get("KACHINA_KNOB_PORT", "/dev/ttyUSB3")  # knob_emulator.py --link gives a pty to use here
+
+MIN_APPLY_INTERVAL = 0.05  # seconds between frequency updates while spinning
+PUSH_URL = os.environ.get("KACHINA_KNOB_PUSH_URL")  # another consumer, not kcat and not this proxy
+PUSH_METHOD = os.environ.get("KACHINA_KNOB_PUSH_METHOD", "rig.set_frequency")
+KNOB_PROCESS = os.environ.get("KACHINA_KNOB_PROCESS") == "1"
+
+def _is_own_address(url):
+    # True if url is the proxy this plugin is loaded into (it sets KACHINA_PROXY_PORT)
+    own_port = os.environ.get("KACHINA_PROXY_PORT")
+    if not own_port:
+        return False
+    parsed = urllib.parse.urlsplit(url)
+    try:
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(parsed.hostname, port)}
+    except (ValueError, OSError):
+        return False
+    local = {"0.0.0.0", "::"}
+    for name in ("localhost", socket.gethostname()):
+        try:
+            local |= {info[4][0] for info in socket.getaddrinfo(name, None)}
+        except OSError:
+            pass
+    return port == int(own_port) and any(a.startswith("127.") or a == "::1" or a in local for a in addresses)
+
+if PUSH_URL and _is_own_address(PUSH_URL):
+    print(f"[knob] Not pushing to {PUSH_URL}: that is this proxy's own port, pushes would loop back "
+          f"into handle(). Point KACHINA_KNOB_PUSH_URL at the target server instead.")
+    PUSH_URL = None
+
+# Shared rig state, written by the knob, tuning and request threads
+rig = RigState(
+    frequency=7000000.0,
+    mode="CW",
+    bandwidth="500",
+    trx="RX"
+)
+delta_f = Accumulator()  # knob ticks not yet applied to the frequency
+
+# Thread bookkeeping
 state = {
-    "frequency": 7000000.0,
-    "delta_f": 0.0,
-    "mode": "CW",
-    "bandwidth": "500",
-    "trx": "RX",
     "knob_thread": None,
-    "knob_active": False
+    "knob_active": False,
+    "tuning_thread": None
 }
 
 now = int(round(time.time() * 1000))
 print(f"[tuning_knob_hook] module loaded at {now}")
 
-def decode_signed_x(b1, b2):
-    b1 &= 0x03
-    val = b2 + (b1 << 6)
-    val &= 0x3F
-    return val - 64 if val >= 32 else val
-
-def parse_mouse_packet(packet):
-    if len(packet) != 3:
-        return None
-    b1, b2, b3 = packet
-    if b1 & 0x40 == 0:
-        return None
-    dx = decode_signed_x(b1, b2)
-    return b1, b2, b3, dx
+# Warm start: pick up where the last run left off
+snapshot = open_snapshot(os.environ.get("KACHINA_SNAPSHOT", default_path("tuning_knob")))
+if snapshot:
+    saved = snapshot.load()
+    if saved:
+        rig.update(**{key: value for key, value in saved.items() if value and key in rig})
+        print(f"[tuning_knob_hook] restored {saved} from {snapshot.path}")
+    snapshot.follow(rig)
+
+# Optional shared-memory export for local readers (see shm_state_reader.py)
+if os.environ.get("KACHINA_SHM_STATE"):
+    from shm_state import open_publisher
+    shm_state = open_publisher(os.environ["KACHINA_SHM_STATE"])
+    if shm_state:
+        shm_state.follow(rig)
+
+# S-meter samples from kcat, kept in memory unless KACHINA_SMETER=0 (see smeter_store.py)
+smeter = None
+if os.environ.get("KACHINA_SMETER", "1") != "0":
+    from smeter_store import SmeterStore, save_at_exit
+    smeter = SmeterStore()
+    if os.environ.get("KACHINA_SMETER_FILE"):
+        save_at_exit(smeter, os.environ["KACHINA_SMETER_FILE"])
+
+# Optional operating history (see journal.py)
+if os.environ.get("KACHINA_JOURNAL"):
+    from journal import open_journal
+    journal = open_journal(os.environ["KACHINA_JOURNAL"])
+    if journal:
+        journal.follow(rig, rig="knob")
 
 def scale_from_speed(delta_t):
     if delta_t > 0.3:
@@ -54,53 +129,59 @@ def scale_from_speed(delta_t):
     else:
         return 1000
 
+def _tuning_loop():
+    pusher = xmlrpc.client.ServerProxy(PUSH_URL, allow_none=True) if PUSH_URL else None
+    last_apply = 0.0
+    while state["knob_active"]:
+        delta = delta_f.take(timeout=1.0)  # wakes up now and then to see knob_active
+        if not delta:
+            continue
+        wait = last_apply + MIN_APPLY_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)  # rate limit; ticks arriving meanwhile go out together
+            delta += delta_f.take(timeout=0)
+        changes = rig.add("frequency", delta)
+        last_apply = time.monotonic()
+        frequency = changes.get("frequency")
+        if pusher and frequency is not None:
+            try:
+                getattr(pusher, PUSH_METHOD)(frequency)
+            except Exception as e:
+                print(f"[knob] Push of {frequency} to {PUSH_URL} failed: {e}")
+
+def _knob_events():
+    # decoded, timestamped knob events, read here or by the reader process
+    active = lambda: state["knob_active"]
+    if KNOB_PROCESS:
+        with KnobProcess(PORT) as reader:
+            yield from reader.events(active)
+    else:
+        with open_port(PORT) as ser:
+            print(f"[knob] Listening on {PORT} @ {BAUD} baud...")
+            yield from read_events(ser, KnobDecoder(), active)
+
 def _knob_listener():
     last_movement_time = None
-    buffer = bytearray()
 
     try:
-        with serial.Serial(PORT, BAUD, bytesize=BYTESIZE,
-                           parity=PARITY, stopbits=STOPBITS, timeout=1) as ser:
-            print(f"[knob] Listening on {PORT} @ {BAUD} baud...")
-            while state["knob_active"]:
-                byte = ser.read(1)
-                if not byte:
-                    continue
-                b = byte[0] & 0x7F  # Ignore D7
-                if b & 0x40:
-                    buffer = bytearray([b])
+        for event in _knob_events():
+            dx = event.dx
+            now_time = event.timestamp  # when the packet's last byte arrived
+            delta_t = 0
+
+            if dx != 0:
+                if last_movement_time is None:
+                    scale = 1
                 else:
-                    buffer.append(b)
-
-                if len(buffer) == 3:
-                    result = parse_mouse_packet(buffer)
-                    buffer.clear()
-
-                    if not result:
-                        continue
-
-                    b1, b2, b3, dx = result
-                    now_time = time.time()
-                    delta_t = 0
+                    delta_t = min(now_time - last_movement_time, 0.999)
+                    scale = scale_from_speed(delta_t)
 
-                    if dx != 0:
-                        if last_movement_time is None:
-                            last_update_time = now_time;
-                            scale = 1
-                        else:
-                            delta_t = min(now_time - last_movement_time, 0.999)
-                            scale = scale_from_speed(delta_t)
+                last_movement_time = now_time # last time the knob moved
 
-                        last_movement_time = now_time # last time the knob moved
+                delta_f.add(dx * scale)
 
-                        state["delta_f"] += dx * scale
-                        if now_time - last_update_time > 0.2: # don't expect the radio to update very often
-                            state["frequency"] += state["delta_f"]
-                            state["delta_f"] = 0.0
-                            last_update_time = now_time # last time frequ was updated
-
-                        #print(f"[knob] ΔX: {dx:>3}, Scaled Δ: {dx*scale:>4}, "
-                        #      f"Freq: {old_freq:.1f} → {new_freq:.1f} (×{scale})")
+                #print(f"[knob] ΔX: {dx:>3}, Scaled Δ: {dx*scale:>4}, "
+                #      f"Freq: {old_freq:.1f} → {new_freq:.1f} (×{scale})")
 
     except Exception as e:
         print(f"[knob] Error: {e}")
@@ -112,6 +193,8 @@ def _start_knob_listener():
     t = threading.Thread(target=_knob_listener, daemon=True)
     t.start()
     state["knob_thread"] = t
+    state["tuning_thread"] = threading.Thread(target=_tuning_loop, daemon=True)
+    state["tuning_thread"].start()
 
     def shutdown():
         print("[shutdown] Stopping knob thread.")
@@ -125,32 +208,37 @@ def handle(method, params):
     retval = None
 
     if method == "system.multicall" and len(params) == 1 and isinstance(params[0], list):
+        # the whole batch is one state change: subscribers (and the snapshot,
+        # journal, ...) hear about it once, after the last call
         results = []
-        for call in params[0]:
-            try:
-                sub_method = call['methodName']
-                sub_params = call.get('params', [])
-                sub_result = handle(sub_method, sub_params)
-                results.append([sub_result])
-            except Exception as e:
-                results.append({'faultCode': 1, 'faultString': str(e)})
+        with rig.transaction():
+            for call in params[0]:
+                try:
+                    sub_method = call['methodName']
+                    sub_params = call.get('params', [])
+                    sub_result = handle(sub_method, sub_params)
+                    results.append([sub_result])
+                except Exception as e:
+                    results.append({'faultCode': 1, 'faultString': str(e)})
         return results
 
 
     if method == "rig.set_frequency" and len(params) == 1:
-        retval = state["frequency"]
-        state["frequency"] = params[0]
+        retval = rig.set("frequency", params[0])
     elif method == "rig.get_frequency" and len(params) == 1:
-        retval = state["frequency"]
+        retval = rig["frequency"]
     elif method == "rig.set_mode" and len(params) == 1:
-        state["mode"] = params[0]
+        rig.set("mode", params[0])
     elif method == "rig.get_mode" and len(params) == 1:
-        retval = state["mode"]
+        retval = rig["mode"]
     elif method == "rig.set_bandwidth" and len(params) == 1:
-        state["bandwidth"] = params[0]
+        rig.set("bandwidth", params[0])
     elif method == "rig.get_bandwidth" and len(params) == 1:
-        retval = state["bandwidth"]
+        retval = rig["bandwidth"]
     elif method == "main.get_trx_state" and len(params) == 1:
-        retval = state["trx"]
+        retval = rig["trx"]
+    elif method == "rig.set_smeter" and len(params) == 1:
+        if smeter is not None:
+            smeter.add(time.time(), rig["frequency"], params[0])
 
     return retval
@@ -3,47 +3,50 @@
 # (header unchanged)
 
 import argparse
+import fnmatch
+import os
 import time
 import threading
 import sys
-import importlib.util
-from xmlrpc.server import SimpleXMLRPCRequestHandler
-from xmlrpc.server import SimpleXMLRPCServer as BaseServer
-from socketserver import ThreadingMixIn
-import xmlrpc.client
-import code
 import queue
-import uuid
-
-# Parse command-line arguments
-parser = argparse.ArgumentParser(description="XML-RPC Proxy Logger")
-parser.add_argument("--target-host", default="localhost", help="Target host running the xml server (default: localhost)")
-parser.add_argument("--target-port", type=int, default=7363, help="Target port (default: 7363)")
-parser.add_argument("--proxy-port", type=int, default=7362, help="Port for this proxy to listen on (default: 7362)")
-parser.add_argument("--list-methods", action="store_true", help="List available methods on the target before starting the proxy")
-parser.add_argument("--verbose-methods", action="store_true", help="Include method signatures and help text when listing methods")
-parser.add_argument("--quiet", action="store_true", help="Suppress routine log output from proxy activity")
-parser.add_argument("--interactive", action="store_true", help="Open an interactive shell after starting the proxy")
-parser.add_argument("--logfile", type=str, help="Optional file to append full log output to")
-parser.add_argument("--method-map", action="append", help="Block or remap method calls: e.g. rig.take_control=BLOCK or rig.set_mode=main.set_rig_mode")
-parser.add_argument("--on-request", help="Path to Python module containing `on_request(method, params)`")
-parser.add_argument("--on-response", help="Path to Python module containing `on_response(method, params, result)`")
-parser.add_argument("--handler-only", help="Path to Python module and function to handle calls (e.g. mymod.py:handle)")
-args = parser.parse_args()
-
-TARGET_HOST = args.target_host
-TARGET_PORT = args.target_port
-PROXY_PORT = args.proxy_port
 
 start_time = time.time()
-log_file = open(args.logfile, "a") if args.logfile else None
 
+# Set up by main()
+args = None
+log_file = None
 method_map = {}
-if args.method_map:
-    for entry in args.method_map:
-        if '=' in entry:
-            orig, new = entry.split('=', 1)
-            method_map[orig.strip()] = new.strip()
+on_request = None
+on_response = None
+handler_only_fn = None
+target_handler = None
+rpc_queue = queue.Queue()  # shared task queue for XML-RPC calls
+url = None
+single_flight = None
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="XML-RPC Proxy Logger")
+    parser.add_argument("--target-host", default="localhost", help="Target host running the xml server (default: localhost)")
+    parser.add_argument("--target-port", type=int, default=7363, help="Target port (default: 7363)")
+    parser.add_argument("--proxy-port", type=int, default=7362, help="Port for this proxy to listen on (default: 7362)")
+    parser.add_argument("--list-methods", action="store_true", help="List available methods on the target before starting the proxy")
+    parser.add_argument("--verbose-methods", action="store_true", help="Include method signatures and help text when listing methods")
+    parser.add_argument("--quiet", action="store_true", help="Suppress routine log output from proxy activity")
+    parser.add_argument("--interactive", action="store_true", help="Open an interactive shell after starting the proxy")
+    parser.add_argument("--logfile", type=str, help="Optional file to append full log output to")
+    parser.add_argument("--method-map", action="append", help="Block or remap method calls: e.g. rig.take_control=BLOCK or rig.set_mode=main.set_rig_mode")
+    parser.add_argument("--on-request", help="Path to Python module containing `on_request(method, params)`")
+    parser.add_argument("--on-response", help="Path to Python module containing `on_response(method, params, result)`")
+    parser.add_argument("--handler-only", help="Path to Python module and function to handle calls (e.g. mymod.py:handle)")
+    parser.add_argument("--target-handler", help="Forward to this function in-process instead of the target over HTTP, "
+                                                 "e.g. kcat2n3fjp.py:handle (on-request/on-response still apply)")
+    parser.add_argument("--fast-codec", action="store_true", help="Parse incoming calls and build answers with fast_xmlrpc.py (falls back to xmlrpc.client)")
+    parser.add_argument("--capture", help="Append every incoming XML-RPC request body to this file (JSON lines) for fast_xmlrpc.py --bench")
+    parser.add_argument("--single-flight", action="append", metavar="PATTERN",
+                        help="Also collapse concurrent identical calls of methods matching this pattern "
+                             "(default: getters, *.get_*)")
+    parser.add_argument("--no-single-flight", action="store_true", help="Send every call upstream, even identical concurrent getters")
+    return parser
 
 def log_event(label, message):
     elapsed_ms = int((time.time() - start_time) * 1000)
@@ -54,53 +57,98 @@ def log_event(label, message):
     if log_file:
         print(line, file=log_file, flush=True)
 
-# Load callbacks if specified
-on_request = None
-on_response = None
-handler_only_fn = None
+# Plugin modules, loaded once per path however many callbacks come from them
+loaded_modules = {}
+
+def load_module(path):
+    key = os.path.realpath(path)
+    if key not in loaded_modules:
+        import importlib.util
+        import uuid
+        unique_name = f"callback_mod_{uuid.uuid4().hex}"
+        spec = importlib.util.spec_from_file_location(unique_name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        loaded_modules[key] = module
+    return loaded_modules[key]
 
 def load_callback(path, name):
     if not path:
         return None
-    unique_name = f"callback_mod_{uuid.uuid4().hex}"
-    spec = importlib.util.spec_from_file_location(unique_name, path)
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-    return getattr(module, name, None)
-
-# If handler-only mode is active
-if args.handler_only:
-    mod_path, fn_name = args.handler_only.split(":")
-    handler_only_fn = load_callback(mod_path, fn_name)
-    print(f"Handler-only mode: using {fn_name} from {mod_path}")
-else:
-    if args.on_request and args.on_response and args.on_request == args.on_response:
-        shared_module = load_callback(args.on_request, "shared")  # Just to load once
-        on_request = getattr(shared_module, "on_request", None)
-        on_response = getattr(shared_module, "on_response", None)
-    else:
-        on_request = load_callback(args.on_request, "on_request")
-        on_response = load_callback(args.on_response, "on_response")
+    return getattr(load_module(path), name, None)
 
-# Shared task queue for XML-RPC calls
-rpc_queue = queue.Queue()
+def enqueue_rpc_call(method, params, response_queue=None):
+    rpc_queue.put((method, params, response_queue))
 
-url = f"http://{TARGET_HOST}:{TARGET_PORT}"
-print(f"Starting XML-RPC proxy:")
-print(f"  Listening on port {PROXY_PORT}")
-if not handler_only_fn:
-    print(f"  Forwarding to {url}")
+class SingleFlight:
+    # Identical calls (same method and params) that arrive while one is
+    # already on its way upstream wait for that call's result instead of
+    # sending their own. Nothing is cached: once the answer is in, the next
+    # call goes upstream again.
+    #
+    # Only methods matching the patterns are collapsed; setters like
+    # text.add_tx must reach the target once per call. Any other call is a
+    # barrier: calls go upstream in queue order, so a getter arriving after a
+    # setter must not share the answer of a getter queued before it.
+    def __init__(self, patterns=("*.get_*",)):
+        self.patterns = tuple(patterns)
+        self.lock = threading.Lock()
+        self.in_flight = {}  # (method, repr(params)) -> [done event, result, exception]
+        self.upstream = 0
+        self.saved = 0
+        self.barriers = 0
 
-class QuietRequestHandler(SimpleXMLRPCRequestHandler):
-    def log_message(self, format, *args_inner):
-        if not self.server.quiet_mode:
-            super().log_message(format, *args_inner)
+    def collapsible(self, method):
+        return any(fnmatch.fnmatchcase(method, pattern) for pattern in self.patterns)
 
-class ThreadingXMLRPCServer(ThreadingMixIn, BaseServer):
-    pass
+    def call(self, method, params, send):
+        if not self.collapsible(method):
+            with self.lock:
+                if self.in_flight:
+                    self.in_flight.clear()  # running calls finish, but nobody else joins them
+                    self.barriers += 1
+                self.upstream += 1
+            return send(method, params)
 
-def enqueue_rpc_call(method, params, response_queue=None):
-    rpc_queue.put((method, params, response_queue))
+        key = (method, repr(params))
+        with self.lock:
+            flight = self.in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.in_flight[key] = [threading.Event(), None, None]
+                self.upstream += 1
+            else:
+                self.saved += 1
+        if not leader:
+            log_event("COLLAPSED", f"{method}({params}) waits for the call already in flight")
+            flight[0].wait()
+        else:
+            try:
+                flight[1] = send(method, params)
+            except BaseException as e:
+                flight[2] = e
+            finally:
+                with self.lock:
+                    if self.in_flight.get(key) is flight:
+                        del self.in_flight[key]
+                flight[0].set()
+        if flight[2] is not None:
+            raise flight[2]
+        return flight[1]
+
+    def stats(self):
+        return {"upstream": self.upstream, "saved": self.saved, "barriers": self.barriers}
+
+def _send_upstream(method, params):
+    response_q = queue.Queue()
+    enqueue_rpc_call(method, params, response_q)
+    return response_q.get()
+
+def call_upstream(method, params):
+    # every call to the target goes through here
+    if single_flight:
+        return single_flight.call(method, params, _send_upstream)
+    return _send_upstream(method, params)
 
 class ProxyHandler:
     def _dispatch(self, method, params):
@@ -133,9 +181,7 @@ class ProxyHandler:
                 log_event("ERROR", f"handler_only_fn error: {e}")
                 return {'faultCode': 1, 'faultString': str(e)}
 
-        response_q = queue.Queue()
-        enqueue_rpc_call(method, params, response_q)
-        result = response_q.get()
+        result = call_upstream(method, params)
         if on_response:
             try:
                 result = on_response(method, params, result) or result
@@ -146,7 +192,12 @@ class ProxyHandler:
         return result
 
 def rpc_dispatcher():
-    target = xmlrpc.client.ServerProxy(url, allow_none=True)
+    if target_handler:
+        from loopback import LoopbackProxy
+        target = LoopbackProxy(target_handler)
+    else:
+        import xmlrpc.client
+        target = xmlrpc.client.ServerProxy(url, allow_none=True)
     while True:
         method, params, response_q = rpc_queue.get()
         try:
@@ -158,37 +209,46 @@ def rpc_dispatcher():
         if response_q:
             response_q.put(result)
 
-if not handler_only_fn:
-    threading.Thread(target=rpc_dispatcher, daemon=True).start()
+def make_server(port, fast_codec=False, capture=None):
+    from xmlrpc.server import SimpleXMLRPCRequestHandler
+    from xmlrpc.server import SimpleXMLRPCServer as BaseServer
+    from socketserver import ThreadingMixIn
+
+    class QuietRequestHandler(SimpleXMLRPCRequestHandler):
+        def log_message(self, format, *args_inner):
+            if not self.server.quiet_mode:
+                super().log_message(format, *args_inner)
+
+    if fast_codec or capture:
+        from fast_xmlrpc import FastMarshalMixin, open_capture
+
+        class ThreadingXMLRPCServer(FastMarshalMixin, ThreadingMixIn, BaseServer):
+            pass
+    else:
+        class ThreadingXMLRPCServer(ThreadingMixIn, BaseServer):
+            pass
+
+    server = ThreadingXMLRPCServer(('', port), requestHandler=QuietRequestHandler, allow_none=True)
+    if fast_codec or capture:
+        server.fast_codec = fast_codec
+        server.capture = open_capture(capture) if capture else None
+    return server
 
-server = ThreadingXMLRPCServer(('', PROXY_PORT), requestHandler=QuietRequestHandler, allow_none=True)
-server.quiet_mode = args.quiet
-server.register_instance(ProxyHandler())
-print(f"XML-RPC proxy running on port {PROXY_PORT}")
+def interact(server):
+    import code
 
-if args.interactive:
     def run_server():
         server.serve_forever()
 
     thread = threading.Thread(target=run_server, daemon=True)
     thread.start()
 
-    interactive_url = f"http://localhost:{PROXY_PORT}"
-    class NoKeepAliveTransport(xmlrpc.client.Transport):
-        def request(self, host, handler, request_body, verbose=False):
-            self._extra_headers = [("Connection", "close")]
-            response = super().request(host, handler, request_body, verbose)
-            if hasattr(self, "_connection") and isinstance(self._connection, dict):
-                self._connection.pop(host, None)
-            return response
-
     def call(method, *args):
-        response_q = queue.Queue()
-        enqueue_rpc_call(method, args, response_q)
-        return response_q.get()
+        return call_upstream(method, args)
 
     namespace = {
         'call': call,
+        'stats': lambda: single_flight.stats() if single_flight else None,
         'log': lambda m: log_event("SHELL", m),
         'quit': lambda: exit(),
         'exit': lambda: exit(),
@@ -199,8 +259,68 @@ if args.interactive:
     except KeyboardInterrupt:
         print("KeyboardInterrupt — exiting.")
         sys.exit()
-else:
-    server.serve_forever()
 
-if log_file:
-    log_file.close()
+def main(argv=None):
+    global args, log_file, on_request, on_response, handler_only_fn, target_handler, url, single_flight
+
+    args = build_parser().parse_args(argv)
+    log_file = open(args.logfile, "a") if args.logfile else None
+
+    if args.method_map:
+        for entry in args.method_map:
+            if '=' in entry:
+                orig, new = entry.split('=', 1)
+                method_map[orig.strip()] = new.strip()
+
+    # plugins can tell their own proxy apart from a target (see tuning_knob_callback.py)
+    os.environ["KACHINA_PROXY_PORT"] = str(args.proxy_port)
+
+    # Load callbacks if specified
+    loading = time.time()
+    if args.handler_only:
+        mod_path, fn_name = args.handler_only.split(":")
+        handler_only_fn = load_callback(mod_path, fn_name)
+        print(f"Handler-only mode: using {fn_name} from {mod_path}")
+    else:
+        on_request = load_callback(args.on_request, "on_request")
+        on_response = load_callback(args.on_response, "on_response")
+        if args.target_handler:
+            mod_path, fn_name = args.target_handler.split(":")
+            target_handler = load_callback(mod_path, fn_name)
+    plugins_ms = (time.time() - loading) * 1000
+
+    url = f"http://{args.target_host}:{args.target_port}"
+    print(f"Starting XML-RPC proxy:")
+    print(f"  Listening on port {args.proxy_port}")
+    if target_handler:
+        print(f"  Forwarding in-process to {args.target_handler}")
+    elif not handler_only_fn:
+        print(f"  Forwarding to {url}")
+
+    if not handler_only_fn:
+        threading.Thread(target=rpc_dispatcher, daemon=True).start()
+        if not args.no_single_flight:
+            single_flight = SingleFlight(("*.get_*",) + tuple(args.single_flight or ()))
+            print(f"  Collapsing concurrent identical calls of {', '.join(single_flight.patterns)}")
+
+    server = make_server(args.proxy_port, args.fast_codec, args.capture)
+    server.quiet_mode = args.quiet
+    server.register_instance(ProxyHandler())
+    print(f"XML-RPC proxy running on port {args.proxy_port} "
+          f"(ready in {(time.time() - start_time) * 1000:.0f} ms, plugins {plugins_ms:.0f} ms)")
+
+    try:
+        if args.interactive:
+            interact(server)
+        else:
+            server.serve_forever()
+    finally:
+        if single_flight:
+            stats = single_flight.stats()
+            print(f"Single-flight: {stats['upstream']} calls sent upstream, {stats['saved']} saved "
+                  f"by joining one in flight, {stats['barriers']} barriers")
+        if log_file:
+            log_file.close()
+
+if __name__ == "__main__":
+    main()
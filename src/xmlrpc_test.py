@@ -1,52 +1,269 @@
+# xmlrpc_test.py
+# generic XML-RPC server that records every call it receives, to learn what
+# a new kcat or fldigi version sends. Point kcat at it (it answers on 7362
+# like fldigi) and leave it running.
+#
+# Memory stays bounded however long it runs:
+#   - params are deduplicated by an 8 byte hash, and at most --max_distinct
+#     hashes are kept per method (after that the distinct count is a lower bound)
+#   - how often each params value was seen is estimated with a count-min
+#     sketch of fixed size, and only the --top most frequent values per
+#     method are kept as examples
+#   - the schema is inferred per method as it goes: arity counts and, per
+#     parameter position, the XML-RPC types seen (nested arrays and structs
+#     included, to a fixed depth)
+# Calls inside system.multicall are recorded under their own method names.
+#
+# Ctrl+C prints a summary; --export writes it as JSON, at exit and every
+# --export_interval seconds.
+
 from xmlrpc.server import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
-from collections import defaultdict
+from array import array
+from collections import Counter
+import argparse
+import hashlib
+import json
+import os
 import signal
 import sys
+import threading
+import time
+
+MAX_POSITIONS = 16   # parameter positions tracked per method
+MAX_TYPES = 32       # distinct type signatures kept per position
+TYPE_DEPTH = 3       # how deep array and struct members are described
+
+class CountMinSketch:
+    def __init__(self, width=4096, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("L", bytes(array("L").itemsize * width)) for _ in range(depth)]
+
+    def _columns(self, key):
+        digest = hashlib.blake2b(key, digest_size=4 * self.depth).digest()
+        return [int.from_bytes(digest[4 * i:4 * i + 4], "little") % self.width for i in range(self.depth)]
+
+    def add(self, key, count=1):
+        # returns the new estimate for key
+        estimate = None
+        for row, column in zip(self.rows, self._columns(key)):
+            row[column] += count
+            estimate = row[column] if estimate is None else min(estimate, row[column])
+        return estimate
+
+    def estimate(self, key):
+        return min(row[column] for row, column in zip(self.rows, self._columns(key)))
+
+    def nbytes(self):
+        return sum(row.itemsize * len(row) for row in self.rows)
+
+def type_signature(value, depth=TYPE_DEPTH):
+    # XML-RPC type of value, e.g. "array<struct{methodName:string,params:array<double>}>"
+    if value is None:
+        return "nil"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, (list, tuple)):
+        if depth <= 0 or not value:
+            return "array"
+        members = sorted({type_signature(item, depth - 1) for item in value[:8]})
+        return f"array<{'|'.join(members)}>"
+    if isinstance(value, dict):
+        if depth <= 0:
+            return "struct"
+        members = ",".join(f"{key}:{type_signature(value[key], depth - 1)}" for key in sorted(value)[:16])
+        return f"struct{{{members}}}"
+    if isinstance(value, (bytes, bytearray)) or type(value).__name__ == "Binary":
+        return "base64"
+    if type(value).__name__ in ("DateTime", "datetime"):
+        return "dateTime"
+    return type(value).__name__
+
+class MethodRecord:
+    def __init__(self, now):
+        self.calls = 0
+        self.first_seen = now
+        self.last_seen = now
+        self.arity = Counter()
+        self.positions = []        # per position: Counter of type signatures
+        self.distinct = set()      # params hashes, up to max_distinct
+        self.distinct_full = False
+        self.top = {}              # params hash -> [estimated count, example]
+
+    def summary(self):
+        return {
+            "calls": self.calls,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "arity": {str(n): count for n, count in sorted(self.arity.items())},
+            "params": [dict(types.most_common()) for types in self.positions],
+            "distinct_params": len(self.distinct),
+            "distinct_is_lower_bound": self.distinct_full,
+            "top_params": [{"params": example, "estimated_calls": estimate}
+                           for estimate, example in sorted(self.top.values(), key=lambda item: -item[0])],
+        }
+
+class Recorder:
+    def __init__(self, max_methods=1000, max_distinct=4096, top=10, sketch_width=4096, sketch_depth=4):
+        self.max_methods = max_methods
+        self.max_distinct = max_distinct
+        self.top_size = top
+        self.sketch = CountMinSketch(sketch_width, sketch_depth)
+        self.methods = {}
+        self.calls = 0
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def record(self, method, params):
+        with self.lock:
+            self._record(method, params, time.time())
+            if method == "system.multicall" and params and isinstance(params[0], list):
+                for call in params[0]:
+                    if isinstance(call, dict):
+                        self._record(str(call.get("methodName")), tuple(call.get("params", ())), time.time())
 
-# Store method calls and their arguments
-method_log = defaultdict(list)
+    def _record(self, method, params, now):
+        self.calls += 1
+        record = self.methods.get(method)
+        if record is None:
+            if len(self.methods) >= self.max_methods:
+                method = "(other methods)"
+                record = self.methods.get(method)
+            if record is None:
+                record = self.methods[method] = MethodRecord(now)
+        record.calls += 1
+        record.last_seen = now
+        record.arity[len(params)] += 1
+        for position, value in enumerate(params[:MAX_POSITIONS]):
+            if position == len(record.positions):
+                record.positions.append(Counter())
+            types = record.positions[position]
+            signature = type_signature(value)
+            if signature in types or len(types) < MAX_TYPES:
+                types[signature] += 1
+
+        text = repr(params)
+        digest = hashlib.blake2b(text.encode("utf-8", "replace"), digest_size=8).digest()
+        if digest not in record.distinct:
+            if len(record.distinct) < self.max_distinct:
+                record.distinct.add(digest)
+            else:
+                record.distinct_full = True
+        estimate = self.sketch.add(method.encode("utf-8", "replace") + b"\0" + digest)
+        if digest in record.top:
+            record.top[digest][0] = estimate
+        elif len(record.top) < self.top_size:
+            record.top[digest] = [estimate, text[:200]]
+        else:
+            smallest = min(record.top, key=lambda key: record.top[key][0])
+            if estimate > record.top[smallest][0]:
+                del record.top[smallest]
+                record.top[digest] = [estimate, text[:200]]
+
+    def summary(self):
+        with self.lock:
+            return {
+                "started": self.started,
+                "exported": time.time(),
+                "calls": self.calls,
+                "sketch_bytes": self.sketch.nbytes(),
+                "methods": {method: record.summary() for method, record in sorted(self.methods.items())},
+            }
+
+    def export(self, path):
+        data = self.summary()
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+RECORDER = Recorder()
+QUIET = False
 
 class GenericHandler:
     def _dispatch(self, method, params):
-        print(f"Received XML-RPC call: method='{method}', params={params}")
-        if params not in method_log[method]:
-            method_log[method].append(params)
+        if not QUIET:
+            print(f"Received XML-RPC call: method='{method}', params={params}")
+        RECORDER.record(method, params)
         return f"Received method '{method}' with params {params}"
 
 def print_summary():
-    print("\n--- XML-RPC Method Call Summary ---")
-    for method, args_list in method_log.items():
-        print(f"\nMethod: {method}")
-        for i, args in enumerate(args_list, start=1):
-            print(f"  [{i}] args: {args}")
-    print("\nShutting down server.")
-    sys.exit(0)
-
-def main():
-    host = "localhost"
-    port = 7362
+    summary = RECORDER.summary()
+    print(f"\n--- XML-RPC Method Call Summary ({summary['calls']} calls) ---")
+    for method, record in summary["methods"].items():
+        distinct = record["distinct_params"]
+        print(f"\nMethod: {method}  calls: {record['calls']}  "
+              f"distinct params: {'>=' if record['distinct_is_lower_bound'] else ''}{distinct}")
+        print(f"  arity: {record['arity']}")
+        for position, types in enumerate(record["params"]):
+            print(f"  param {position}: {types}")
+        for i, top in enumerate(record["top_params"], start=1):
+            print(f"  [{i}] ~{top['estimated_calls']}x args: {top['params']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generic XML-RPC server that records every call it receives")
+    parser.add_argument("--host", default="localhost", help="Host interface to bind (default: localhost)")
+    parser.add_argument("--port", type=int, default=7362, help="Port to bind (default: 7362)")
+    parser.add_argument("--quiet", action="store_true", help="Don't print each call")
+    parser.add_argument("--export", default=None, help="Write the summary as JSON to this file")
+    parser.add_argument("--export_interval", type=float, default=60.0,
+                        help="Seconds between JSON exports while running (default: 60)")
+    parser.add_argument("--max_distinct", type=int, default=4096,
+                        help="Distinct params hashes kept per method (default: 4096)")
+    parser.add_argument("--top", type=int, default=10, help="Most frequent params kept per method (default: 10)")
+    args = parser.parse_args(argv)
+    host = args.host
+    port = args.port
+
+    global RECORDER, QUIET
+    RECORDER = Recorder(max_distinct=args.max_distinct, top=args.top)
+    QUIET = args.quiet
 
     server = SimpleXMLRPCServer(
         (host, port),
         requestHandler=SimpleXMLRPCRequestHandler,
         allow_none=True,
-        logRequests=True
+        logRequests=not args.quiet
     )
     server.register_instance(GenericHandler())
 
     print(f"Generic XML-RPC server listening on {host}:{port}")
+    if args.export:
+        print(f"Exporting the summary to {args.export} every {args.export_interval:g} s")
+
+        def exporter():
+            while True:
+                time.sleep(args.export_interval)
+                try:
+                    RECORDER.export(args.export)
+                except Exception as e:
+                    print(f"Export to {args.export} failed: {e}")
+        threading.Thread(target=exporter, daemon=True).start()
     print("Press Ctrl+C to stop and see a summary of method calls.")
 
+    def shutdown():
+        print_summary()
+        if args.export:
+            RECORDER.export(args.export)
+            print(f"\nSummary written to {args.export}")
+        print("\nShutting down server.")
+        sys.exit(0)
+
     # Gracefully handle Ctrl+C
     def signal_handler(sig, frame):
-        print_summary()
+        shutdown()
 
     signal.signal(signal.SIGINT, signal_handler)
 
     try:
         server.serve_forever()
     except KeyboardInterrupt:
-        print_summary()
+        shutdown()
 
 if __name__ == "__main__":
     main()
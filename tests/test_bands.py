@@ -0,0 +1,7 @@
+from bands import freq_to_band
+
+def test_band_edges():
+    assert freq_to_band(14000000) == "20m"
+    assert freq_to_band(14349999.0) == "20m"
+    assert freq_to_band(14350000) == "Unknown"
+    assert freq_to_band("not a frequency") == "Unknown"
@@ -0,0 +1,65 @@
+import socket
+
+from cmd_server import CommandServer, split_frames, KEEPALIVE, MAX_FRAME
+
+def test_split_frames_keeps_incomplete_frames():
+    frames, rest = split_frames("<CMD>get_freq</CMD>\n<SET>set_mode=USB</SET><CMD>get")
+    assert frames == ["<CMD>get_freq</CMD>", "<SET>set_mode=USB</SET>"]
+    assert rest == "<CMD>get"
+
+def test_split_frames_drops_a_runaway_frame():
+    frames, rest = split_frames("<CMD>" + "x" * MAX_FRAME)
+    assert len(frames) == 1 and rest == ""
+
+def _server(**options):
+    received = []
+
+    def handle(session, command):
+        received.append(command)
+        return f"<RESPONSE>{command}</RESPONSE>"
+    server = CommandServer("localhost", 0, handle, **options)
+    assert server.start()
+    return server, server.server.sockets[0].getsockname()[1], received
+
+def test_commands_on_one_connection():
+    server, port, received = _server()
+    with socket.create_connection(("localhost", port), timeout=5) as sock:
+        for command in (b"<CMD>get_freq</CMD>", b"<CMD>get_mode</CMD>"):
+            sock.sendall(command)
+            assert sock.recv(4096) == b"<RESPONSE>" + command + b"</RESPONSE>"
+    assert received == ["<CMD>get_freq</CMD>", "<CMD>get_mode</CMD>"]
+    server.stop()
+
+def _read_to_eof(sock):
+    data = b""
+    while chunk := sock.recv(4096):
+        data += chunk
+    return data
+
+def test_one_shot_closes_after_the_response():
+    server, port, _ = _server(one_shot=True)
+    with socket.create_connection(("localhost", port), timeout=5) as sock:
+        sock.sendall(b"<CMD>get_freq</CMD>")
+        assert _read_to_eof(sock) == b"<RESPONSE><CMD>get_freq</CMD></RESPONSE>"
+    server.stop()
+
+def test_one_shot_answers_every_command_pipelined_in_the_first_write():
+    server, port, received = _server(one_shot=True)
+    with socket.create_connection(("localhost", port), timeout=5) as sock:
+        sock.sendall(b"<CMD>get_freq</CMD><CMD>get_mode</CMD>")
+        assert _read_to_eof(sock) == b"<RESPONSE><CMD>get_freq</CMD></RESPONSE><RESPONSE><CMD>get_mode</CMD></RESPONSE>"
+    assert received == ["<CMD>get_freq</CMD>", "<CMD>get_mode</CMD>"]
+    server.stop()
+
+def test_keepalive_and_characters_split_across_reads():
+    server, port, received = _server(one_shot=True)
+    with socket.create_connection(("localhost", port), timeout=5) as sock:
+        sock.sendall(KEEPALIVE.encode())
+        assert sock.recv(4096) == b"<RESPONSE>OK</RESPONSE>"
+        text = "<CMD>name=Ælfgifu</CMD>".encode("utf-8")
+        split = text.index("Æ".encode("utf-8")) + 1
+        sock.sendall(text[:split])
+        sock.sendall(text[split:])
+        assert sock.recv(4096).decode("utf-8") == "<RESPONSE><CMD>name=Ælfgifu</CMD></RESPONSE>"
+    assert received == ["<CMD>name=Ælfgifu</CMD>"]
+    server.stop()
@@ -0,0 +1,53 @@
+import threading
+
+from fanout import FanOut, Sink, COALESCE, DROP_OLDEST, DROP_NEWEST
+
+def test_coalesce_keeps_the_latest_call_per_method():
+    sink = Sink("test", None, maxsize=8, policy=COALESCE)
+    for frequency in (7000000.0, 7000100.0, 7000200.0):
+        sink.offer("rig.set_frequency", [frequency])
+    sink.offer("rig.set_mode", ["CW"])
+    assert sink._next() == ("rig.set_frequency", [7000200.0])
+    assert sink._next() == ("rig.set_mode", ["CW"])
+    assert sink.stats()["coalesced"] == 2
+
+def test_coalesce_burst_does_not_push_out_other_methods():
+    sink = Sink("test", None, maxsize=2, policy=COALESCE)
+    sink.offer("rig.set_mode", ["USB"])
+    for i in range(1000):
+        sink.offer("rig.set_frequency", [float(i)])
+    assert sink.stats()["dropped"] == 0
+    assert sink._next() == ("rig.set_mode", ["USB"])
+    assert sink._next() == ("rig.set_frequency", [999.0])
+
+def test_drop_policies():
+    oldest = Sink("oldest", None, maxsize=2, policy=DROP_OLDEST)
+    newest = Sink("newest", None, maxsize=2, policy=DROP_NEWEST)
+    for sink in (oldest, newest):
+        for i in range(3):
+            sink.offer("rig.set_smeter", [i])
+        assert sink.stats()["dropped"] == 1
+    assert [oldest._next()[1] for _ in range(2)] == [[1], [2]]
+    assert [newest._next()[1] for _ in range(2)] == [[0], [1]]
+
+def test_publish_splits_multicalls_unless_the_sink_takes_batches():
+    received = {"split": [], "batch": []}
+    done = threading.Semaphore(0)
+
+    def consumer(name):
+        def consume(method, params):
+            received[name].append((method, params))
+            done.release()
+        return consume
+
+    fanout = FanOut()
+    fanout.register(Sink("split", consumer("split"), policy=DROP_NEWEST))
+    fanout.register(Sink("batch", consumer("batch"), policy=DROP_NEWEST, batches=True,
+                         accept=lambda method: method != "rig.set_smeter"))
+    calls = [{"methodName": "rig.set_frequency", "params": [14070000.0]},
+             {"methodName": "rig.set_smeter", "params": [40]}]
+    fanout.publish("system.multicall", [calls])
+    for _ in range(3):
+        assert done.acquire(timeout=2)
+    assert received["split"] == [("rig.set_frequency", [14070000.0]), ("rig.set_smeter", [40])]
+    assert received["batch"] == [("system.multicall", [calls[:1]])]
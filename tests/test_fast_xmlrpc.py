@@ -0,0 +1,23 @@
+import xmlrpc.client
+
+import pytest
+
+from fast_xmlrpc import parse_call, dump_response, sample_payloads
+
+@pytest.mark.parametrize("payload", sample_payloads())
+def test_parse_call_agrees_with_the_standard_library(payload):
+    params, method = xmlrpc.client.loads(payload)
+    parsed = parse_call(payload)
+    assert parsed is not None  # kcat's calls all take the fast path
+    assert parsed[0] == method
+    assert list(parsed[1]) == list(params)
+
+@pytest.mark.parametrize("value", [None, 14070000.0, 7, "USB", True, [], ["RX", 1.5], "<&>"])
+def test_dump_response_agrees_with_the_standard_library(value):
+    fast = dump_response(value)
+    expected = xmlrpc.client.dumps((value,), methodresponse=True, allow_none=True).encode("utf-8")
+    assert xmlrpc.client.loads(fast) == xmlrpc.client.loads(expected)
+
+def test_unusual_encodings_fall_back():
+    payload = xmlrpc.client.dumps(("USB",), "rig.set_mode", encoding="iso-8859-1").encode("iso-8859-1")
+    assert parse_call(payload) is None
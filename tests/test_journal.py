@@ -0,0 +1,67 @@
+import datetime
+import time
+
+import journal
+from rig_state import RigState
+
+def _journal(tmp_path, rows):
+    path = str(tmp_path / "journal.db")
+    recorder = journal.Journal(path, batch_interval=0.01)
+    for ts, frequency, mode, *event in rows:
+        recorder.record("kcat", {"frequency": frequency, "mode": mode, "trx": "RX"}, ts=ts,
+                        event=event[0] if event else "change")
+    recorder.close()
+    return journal.connect(path)
+
+def test_state_at_and_history(tmp_path):
+    connection = _journal(tmp_path, [(100.0, 14070000.0, "USB"), (200.0, 7030000.0, "CW")])
+    assert journal.state_at(connection, 150.0)[2:5] == (14070000.0, "20m", "USB")
+    assert [row[3] for row in journal.history(connection, 0.0, 300.0)] == ["20m", "40m"]
+
+def test_band_time_sums_each_band_and_mode(tmp_path):
+    connection = _journal(tmp_path, [(100.0, 14070000.0, "USB"), (400.0, 7030000.0, "CW"),
+                                     (500.0, 14070000.0, "USB")])
+    rows = {(band, mode): (seconds, count) for band, mode, seconds, count in journal.band_time(connection, 100.0, 600.0)}
+    assert rows == {("20m", "USB"): (400.0, 2), ("40m", "CW"): (100.0, 1)}
+
+def test_band_time_counts_the_band_in_effect_at_since(tmp_path):
+    connection = _journal(tmp_path, [(100.0, 14070000.0, "USB"), (1000.0, 7030000.0, "CW")])
+    rows = {(band, mode): seconds for band, mode, seconds, _ in journal.band_time(connection, 500.0, 1200.0)}
+    assert rows == {("20m", "USB"): 500.0, ("40m", "CW"): 200.0}
+
+def test_band_time_counts_a_parked_hour_in_full(tmp_path):
+    heartbeats = [(float(ts), 14070000.0, "USB", "heartbeat") for ts in range(60, 3600, 60)]
+    connection = _journal(tmp_path, [(0.0, 14070000.0, "USB")] + heartbeats
+                          + [(3600.0, 14070000.0, "USB", "end")])
+    assert journal.band_time(connection, 0.0, 5000.0) == [("20m", "USB", 3600.0, 1)]
+
+def test_band_time_caps_only_across_session_boundaries(tmp_path):
+    connection = _journal(tmp_path, [
+        (0.0, 14070000.0, "USB"), (600.0, 14070000.0, "USB", "heartbeat"),
+        (1200.0, 14070000.0, "USB", "end"),                        # clean stop: 1200 s
+        (5000.0, 7030000.0, "CW"),                                 # killed, no end row: capped
+        (20000.0, 7030000.0, "CW"), (20300.0, 7030000.0, "CW", "end"),
+    ])
+    rows = {(band, mode): (seconds, count) for band, mode, seconds, count in journal.band_time(connection, 0.0, 30000.0)}
+    assert rows == {("20m", "USB"): (1200.0, 1), ("40m", "CW"): (900.0 + 300.0, 2)}
+
+def test_follow_writes_heartbeats_and_an_end_row(tmp_path):
+    path = str(tmp_path / "journal.db")
+    recorder = journal.Journal(path, batch_interval=0.01, heartbeat=0.05)
+    rig = RigState(frequency=14070000.0, mode="USB", bandwidth="3000", trx="RX")
+    recorder.follow(rig, "kcat")
+    time.sleep(0.3)
+    recorder.close()
+    events = [event for event, in journal.connect(path).execute("SELECT event FROM transitions ORDER BY ts")]
+    assert events[0] == "change" and events[-1] == "end"
+    assert "heartbeat" in events
+    assert [row[7] for row in journal.history(journal.connect(path), 0.0, time.time() + 1)] == ["change", "end"]
+
+def test_cli_takes_the_database_as_an_option(tmp_path, capsys, monkeypatch):
+    two_pm = datetime.datetime.combine(datetime.date.today(), datetime.time(14, 0)).timestamp()
+    _journal(tmp_path, [(two_pm, 14070000.0, "USB")])
+    journal.main(["--db", str(tmp_path / "journal.db"), "at", "14:32"])
+    assert "14070000.0  20m    USB" in capsys.readouterr().out
+    monkeypatch.setenv("KACHINA_JOURNAL", str(tmp_path / "journal.db"))
+    journal.main(["at", "14:32"])
+    assert "14070000.0  20m    USB" in capsys.readouterr().out
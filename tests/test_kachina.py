@@ -0,0 +1,13 @@
+import kachina
+
+def test_unknown_command(capsys):
+    assert kachina.main(["nope"]) == 2
+    assert "unknown command nope" in capsys.readouterr().out
+
+def test_usage_lists_the_in_process_settings(capsys):
+    assert kachina.main(["--help"]) == 0
+    out = capsys.readouterr().out
+    for name in kachina.COMMANDS:
+        assert f"  {name} " in out
+    for variable, _ in kachina.ENVIRONMENT["proxy-n3fjp"]:
+        assert variable in out
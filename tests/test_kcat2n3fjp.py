@@ -0,0 +1,69 @@
+import socket
+import time
+
+import kcat2n3fjp
+from rig_state import RigState
+
+class FakeLogger:
+    def __init__(self):
+        self.updates = []
+
+    def update_from_state(self, freq, mode):
+        self.updates.append((freq, mode))
+
+def test_a_multicall_is_one_logger_update():
+    logger = FakeLogger()
+    handler = kcat2n3fjp.KCATHandler(RigState(**kcat2n3fjp.DEFAULT_STATE), logger=logger)
+    batch = [{"methodName": "rig.set_frequency", "params": [14070100.0]},
+             {"methodName": "rig.set_mode", "params": ["USB"]},
+             {"methodName": "rig.set_smeter", "params": [40]}]
+    assert handler._dispatch("system.multicall", [batch]) == [[7000.0], [None], [None]]
+    assert logger.updates == [(14070100.0, "USB")]
+
+def drain(fanout, delivered, timeout=2):
+    # waits until the sinks have handled `delivered` calls between them
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = fanout.stats().values()
+        if sum(sink["delivered"] + sink["failed"] for sink in stats) >= delivered:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"sinks didn't drain: {fanout.stats()}")
+
+def test_fanout_answers_getters_locally_without_fldigi():
+    logger = FakeLogger()
+    handler = kcat2n3fjp.KCATHandler(RigState(**kcat2n3fjp.DEFAULT_STATE), logger=logger)
+    fanout = kcat2n3fjp.start_fanout(handler, "localhost", 1)  # nothing listens on port 1
+    assert handler._dispatch("rig.set_frequency", [14070100.0]) is None
+    assert handler._dispatch("rig.set_mode", ["USB"]) is None
+    drain(fanout, 2)
+    assert handler._dispatch("rig.get_mode", []) == "USB"
+    assert handler._dispatch("main.get_frequency", []) == 14070100.0
+    assert logger.updates[-1] == (14070100.0, "USB")
+
+def test_fanout_hands_the_logger_one_update_per_batch():
+    logger = FakeLogger()
+    handler = kcat2n3fjp.KCATHandler(RigState(**kcat2n3fjp.DEFAULT_STATE), logger=logger)
+    fanout = kcat2n3fjp.start_fanout(handler, "localhost", 1, timeout=0.5)
+    batch = [{"methodName": "rig.set_frequency", "params": [14070100.0]},
+             {"methodName": "rig.set_mode", "params": ["USB"]},
+             {"methodName": "rig.set_smeter", "params": [40]}]
+    handler._dispatch("system.multicall", [batch])
+    drain(fanout, 1)
+    assert logger.updates == [(14070100.0, "USB")]
+    assert handler._dispatch("rig.get_mode", []) == "USB"
+
+def test_a_hung_fldigi_times_out():
+    handler = kcat2n3fjp.KCATHandler(RigState(**kcat2n3fjp.DEFAULT_STATE))
+    with socket.socket() as hung:  # accepts the connection, never answers
+        hung.bind(("localhost", 0))
+        hung.listen()
+        kcat2n3fjp.start_fanout(handler, "localhost", hung.getsockname()[1], timeout=0.2)
+        start = time.monotonic()
+        assert handler._dispatch("main.get_frequency", []) == kcat2n3fjp.DEFAULT_STATE["frequency"]
+        assert time.monotonic() - start < 1.0
+
+def test_the_logger_sink_skips_the_smeter_and_getters():
+    assert kcat2n3fjp.n3fjp_wants("rig.set_frequency")
+    assert not kcat2n3fjp.n3fjp_wants("rig.set_smeter")
+    assert not kcat2n3fjp.n3fjp_wants("main.get_frequency")
@@ -0,0 +1,28 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import knob_capture
+from knob_decoder import KnobDecoder, synthetic_stream, BYTE_TIME
+
+def test_decode_matches_knob_decoder_on_random_reads(tmp_path):
+    stream = synthetic_stream(2000, noise=0.02, seed=7)
+    rng = random.Random(3)
+    path = str(tmp_path / "knob.cap")
+    decoder = KnobDecoder()
+    expected = []
+    arrival_ns = 1_000_000_000
+    with knob_capture.CaptureWriter(path) as capture:
+        pos = 0
+        while pos < len(stream):
+            chunk = stream[pos:pos + rng.randint(1, 20)]
+            pos += len(chunk)
+            # a read can't arrive faster than the line delivers its bytes
+            arrival_ns += int(len(chunk) * BYTE_TIME * 1e9) + rng.randint(0, 50) * 10_000_000
+            capture.write(chunk, arrival_ns)
+            expected += decoder.feed(chunk, arrival_ns * 1e-9)
+    times, dx = knob_capture.decode(*knob_capture.load(path))
+    assert dx.tolist() == [event.dx for event in expected]
+    assert np.allclose(times, [event.timestamp for event in expected], atol=1e-6)
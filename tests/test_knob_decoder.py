@@ -0,0 +1,17 @@
+from knob_decoder import KnobDecoder, encode_packet, parse_mouse_packet
+
+def test_packets_split_across_reads_decode_once():
+    decoder = KnobDecoder()
+    data = encode_packet(5) + encode_packet(-3)
+    events = decoder.feed(data[:2], 1.0) + decoder.feed(data[2:], 2.0)
+    assert [event.dx for event in events] == [5, -3]
+    assert decoder.stats() == {"packets": 2, "bad_bytes": 0, "resyncs": 0}
+
+def test_stray_bytes_and_resyncs_are_counted():
+    decoder = KnobDecoder()
+    events = decoder.feed(b"\x01" + encode_packet(2)[:2] + encode_packet(-1), 1.0)
+    assert [event.dx for event in events] == [-1]
+    assert decoder.stats() == {"packets": 1, "bad_bytes": 1, "resyncs": 1}
+
+def test_encode_and_parse_agree():
+    assert parse_mouse_packet(encode_packet(-7))[3] == -7
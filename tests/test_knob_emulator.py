@@ -0,0 +1,28 @@
+import os
+import random
+import select
+
+from knob_decoder import KnobDecoder
+from knob_emulator import KnobEmulator, profile_packets
+
+def test_profiles_are_reproducible():
+    first = list(profile_packets("reverse", 1.0, random.Random(5)))
+    assert first == list(profile_packets("reverse", 1.0, random.Random(5)))
+    assert {dx > 0 for _, dx in first} == {True, False}
+
+def test_packets_come_out_of_the_pty():
+    emulator = KnobEmulator()
+    try:
+        fd = os.open(emulator.name, os.O_RDONLY | os.O_NOCTTY)
+        try:
+            for dx in (3, -2, 31):
+                emulator.send_packet(dx)
+            data = b""
+            while len(data) < 9 and select.select([fd], [], [], 2)[0]:
+                data += os.read(fd, 64)  # the pty may hand the bytes over in pieces
+            events = KnobDecoder().feed(data)
+        finally:
+            os.close(fd)
+    finally:
+        emulator.close()
+    assert [event.dx for event in events] == [3, -2, 31]
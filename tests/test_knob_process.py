@@ -0,0 +1,14 @@
+from knob_decoder import KnobEvent
+from knob_process import EventRing
+
+def test_ring_hands_events_over_in_order_and_counts_drops(tmp_path):
+    path = str(tmp_path / "knob.ring")
+    producer = EventRing(path, capacity=4, create=True)
+    consumer = EventRing(path)
+    events = [KnobEvent(float(i), i - 3, 0x40, i, 0) for i in range(6)]
+    assert [producer.put(event) for event in events] == [True] * 4 + [False] * 2
+    assert consumer.take() == events[:4]
+    assert consumer.dropped() == 2
+    assert producer.put(events[4])
+    assert consumer.take() == events[4:5]
+    assert consumer.take() == []
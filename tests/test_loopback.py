@@ -0,0 +1,39 @@
+import xmlrpc.client
+
+import pytest
+
+from loopback import LoopbackProxy
+from kcat2n3fjp import KCATHandler, DEFAULT_STATE
+from rig_state import RigState
+
+def test_calls_reach_the_handler_without_http():
+    handler = KCATHandler(RigState(**DEFAULT_STATE))
+    proxy = LoopbackProxy(handler)
+    proxy.rig.set_frequency(14070000.0)
+    assert proxy.main.get_frequency() == handler.state["frequency"] == 14070000.0
+
+def test_exceptions_become_faults_like_the_server_sends():
+    def target(method, params):
+        raise ValueError("no such rig")
+    with pytest.raises(xmlrpc.client.Fault) as raised:
+        LoopbackProxy(target).rig.get_mode()
+    assert raised.value.faultCode == 1
+    assert raised.value.faultString == "<class 'ValueError'>:no such rig"
+
+def test_faults_pass_through_unchanged():
+    def target(method, params):
+        raise xmlrpc.client.Fault(42, "busy")
+    with pytest.raises(xmlrpc.client.Fault) as raised:
+        LoopbackProxy(target).main.get_trx_state()
+    assert (raised.value.faultCode, raised.value.faultString) == (42, "busy")
+
+def test_multicall_goes_through_as_one_call():
+    handler = KCATHandler(RigState(**DEFAULT_STATE))
+    proxy = LoopbackProxy(handler)
+    multicall = xmlrpc.client.MultiCall(proxy)
+    multicall.rig.set_frequency(7030000.0)
+    multicall.rig.set_mode("CW")
+    multicall.main.get_frequency()
+    assert list(multicall()) == [DEFAULT_STATE["frequency"], None, 7030000.0]  # set_frequency returns the old one
+    assert proxy._calls == 1
+    assert handler.state["mode"] == "CW"
@@ -0,0 +1,35 @@
+import socket
+import threading
+import time
+import xmlrpc.client
+
+from multirig import RigHost
+
+def test_each_rig_keeps_its_own_state():
+    host = RigHost()
+    host.add_rig("a", "localhost", 0)
+    host.add_rig("b", "localhost", 0)
+    threading.Thread(target=host.serve_forever, daemon=True).start()
+    rig_a, rig_b = (xmlrpc.client.ServerProxy(f"http://localhost:{host.rigs[name][1].server_address[1]}",
+                                              allow_none=True) for name in ("a", "b"))
+    rig_a.rig.set_frequency(7030000.0)
+    rig_b.rig.set_frequency(14070000.0)
+    assert rig_a.main.get_frequency() == 7030000.0
+    assert rig_b.main.get_frequency() == 14070000.0
+
+def test_a_stalled_client_does_not_block_other_rigs():
+    host = RigHost()
+    host.add_rig("a", "localhost", 0)
+    host.add_rig("b", "localhost", 0)
+    threading.Thread(target=host.serve_forever, daemon=True).start()
+    port_a, port_b = (host.rigs[name][1].server_address[1] for name in ("a", "b"))
+
+    with socket.create_connection(("localhost", port_a)) as stalled:
+        stalled.sendall(b"POST /RPC2 HTTP/1.0\r\nContent-Length: 1000\r\n\r\n")  # and nothing more
+        time.sleep(0.1)
+        start = time.monotonic()
+        rig_b = xmlrpc.client.ServerProxy(f"http://localhost:{port_b}", allow_none=True)
+        rig_b.rig.set_frequency(14070000.0)
+        assert rig_b.main.get_frequency() == 14070000.0
+        assert time.monotonic() - start < 1.0
+    assert host.rigs["a"][0].state["frequency"] != 14070000.0
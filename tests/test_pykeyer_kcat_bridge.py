@@ -0,0 +1,94 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from cmd_server import CommandServer
+
+@pytest.fixture(scope="module")
+def bridge(tmp_path_factory):
+    # the plugin opens its snapshot at import; keep it out of the real state directory
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("KACHINA_STATE_DIR", str(tmp_path_factory.mktemp("state")))
+        for name in ("KACHINA_SHM_STATE", "KACHINA_SMETER_FILE", "KACHINA_JOURNAL"):
+            patch.delenv(name, raising=False)
+        import pykeyer_kcat_bridge
+        yield pykeyer_kcat_bridge
+
+@pytest.fixture
+def client(bridge, monkeypatch):
+    # the bridge's listener on a free port instead of 7365
+    listener = CommandServer("localhost", 0, bridge._handle_command)
+    assert listener.start()
+    monkeypatch.setitem(bridge.state, "listener", listener)
+    monkeypatch.setitem(bridge.state, "listener_started", True)
+    with socket.create_connection(("localhost", listener.server.sockets[0].getsockname()[1]), timeout=5) as sock:
+        yield sock
+    listener.stop()
+
+def read_for(sock, seconds):
+    # everything that arrives within seconds
+    data = b""
+    deadline = time.monotonic() + seconds
+    while (left := deadline - time.monotonic()) > 0:
+        sock.settimeout(left)
+        try:
+            chunk = sock.recv(4096)
+        except socket.timeout:
+            break
+        if not chunk:
+            break
+        data += chunk
+    return data.decode("utf-8")
+
+def test_subscribers_get_one_coalesced_push_per_interval(bridge, client):
+    bridge.rig.update(frequency=7000000.0, mode="CW")
+    client.sendall(b"<CMD>subscribe interval=0.3</CMD>")
+    assert read_for(client, 0.1) == "<RESPONSE>OK</RESPONSE>"
+
+    for frequency in (14070000.0, 14070100.0, 14070200.0):
+        bridge.handle("rig.set_frequency", [frequency])
+    bridge.handle("rig.set_mode", ["USB"])
+    assert read_for(client, 0.8) == "<CHANGE>frequency=14070200.0;mode=USB</CHANGE>"
+
+    client.sendall(b"<CMD>unsubscribe</CMD>")
+    assert read_for(client, 0.1) == "<RESPONSE>OK</RESPONSE>"
+    bridge.handle("rig.set_frequency", [7030000.0])
+    assert read_for(client, 0.5) == ""
+
+def test_changes_since_returns_only_newer_fields(bridge, client):
+    version = bridge.rig.version
+    bridge.handle("rig.set_mode", ["CW" if bridge.rig["mode"] != "CW" else "USB"])
+    client.sendall(f"<CMD>changes_since={version}</CMD>".encode())
+    assert read_for(client, 0.2) == f"<RESPONSE>version={version + 1};mode={bridge.rig['mode']}</RESPONSE>"
+
+def test_smeter_store_is_off_with_kachina_smeter_0(tmp_path):
+    env = dict(os.environ, KACHINA_STATE_DIR=str(tmp_path), KACHINA_SMETER="0",
+               PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + "/src")
+    for name in ("KACHINA_SHM_STATE", "KACHINA_SMETER_FILE", "KACHINA_JOURNAL"):
+        env.pop(name, None)
+    out = subprocess.run([sys.executable, "-c", "import pykeyer_kcat_bridge as b; print(b.smeter)"],
+                         env=env, capture_output=True, text=True, timeout=30, check=True).stdout
+    assert out.splitlines()[-1] == "None"
+
+def test_multicall_is_one_change_and_a_bad_call_only_faults_itself(bridge, monkeypatch):
+    monkeypatch.setitem(bridge.state, "listener_started", True)
+    rig = bridge.rig
+    heard = []
+    listener = lambda changes, version: heard.append(dict(changes))
+    rig.subscribe(listener)
+    try:
+        results = bridge.handle("system.multicall", [[
+            {"methodName": "rig.set_frequency", "params": [21074000.0]},
+            {"params": ["no method name"]},
+            {"methodName": "rig.set_mode", "params": ["DIGU"]},
+            {"methodName": "rig.set_bandwidth", "params": ["2400"]},
+        ]])
+    finally:
+        rig.unsubscribe(listener)
+    assert results[1]["faultCode"] == 1 and "methodName" in results[1]["faultString"]
+    assert results[2:] == [[None], [None]]
+    assert heard == [{"frequency": 21074000.0, "mode": "DIGU", "bandwidth": "2400"}]
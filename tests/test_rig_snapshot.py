@@ -0,0 +1,34 @@
+from rig_snapshot import RigSnapshot
+from rig_state import RigState
+
+def test_snapshot_survives_a_restart(tmp_path):
+    path = str(tmp_path / "rig.snap")
+    snapshot = RigSnapshot(path)
+    snapshot.update(frequency=14070000.0, mode="USB", bandwidth="500", trx="RX")
+    snapshot.flush()
+    snapshot.update(frequency=14074000.0)
+    snapshot.flush()
+    assert RigSnapshot(path).load() == {"frequency": 14074000.0, "mode": "USB", "bandwidth": "500", "trx": "RX"}
+
+def test_a_torn_slot_falls_back_to_the_other(tmp_path):
+    path = str(tmp_path / "rig.snap")
+    snapshot = RigSnapshot(path)
+    snapshot.update(frequency=7000000.0, mode="CW")
+    snapshot.flush()
+    snapshot.update(frequency=14070000.0)
+    snapshot.flush()
+    offset = (snapshot.seq % 2) * len(snapshot.mm) // 2
+    snapshot.mm[offset + 10] ^= 0xFF  # the newest slot, half written
+    assert RigSnapshot(path).load()["frequency"] == 7000000.0
+
+def test_an_empty_file_loads_nothing(tmp_path):
+    assert RigSnapshot(str(tmp_path / "new.snap")).load() is None
+
+def test_snapshot_follows_a_rig_state(tmp_path):
+    path = str(tmp_path / "rig.snap")
+    rig = RigState(frequency=7000000.0, mode="CW", bandwidth="500", trx="RX")
+    snapshot = RigSnapshot(path)
+    snapshot.follow(rig)
+    rig.update(frequency=14070000.0, mode="USB")
+    snapshot.flush()
+    assert RigSnapshot(path).load() == {"frequency": 14070000.0, "mode": "USB", "bandwidth": "500", "trx": "RX"}
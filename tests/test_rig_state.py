@@ -0,0 +1,44 @@
+import threading
+
+from rig_state import RigState, Accumulator
+
+def test_changes_bump_the_version_and_reach_listeners():
+    rig = RigState(frequency=7000000.0, mode="CW")
+    published = []
+    rig.subscribe(lambda changes, version: published.append((dict(changes), version)))
+    version = rig.version
+    rig.update(frequency=14070000.0, mode="CW")
+    assert published == [({"frequency": 14070000.0}, version + 1)]
+    assert rig.changes_since(version) == (version + 1, {"frequency": 14070000.0})
+
+def test_transaction_publishes_once_with_the_net_changes():
+    rig = RigState(frequency=7000000.0, mode="CW")
+    published = []
+    rig.subscribe(lambda changes, version: published.append((dict(changes), version)))
+    version = rig.version
+    with rig.transaction():
+        rig.set("frequency", 14070000.0)
+        rig.set("mode", "USB")
+        rig.set("mode", "CW")
+    assert published == [({"frequency": 14070000.0}, version + 1)]
+
+def test_unchanged_writes_do_not_bump_the_version():
+    rig = RigState(frequency=7000000.0)
+    version = rig.version
+    rig.update(frequency=7000000.0)
+    assert rig.version == version
+
+def test_read_modify_write_under_the_lock():
+    rig = RigState(frequency=7000000.0, mode="CW")
+    assert rig.add("frequency", 100.0) == {"frequency": 7000100.0}
+    assert rig.modify(lambda values: {"mode": "USB" if values["frequency"] > 7e6 else "CW"}) == {"mode": "USB"}
+    assert rig.snapshot()["mode"] == "USB"
+
+def test_accumulator_collects_outside_the_state():
+    total = Accumulator()
+    for _ in range(10):
+        total.add(5.0)
+    assert total.take(timeout=0) == 50.0
+    assert total.take(timeout=0) == 0.0
+    threading.Timer(0.01, total.add, (1.0,)).start()
+    assert total.take(timeout=2) == 1.0
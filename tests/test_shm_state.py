@@ -0,0 +1,24 @@
+import struct
+
+import pytest
+
+from shm_state import ShmStatePublisher
+from shm_state_reader import RigStateReader, SEQ_OFFSET
+from rig_state import RigState
+
+def test_reader_sees_what_the_publisher_follows(tmp_path):
+    path = str(tmp_path / "rig-state")
+    rig = RigState(frequency=7000000.0, mode="CW", bandwidth="500", trx="RX")
+    ShmStatePublisher(path).follow(rig)
+    rig.update(frequency=14070000.0, mode="USB")
+    state = RigStateReader(path).read()
+    assert (state["frequency"], state["mode"], state["bandwidth"], state["trx"]) == (14070000.0, "USB", "500", "RX")
+    assert state["version"] == rig.version
+
+def test_reader_gives_up_on_a_write_that_never_finishes(tmp_path):
+    path = str(tmp_path / "rig-state")
+    publisher = ShmStatePublisher(path)
+    publisher.publish(RigState(frequency=7000000.0, mode="CW", bandwidth="500", trx="RX").snapshot())
+    struct.pack_into("<Q", publisher.mm, SEQ_OFFSET, publisher.seq + 1)  # died mid-write
+    with pytest.raises(TimeoutError):
+        RigStateReader(path).read(timeout=0.05)
@@ -0,0 +1,52 @@
+from smeter_store import SmeterStore
+
+def test_tiers_keep_min_max_mean_and_count():
+    store = SmeterStore()
+    for i in range(600):  # a minute at 10 samples a second
+        store.add(6000.0 + i * 0.1, 14070000.0, i % 10)
+    seconds = store.summary(1)
+    assert len(seconds) == 60
+    assert seconds[0] == (6000.0, 14070000.0, 0.0, 9.0, 4.5, 10)
+    assert [row[5] for row in store.summary(60)] == [600]
+
+def test_tiers_downsample_while_tuning():
+    store = SmeterStore()
+    for i in range(600):  # a minute at 10 samples a second, tuning 10 Hz each sample
+        store.add(6000.0 + i * 0.1, 14000000.0 + i * 10, i % 10)
+    seconds = store.summary(1)
+    assert len(seconds) == 60
+    ts, frequency, low, high, mean, count = seconds[0]
+    assert (ts, frequency, low, high, mean, count) == (6000.0, 14000090.0, 0.0, 9.0, 4.5, 10)
+    assert [row[5] for row in store.summary(60)] == [600]
+
+def test_queries_pick_a_level_and_filter_frequency():
+    store = SmeterStore()
+    for i in range(3000):
+        store.add(6000.0 + i * 0.1, 7000000.0 if i < 1500 else 14070000.0, 5)
+    resolution, rows = store.query(max_rows=100)
+    assert resolution == 60
+    assert len(store.samples(fmin=14e6)) == 1500
+    assert store.query(6000.0, 6005.0)[0] is None  # 50 raw samples fit
+
+def test_save_and_load_round_trip(tmp_path):
+    store = SmeterStore()
+    for i in range(50):
+        store.add(6000.0 + i, 14070000.0, i)
+    path = str(tmp_path / "smeter.bin")
+    store.save(path)
+    loaded = SmeterStore.load(path)
+    assert loaded.samples() == store.samples()
+    assert loaded.summary(60) == store.summary(60)
+    loaded.add(6049.5, 14070000.0, 100)  # continues the newest bucket
+    assert len(loaded.summary(1)) == len(store.summary(1))
+
+def test_rings_grow_as_samples_arrive_and_wrap_at_capacity():
+    store = SmeterStore(raw_capacity=100)
+    assert store.nbytes() < 1000  # nothing allocated up front
+    for i in range(250):
+        store.add(6000.0 + i * 0.1, 14070000.0, i % 10)
+    assert store.raw.count == 100
+    assert len(store.raw.columns[0]) == 100
+    samples = store.samples()
+    assert samples[0][0] == 6000.0 + 150 * 0.1
+    assert [ts for ts, _, _ in samples] == sorted(ts for ts, _, _ in samples)
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import pytest
+
+@pytest.fixture(scope="module")
+def knob(tmp_path_factory):
+    # the plugin opens its snapshot at import; keep it out of the real state directory
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("KACHINA_STATE_DIR", str(tmp_path_factory.mktemp("state")))
+        for name in ("KACHINA_KNOB_PUSH_URL", "KACHINA_SHM_STATE", "KACHINA_SMETER_FILE", "KACHINA_JOURNAL"):
+            patch.delenv(name, raising=False)
+        import tuning_knob_callback
+        yield tuning_knob_callback
+
+@pytest.fixture
+def tuning(knob, monkeypatch):
+    # the tuning thread alone, fed through delta_f as the knob thread would
+    monkeypatch.setitem(knob.state, "knob_active", True)
+    thread = threading.Thread(target=knob._tuning_loop, daemon=True)
+    thread.start()
+    yield knob
+    knob.state["knob_active"] = False
+    thread.join(2)
+
+def test_ticks_are_rate_limited_and_the_last_ones_are_flushed(tuning):
+    rig = tuning.rig
+    start = rig["frequency"]
+    applied = []
+    listener = lambda changes, version: applied.append(time.monotonic())
+    rig.subscribe(listener)
+    try:
+        spin = time.monotonic()
+        for _ in range(40):  # 200 ms of fast spinning
+            tuning.delta_f.add(10.0)
+            time.sleep(0.005)
+        spin = time.monotonic() - spin
+        time.sleep(2 * tuning.MIN_APPLY_INTERVAL + 0.05)  # the trailing edge
+    finally:
+        rig.unsubscribe(listener)
+
+    assert rig["frequency"] == start + 400.0
+    assert 2 <= len(applied) <= spin / tuning.MIN_APPLY_INTERVAL + 2  # not one version per tick
+    gaps = [later - earlier for earlier, later in zip(applied, applied[1:])]
+    assert min(gaps) >= tuning.MIN_APPLY_INTERVAL * 0.9
+
+def test_a_single_tick_is_applied_without_waiting_for_more(tuning):
+    start = tuning.rig["frequency"]
+    version = tuning.rig.version
+    time.sleep(tuning.MIN_APPLY_INTERVAL)
+    tuning.delta_f.add(-1.0)
+    assert tuning.rig.wait_for_change(version, timeout=1.0) == version + 1
+    assert tuning.rig["frequency"] == start - 1.0
+
+def test_multicall_is_one_change_and_a_bad_call_only_faults_itself(knob, monkeypatch):
+    monkeypatch.setitem(knob.state, "knob_thread", object())  # no serial port here
+    rig = knob.rig
+    heard = []
+    listener = lambda changes, version: heard.append(dict(changes))
+    rig.subscribe(listener)
+    try:
+        results = knob.handle("system.multicall", [[
+            {"methodName": "rig.set_frequency", "params": [21074000.0]},
+            "not a call",
+            {"methodName": "rig.set_mode", "params": ["DIGU"]},
+            {"methodName": "rig.get_mode", "params": [0]},
+        ]])
+    finally:
+        rig.unsubscribe(listener)
+    assert results[1]["faultCode"] == 1
+    assert results[2:] == [[None], ["DIGU"]]
+    assert heard == [{"frequency": 21074000.0, "mode": "DIGU"}]
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+import xmlrpc_proxy_logger as proxy
+from xmlrpc_proxy_logger import SingleFlight
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch):
+    # log_event reads the parsed command line
+    monkeypatch.setattr(proxy, "args", proxy.build_parser().parse_args(["--quiet"]))
+
+class SlowTarget:
+    # a send() that holds getters until released, counting what reaches it
+    def __init__(self, error=None):
+        self.release = threading.Event()
+        self.error = error
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def send(self, method, params):
+        with self.lock:
+            self.calls.append(method)
+            answer = len(self.calls)
+        if ".get_" in method:
+            assert self.release.wait(5)
+        if self.error:
+            raise self.error
+        return answer
+
+def in_threads(count, fn):
+    results = [None] * count
+    def run(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+def wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+def test_identical_concurrent_getters_share_one_upstream_call():
+    flight, target = SingleFlight(), SlowTarget()
+    threads, results = in_threads(5, lambda: flight.call("rig.get_frequency", [], target.send))
+    wait_until(lambda: flight.saved == 4)
+    target.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [1] * 5
+    assert target.calls == ["rig.get_frequency"]
+    assert flight.stats() == {"upstream": 1, "saved": 4, "barriers": 0}
+    assert flight.call("rig.get_frequency", [], target.send) == 2  # nothing is cached
+
+def test_different_params_are_not_collapsed():
+    flight, target = SingleFlight(), SlowTarget()
+    target.release.set()
+    assert flight.call("rig.get_frequency", [1], target.send) == 1
+    assert flight.call("rig.get_frequency", [2], target.send) == 2
+    assert flight.stats()["saved"] == 0
+
+def test_a_setter_is_a_barrier_for_later_getters():
+    flight, target = SingleFlight(), SlowTarget()
+    first, first_result = in_threads(1, lambda: flight.call("rig.get_mode", [], target.send))
+    wait_until(lambda: target.calls == ["rig.get_mode"])
+    assert flight.call("rig.set_mode", ["CW"], target.send) == 2
+    later, later_result = in_threads(1, lambda: flight.call("rig.get_mode", [], target.send))
+    wait_until(lambda: len(target.calls) == 3)
+    target.release.set()
+    for thread in first + later:
+        thread.join(5)
+    assert first_result == [1]
+    assert later_result == [3]  # its own answer, sent after the setter
+    assert flight.stats() == {"upstream": 3, "saved": 0, "barriers": 1}
+    assert flight.in_flight == {}
+
+def test_the_leaders_exception_reaches_every_waiter():
+    flight, target = SingleFlight(), SlowTarget(error=ConnectionRefusedError("target down"))
+    threads, results = in_threads(3, lambda: flight.call("rig.get_frequency", [], target.send))
+    wait_until(lambda: flight.saved == 2)
+    target.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert all(isinstance(result, ConnectionRefusedError) for result in results)
+    assert flight.stats() == {"upstream": 1, "saved": 2, "barriers": 0}
+    assert flight.in_flight == {}
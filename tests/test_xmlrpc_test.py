@@ -0,0 +1,29 @@
+from xmlrpc_test import CountMinSketch, Recorder, type_signature
+
+def test_recorder_counts_calls_inside_multicalls():
+    recorder = Recorder()
+    recorder.record("rig.set_frequency", (14070000.0,))
+    recorder.record("system.multicall", ([{"methodName": "rig.set_frequency", "params": [7030000.0]},
+                                          {"methodName": "rig.set_mode", "params": ["CW"]}],))
+    methods = recorder.summary()["methods"]
+    assert methods["rig.set_frequency"]["calls"] == 2
+    assert methods["rig.set_frequency"]["distinct_params"] == 2
+    assert methods["rig.set_mode"]["params"] == [{"string": 1}]
+
+def test_recorder_memory_stays_bounded():
+    recorder = Recorder(max_distinct=10, top=3)
+    for i in range(1000):
+        recorder.record("rig.set_smeter", (i % 100,))
+    record = recorder.summary()["methods"]["rig.set_smeter"]
+    assert record["distinct_params"] == 10 and record["distinct_is_lower_bound"]
+    assert len(record["top_params"]) == 3
+
+def test_sketch_never_undercounts():
+    sketch = CountMinSketch(width=64, depth=4)
+    for i in range(500):
+        sketch.add(str(i % 50).encode())
+    assert all(sketch.estimate(str(i).encode()) >= 10 for i in range(50))
+
+def test_type_signature():
+    assert type_signature([{"methodName": "a", "params": [1.0]}]) == \
+        "array<struct{methodName:string,params:array<double>}>"